@@ -0,0 +1,53 @@
+"""add build jobs
+
+Revision ID: 20261017_000004
+Revises: 20240920_000003
+Create Date: 2026-10-17 00:00:04
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "20261017_000004"
+down_revision = "20240920_000003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "build_jobs",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True, server_default=sa.text("gen_random_uuid()")),
+        sa.Column("build_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("builds.id"), nullable=False, index=True),
+        sa.Column("status", sa.String(50), nullable=False, server_default="queued"),
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("max_attempts", sa.Integer(), nullable=False, server_default="3"),
+        sa.Column("available_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column("locked_by", sa.String(255), nullable=True),
+        sa.Column("locked_until", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+
+    # Partial indexes keep the claim query cheap as finished jobs pile up
+    op.create_index(
+        "ix_build_jobs_queued_available_at",
+        "build_jobs",
+        ["available_at"],
+        postgresql_where=sa.text("status = 'queued'"),
+    )
+    op.create_index(
+        "ix_build_jobs_running_locked_until",
+        "build_jobs",
+        ["locked_until"],
+        postgresql_where=sa.text("status = 'running'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_build_jobs_running_locked_until", table_name="build_jobs")
+    op.drop_index("ix_build_jobs_queued_available_at", table_name="build_jobs")
+    op.drop_table("build_jobs")
@@ -0,0 +1,39 @@
+"""add keyset pagination indexes
+
+Revision ID: 20261017_000008
+Revises: 20261017_000007
+Create Date: 2026-10-17 00:00:08
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20261017_000008"
+down_revision = "20261017_000007"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_builds_user_id_created_at_id", "builds"),
+    ("ix_agent_usages_user_id_created_at_id", "agent_usages"),
+]
+
+
+def upgrade() -> None:
+    # Built concurrently so large tables stay writable during the migration
+    with op.get_context().autocommit_block():
+        for name, table in INDEXES:
+            op.create_index(
+                name,
+                table,
+                ["user_id", sa.text("created_at DESC"), sa.text("id DESC")],
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table in INDEXES:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
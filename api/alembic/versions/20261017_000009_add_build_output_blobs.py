@@ -0,0 +1,26 @@
+"""add build output blob columns
+
+Revision ID: 20261017_000009
+Revises: 20261017_000008
+Create Date: 2026-10-17 00:00:09
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20261017_000009"
+down_revision = "20261017_000008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Existing outputs are moved with `python -m app.modules.builds.migrate_outputs`
+    op.add_column("builds", sa.Column("output_blob_key", sa.String(64), nullable=True))
+    op.add_column("builds", sa.Column("output_size", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("builds", "output_size")
+    op.drop_column("builds", "output_blob_key")
@@ -0,0 +1,62 @@
+"""dedupe wishlist items
+
+Revision ID: 20261017_000010
+Revises: 20261017_000009
+Create Date: 2026-10-17 00:00:10
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20261017_000010"
+down_revision = "20261017_000009"
+branch_labels = None
+depends_on = None
+
+INDEX = "uq_wishlist_items_email_website_action"
+
+
+def upgrade() -> None:
+    # Ingestion stores emails lowercased and both trimmed; bring existing rows in line
+    op.execute(
+        """
+        UPDATE wishlist_items
+        SET email = lower(trim(email)), website = trim(website)
+        WHERE email <> lower(trim(email)) OR website <> trim(website)
+        """
+    )
+
+    # Keep the most recent live signup per key and soft-delete the rest
+    op.execute(
+        """
+        UPDATE wishlist_items AS w
+        SET is_deleted = true, updated_at = now()
+        FROM (
+            SELECT id, row_number() OVER (
+                PARTITION BY email, website, action
+                ORDER BY updated_at DESC, id
+            ) AS rank
+            FROM wishlist_items
+            WHERE NOT is_deleted
+        ) AS ranked
+        WHERE w.id = ranked.id AND ranked.rank > 1
+        """
+    )
+
+    # autocommit_block commits the cleanup above before building the index
+    with op.get_context().autocommit_block():
+        op.create_index(
+            INDEX,
+            "wishlist_items",
+            ["email", "website", "action"],
+            unique=True,
+            postgresql_where=sa.text("NOT is_deleted"),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(INDEX, table_name="wishlist_items", postgresql_concurrently=True, if_exists=True)
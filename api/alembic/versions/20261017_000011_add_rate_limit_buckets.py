@@ -0,0 +1,30 @@
+"""add rate limit buckets
+
+Revision ID: 20261017_000011
+Revises: 20261017_000010
+Create Date: 2026-10-17 00:00:11
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20261017_000011"
+down_revision = "20261017_000010"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Buckets are disposable (a lost bucket starts full), so skip the WAL
+    op.create_table(
+        "rate_limit_buckets",
+        sa.Column("key", sa.String(255), primary_key=True),
+        sa.Column("tokens", sa.Float(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+        prefixes=["UNLOGGED"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("rate_limit_buckets")
@@ -0,0 +1,27 @@
+"""add user builds version
+
+Revision ID: 20261017_000012
+Revises: 20261017_000011
+Create Date: 2026-10-17 00:00:12
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20261017_000012"
+down_revision = "20261017_000011"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # A constant default is metadata-only in Postgres 11+, no table rewrite
+    op.add_column(
+        "users",
+        sa.Column("builds_version", sa.Integer(), nullable=False, server_default="0"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("users", "builds_version")
@@ -0,0 +1,26 @@
+"""add user is_admin
+
+Revision ID: 20261017_000013
+Revises: 20261017_000012
+Create Date: 2026-10-17 00:00:13
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20261017_000013"
+down_revision = "20261017_000012"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "users",
+        sa.Column("is_admin", sa.Boolean(), nullable=False, server_default=sa.false()),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("users", "is_admin")
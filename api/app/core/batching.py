@@ -0,0 +1,163 @@
+"""Background batch writer - rows are buffered in memory and inserted in batches."""
+
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from typing import Any
+
+_STOP = object()
+
+
+class BatchWriter(ABC):
+    """Queues rows in memory and writes them in batches off the request path.
+
+    A background task flushes when `batch_size` rows are buffered or
+    `flush_interval` seconds pass, whichever comes first, calling `_insert`
+    once per batch. The queue holds at most `max_pending` rows; once full,
+    `record` waits for the next flush (backpressure) while `offer` refuses
+    the row. A failed flush is retried; rows still buffered are flushed on
+    `stop`.
+
+    When the writer is not running (scripts, tests) rows are written right
+    away.
+    """
+
+    # What the rows are, for log messages
+    label = "buffered"
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, batch_size: int, flush_interval: float, max_pending: int):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.flushed = 0
+        self.flushes = 0
+        self.failures = 0
+        self.rejected = 0
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+        self._stopping: asyncio.Event | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def record(self, row: dict[str, Any]) -> None:
+        """Queue one row, waiting for room if the buffer is full."""
+        if not self.running:
+            await self._insert([row])
+            return
+
+        await self._queue.put(row)
+
+    async def offer(self, row: dict[str, Any]) -> bool:
+        """Queue one row without waiting. Returns False if the buffer is full."""
+        if not self.running:
+            await self._insert([row])
+            return True
+
+        try:
+            self._queue.put_nowait(row)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return False
+        return True
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._stopping = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Flush everything still buffered and stop the background task.
+
+        Does not wait for room in the queue nor for a failing flush to
+        recover: the task makes one final attempt and drops what it cannot
+        write.
+        """
+        if not self.running:
+            return
+        self._stopping.set()
+        try:
+            # Wakes the task if it is waiting for rows; with a full queue it isn't
+            self._queue.put_nowait(_STOP)
+        except asyncio.QueueFull:
+            pass
+        await self._task
+        self._task = None
+        self._queue = None
+        self._stopping = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        batch: list[dict[str, Any]] = []
+        stopping = False
+
+        while not stopping:
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size and not self._stopping.is_set():
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    row = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if row is _STOP:
+                    stopping = True
+                    break
+                batch.append(row)
+
+            stopping = stopping or self._stopping.is_set()
+            if stopping:
+                while not self._queue.empty():
+                    row = self._queue.get_nowait()
+                    if row is not _STOP:
+                        batch.append(row)
+
+            while batch:
+                chunk = batch[: self.batch_size]
+                if not await self._flush(chunk):
+                    if stopping:
+                        self.logger.error(
+                            "Dropping %d %s rows after a failed final flush", len(batch), self.label
+                        )
+                        return
+                    # Keep the rows and retry; while the batch is full nothing
+                    # new is read, so the queue fills up and applies backpressure.
+                    # A stop cuts the wait short for the final attempt.
+                    try:
+                        await asyncio.wait_for(self._stopping.wait(), self.flush_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                    break
+                del batch[: len(chunk)]
+
+    async def _flush(self, rows: list[dict[str, Any]]) -> bool:
+        try:
+            await self._insert(rows)
+        except Exception:
+            self.failures += 1
+            self.logger.exception("Failed to write %d %s rows", len(rows), self.label)
+            return False
+
+        self.flushed += len(rows)
+        self.flushes += 1
+        return True
+
+    @abstractmethod
+    async def _insert(self, rows: list[dict[str, Any]]) -> None:
+        """Write one batch of rows."""
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "running": self.running,
+            "buffered": self._queue.qsize() if self._queue is not None else 0,
+            "max_pending": self.max_pending,
+            "flushed": self.flushed,
+            "flushes": self.flushes,
+            "failures": self.failures,
+            "rejected": self.rejected,
+        }
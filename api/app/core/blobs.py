@@ -0,0 +1,144 @@
+"""Content-addressed, compressed blob storage for large build outputs."""
+
+import asyncio
+import gzip
+import hashlib
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import AsyncIterator
+
+from app.core.config import settings
+
+CHUNK_SIZE = 64 * 1024
+
+
+class BlobNotFoundError(Exception):
+    """Raised when a blob key does not exist in the store."""
+
+
+def blob_key(data: bytes) -> str:
+    """Blobs are addressed by the SHA-256 of their uncompressed content."""
+    return hashlib.sha256(data).hexdigest()
+
+
+class BlobStore(ABC):
+    """Stores immutable blobs gzip-compressed under their content hash.
+
+    Writing the same content twice stores it once. Reads are served
+    decompressed, optionally for a byte range, or as the raw gzip stream so it
+    can be sent with `Content-Encoding: gzip` as is.
+    """
+
+    @abstractmethod
+    async def put(self, data: bytes) -> str:
+        """Store `data` and return its key."""
+
+    @abstractmethod
+    async def exists(self, key: str) -> bool: ...
+
+    @abstractmethod
+    def iter_range(
+        self,
+        key: str,
+        start: int = 0,
+        end: int | None = None,
+        chunk_size: int = CHUNK_SIZE,
+    ) -> AsyncIterator[bytes]:
+        """Yield the decompressed bytes in [start, end] (inclusive, like HTTP)."""
+
+    @abstractmethod
+    def iter_compressed(self, key: str, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+        """Yield the stored gzip bytes."""
+
+    async def read(self, key: str) -> bytes:
+        return b"".join([chunk async for chunk in self.iter_range(key)])
+
+
+class LocalBlobStore(BlobStore):
+    """Blob store on the local filesystem, sharded as `<root>/ab/cd/<key>.gz`.
+
+    File I/O runs in worker threads so the event loop is never blocked.
+    """
+
+    def __init__(self, root: str | Path, compress_level: int = 6):
+        self.root = Path(root)
+        self.compress_level = compress_level
+
+    def path(self, key: str) -> Path:
+        return self.root / key[:2] / key[2:4] / f"{key}.gz"
+
+    async def put(self, data: bytes) -> str:
+        key = blob_key(data)
+        await asyncio.to_thread(self._write, key, data)
+        return key
+
+    def _write(self, key: str, data: bytes) -> None:
+        path = self.path(key)
+        if path.exists():
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        compressed = gzip.compress(data, compresslevel=self.compress_level, mtime=0)
+        # Write to a temp file and rename so readers never see a partial blob
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(compressed)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    async def exists(self, key: str) -> bool:
+        return await asyncio.to_thread(self.path(key).exists)
+
+    def _open(self, key: str, opener):
+        try:
+            return opener(self.path(key), "rb")
+        except FileNotFoundError:
+            raise BlobNotFoundError(key) from None
+
+    async def iter_range(
+        self,
+        key: str,
+        start: int = 0,
+        end: int | None = None,
+        chunk_size: int = CHUNK_SIZE,
+    ) -> AsyncIterator[bytes]:
+        f = await asyncio.to_thread(self._open, key, gzip.open)
+        try:
+            if start:
+                await asyncio.to_thread(f.seek, start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                size = chunk_size if remaining is None else min(chunk_size, remaining)
+                chunk = await asyncio.to_thread(f.read, size)
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+        finally:
+            await asyncio.to_thread(f.close)
+
+    async def iter_compressed(self, key: str, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+        f = await asyncio.to_thread(self._open, key, open)
+        try:
+            while chunk := await asyncio.to_thread(f.read, chunk_size):
+                yield chunk
+        finally:
+            await asyncio.to_thread(f.close)
+
+
+_store: BlobStore | None = None
+
+
+def get_blob_store() -> BlobStore:
+    """Return the configured blob store."""
+    global _store
+    if _store is None:
+        if settings.blob_store_backend != "local":
+            raise ValueError(f"Unknown blob store backend: {settings.blob_store_backend}")
+        _store = LocalBlobStore(settings.blob_store_path)
+    return _store
@@ -0,0 +1,222 @@
+"""Response compression - negotiated gzip or zstd, with per-content-type levels."""
+
+import asyncio
+import zlib
+from typing import Protocol
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import zstandard
+except ImportError:  # optional: zstd is offered only when installed
+    zstandard = None
+
+# Never compressed: partial content, or no body to compress
+SKIPPED_STATUSES = {204, 206, 304}
+
+
+class Compressor(Protocol):
+    def compress(self, data: bytes) -> bytes: ...
+
+    def flush(self) -> bytes:
+        """Everything compressed so far, decodable by the client as is."""
+
+    def finish(self) -> bytes: ...
+
+
+class GzipCompressor:
+    def __init__(self, level: int):
+        # wbits 16 + MAX_WBITS: gzip header and trailer
+        self._zlib = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._zlib.compress(data)
+
+    def flush(self) -> bytes:
+        return self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._zlib.flush(zlib.Z_FINISH)
+
+
+class ZstdCompressor:
+    def __init__(self, level: int):
+        self._zstd = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._zstd.compress(data)
+
+    def flush(self) -> bytes:
+        return self._zstd.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._zstd.flush()
+
+
+COMPRESSORS = {"gzip": GzipCompressor}
+if zstandard is not None:
+    COMPRESSORS["zstd"] = ZstdCompressor
+
+
+def negotiate_encoding(accept_encoding: str, encodings: list[str]) -> str | None:
+    """The coding to use for an Accept-Encoding header, or None for identity.
+
+    The client's q-values decide; on a tie the earlier entry in `encodings`
+    (the server's preference) wins.
+    """
+    weights: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, *params = (item.strip() for item in part.split(";"))
+        weight = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        if coding:
+            weights[coding.lower()] = weight
+
+    best, best_weight = None, 0.0
+    for coding in encodings:
+        weight = weights.get(coding, weights.get("*", 0.0))
+        if coding in COMPRESSORS and weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+class CompressionMiddleware:
+    """Compresses responses whose content type has a level configured.
+
+    Responses with a body are compressed in one go if they are at least
+    `minimum_size` bytes. Streamed responses are compressed chunk by chunk,
+    each chunk flushed so the client receives it without waiting for the
+    rest. Bodies or chunks of `thread_threshold` bytes or more are
+    compressed in a worker thread to keep the event loop free.
+
+    Responses that already have a Content-Encoding (e.g. gzip blobs sent as
+    stored), partial content and content types without a level (e.g.
+    text/event-stream) are passed through.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        encodings: list[str],
+        levels: dict[str, dict[str, int]],
+        minimum_size: int,
+        thread_threshold: int,
+    ):
+        self.app = app
+        self.encodings = [encoding for encoding in encodings if encoding in COMPRESSORS]
+        self.levels = levels
+        self.minimum_size = minimum_size
+        self.thread_threshold = thread_threshold
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""), self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+
+class CompressionResponder:
+    """Per-response state of CompressionMiddleware."""
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.downstream = send
+        self.start: Message | None = None
+        self.level: int | None = None
+        self.compressor: Compressor | None = None
+        # Once decided not to compress, messages go through untouched
+        self.passthrough = False
+
+    def level_for(self, message: Message) -> int | None:
+        headers = Headers(raw=message["headers"])
+        if (
+            message["status"] in SKIPPED_STATUSES
+            or "content-encoding" in headers
+            or "content-range" in headers
+        ):
+            return None
+        media_type = headers.get("content-type", "").split(";")[0].strip().lower()
+        level = self.middleware.levels.get(media_type, {}).get(self.encoding)
+        if not level:
+            return None
+        content_length = headers.get("content-length")
+        if content_length is not None and int(content_length) < self.middleware.minimum_size:
+            return None
+        return level
+
+    async def send(self, message: Message) -> None:
+        if self.passthrough:
+            await self.downstream(message)
+            return
+
+        if message["type"] == "http.response.start":
+            self.level = self.level_for(message)
+            if self.level is None:
+                self.passthrough = True
+                await self.downstream(message)
+            else:
+                # Held until the first body message shows whether it streams
+                self.start = message
+            return
+
+        if message["type"] != "http.response.body":
+            await self.downstream(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.compressor is None:
+            if not more_body and len(body) < self.middleware.minimum_size:
+                self.passthrough = True
+                await self.downstream(self.start)
+                await self.downstream(message)
+                return
+
+            self.compressor = COMPRESSORS[self.encoding](self.level)
+            headers = MutableHeaders(raw=list(self.start["headers"]))
+            self.start["headers"] = headers.raw
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            etag = headers.get("etag")
+            if etag is not None and not etag.startswith("W/"):
+                # The encoded bytes differ, so only a weak ETag still holds
+                headers["ETag"] = f"W/{etag}"
+            if more_body:
+                del headers["content-length"]
+            else:
+                body = await self.run(self.compress_all, body)
+                headers["Content-Length"] = str(len(body))
+                await self.downstream(self.start)
+                await self.downstream({"type": "http.response.body", "body": body})
+                return
+            await self.downstream(self.start)
+
+        body = await self.run(self.compress_chunk if more_body else self.compress_all, body)
+        await self.downstream({"type": "http.response.body", "body": body, "more_body": more_body})
+
+    async def run(self, fn, data: bytes) -> bytes:
+        if len(data) >= self.middleware.thread_threshold:
+            return await asyncio.to_thread(fn, data)
+        return fn(data)
+
+    def compress_all(self, data: bytes) -> bytes:
+        return self.compressor.compress(data) + self.compressor.finish()
+
+    def compress_chunk(self, data: bytes) -> bytes:
+        return self.compressor.compress(data) + self.compressor.flush()
@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -6,6 +8,9 @@ class Settings(BaseSettings):
     debug: bool = False
     api_prefix: str = "/api"
     database_url: str
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0  # seconds to wait for a free connection
 
     # PostgreSQL container settings (used by docker-compose)
     postgres_user: str = "postgres"
@@ -15,9 +20,112 @@ class Settings(BaseSettings):
     # JWT settings
     secret_key: str = "your-secret-key-change-in-production"
     access_token_expire_minutes: int = 60 * 24 * 7  # 7 days
+    token_verifier: Literal["jose", "hmac"] = "jose"  # hmac: stdlib HS256 verification, much faster
+    token_cache_max_entries: int = 10000
+    token_cache_ttl: float = 300.0  # seconds; never past the token's exp
+
+    # Password hashing: bcrypt threads and how many calls may run or wait
+    password_hash_workers: int = 2
+    password_hash_max_pending: int = 32
 
     # Agent service settings
     agent_service_url: str = "http://localhost:8001"
+    agent_timeout: float = 60.0
+    agent_connect_timeout: float = 5.0
+    agent_action_timeouts: dict[str, float] = {}
+    agent_max_connections: int = 100
+    agent_max_keepalive_connections: int = 20
+    agent_keepalive_expiry: float = 30.0
+    agent_http2: bool = False
+    agent_cache_enabled: bool = True
+    agent_cache_ttl: int = 3600  # seconds
+    agent_cache_max_entries: int = 1024
+    agent_singleflight_enabled: bool = True
+    agent_singleflight_distributed: bool = False
+    agent_singleflight_lease_margin: float = 15.0  # seconds on top of the action timeout
+    agent_singleflight_poll_interval: float = 0.25
+    agent_stream_error_max_bytes: int = 4 * 1024
+    agent_breaker_failure_threshold: float = 0.5
+    agent_breaker_min_calls: int = 10
+    agent_breaker_window: float = 30.0  # seconds
+    agent_breaker_open_seconds: float = 15.0
+    agent_breaker_half_open_calls: int = 1
+    agent_concurrency_initial: int = 20
+    agent_concurrency_min: int = 2
+    agent_concurrency_max: int = 100
+    agent_concurrency_queue_timeout: float = 5.0
+    agent_latency_target: float = 45.0  # seconds
+    agent_batch_max_items: int = 500
+    agent_batch_concurrency: int = 10
+
+    # Usage recording settings
+    usage_flush_batch_size: int = 500
+    usage_flush_interval: float = 1.0  # seconds
+    usage_buffer_max: int = 10000
+
+    # Build output storage: outputs above the inline limit go to the blob store
+    build_output_inline_max_bytes: int = 16 * 1024
+    blob_store_backend: str = "local"
+    blob_store_path: str = "data/blobs"
+
+    # Wishlist ingestion buffer
+    wishlist_flush_batch_size: int = 500
+    wishlist_flush_interval: float = 0.5
+    wishlist_buffer_max: int = 20000
+
+    # Bulk build creation: max builds per request
+    build_bulk_max_items: int = 1000
+
+    # Build events: seconds between keepalives on idle SSE/WebSocket streams
+    build_events_keepalive: float = 15.0
+
+    # Authenticated-user cache (per process, invalidated across processes)
+    user_cache_max_entries: int = 10000
+    user_cache_ttl: float = 60.0  # seconds
+
+    # Rate limiting: token buckets per user (JWT sub) or client IP. Rates are
+    # "<requests>/<second|minute|hour|day>"; "default" applies to every request
+    rate_limit_enabled: bool = True
+    rate_limit_backend: Literal["memory", "postgres"] = "memory"  # postgres: shared by all workers
+    rate_limit_routes: dict[str, str] = {
+        "default": "300/minute",
+        "login": "10/minute",
+        "register": "5/minute",
+        "wishlist": "30/minute",
+        "builds": "120/minute",
+    }
+    rate_limit_plan_multipliers: dict[str, float] = {
+        "free": 1,
+        "starter": 2,
+        "business": 5,
+        "enterprise": 20,
+    }
+    rate_limit_max_keys: int = 100000  # memory backend only
+    rate_limit_prune_interval: float = 300.0  # seconds; postgres backend only
+    # Proxies in front of the API that append to X-Forwarded-For; 0 ignores the header
+    rate_limit_forwarded_hops: int = 0
+
+    # Response compression. zstd is offered only if the zstandard package is
+    # installed; content types without a level are sent uncompressed
+    compression_enabled: bool = True
+    compression_encodings: list[str] = ["zstd", "gzip"]  # preferred first
+    compression_levels: dict[str, dict[str, int]] = {
+        # Generated per request, so a cheaper gzip level
+        "application/json": {"gzip": 5, "zstd": 3},
+        "text/plain": {"gzip": 6, "zstd": 3},
+        "text/html": {"gzip": 6, "zstd": 3},
+        "text/csv": {"gzip": 6, "zstd": 3},
+    }
+    compression_minimum_size: int = 1024  # bytes
+    compression_thread_threshold: int = 128 * 1024  # larger bodies/chunks compress off the event loop
+
+    # Build worker settings
+    worker_concurrency: int = 4
+    worker_poll_interval: float = 1.0
+    job_visibility_timeout: int = 180  # seconds
+    job_max_attempts: int = 3
+    job_retry_backoff: float = 10.0  # seconds, doubled on every attempt
+    job_retry_backoff_max: float = 600.0
 
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
 
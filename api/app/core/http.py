@@ -0,0 +1,87 @@
+"""Shared HTTP client used to talk to the agent service."""
+
+import logging
+from typing import Any
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_client: httpx.AsyncClient | None = None
+
+
+def _build_client() -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=settings.agent_max_connections,
+        max_keepalive_connections=settings.agent_max_keepalive_connections,
+        keepalive_expiry=settings.agent_keepalive_expiry,
+    )
+    timeout = httpx.Timeout(settings.agent_timeout, connect=settings.agent_connect_timeout)
+    return httpx.AsyncClient(
+        limits=limits,
+        timeout=timeout,
+        http2=settings.agent_http2,
+    )
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the application-wide client, creating it on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
+
+
+async def init_http_client() -> httpx.AsyncClient:
+    return get_http_client()
+
+
+async def close_http_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_action_timeout(action: str) -> httpx.Timeout:
+    """Return the timeout for an agent action, falling back to the default."""
+    read_timeout = settings.agent_action_timeouts.get(action, settings.agent_timeout)
+    return httpx.Timeout(read_timeout, connect=settings.agent_connect_timeout)
+
+
+def get_pool_stats() -> dict[str, Any]:
+    """Report connection pool usage of the shared client."""
+    stats: dict[str, Any] = {
+        "max_connections": settings.agent_max_connections,
+        "max_keepalive_connections": settings.agent_max_keepalive_connections,
+        "http2": settings.agent_http2,
+        "connections": 0,
+        "active": 0,
+        "idle": 0,
+        "http2_connections": 0,
+        "queued_requests": 0,
+    }
+    if _client is None or _client.is_closed:
+        return stats
+
+    # httpx does not expose pool statistics publicly, so read them from httpcore.
+    # These are private attributes; an upgrade must not break the stats endpoint.
+    try:
+        pool = getattr(_client._transport, "_pool", None)
+        if pool is None:
+            return stats
+
+        connections = list(pool.connections)
+        stats["connections"] = len(connections)
+        stats["idle"] = sum(1 for conn in connections if conn.is_idle())
+        stats["active"] = stats["connections"] - stats["idle"]
+        stats["http2_connections"] = sum(1 for conn in connections if "HTTP/2" in conn.info())
+        stats["queued_requests"] = sum(
+            1 for request in getattr(pool, "_requests", []) if request.is_queued()
+        )
+    except Exception:
+        logger.warning("Could not read HTTP pool statistics", exc_info=True)
+        stats["unavailable"] = True
+    return stats
@@ -0,0 +1,114 @@
+"""Keyset (cursor) pagination on (created_at, id), newest first."""
+
+import base64
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Generic, Sequence, TypeVar
+from uuid import UUID
+
+from sqlalchemy import Select, func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+T = TypeVar("T")
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded."""
+
+
+@dataclass
+class Page(Generic[T]):
+    items: list[T]
+    next_cursor: str | None
+    total: int
+    total_is_estimate: bool
+
+
+def encode_cursor(created_at: datetime, id: UUID) -> str:
+    raw = json.dumps([created_at.isoformat(), str(id)])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, UUID]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), UUID(id)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError("Invalid cursor") from e
+
+
+def paginate(query: Select, model: Any, limit: int, cursor: str | None = None) -> Select:
+    """Order `query` newest first and start after `cursor`.
+
+    Fetches one row more than `limit` so `page_results` can tell whether
+    another page exists. Backed by (user_id, created_at, id) indexes, so every
+    page is an index range scan no matter how deep it is.
+    """
+    if cursor is not None:
+        created_at, id = decode_cursor(cursor)
+        query = query.where(tuple_(model.created_at, model.id) < tuple_(created_at, id))
+    return query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1)
+
+
+def page_results(rows: Sequence[T], limit: int) -> tuple[list[T], str | None]:
+    """Trim the extra row fetched by `paginate`. Returns (items, next_cursor)."""
+    items = list(rows[:limit])
+    if len(rows) <= limit:
+        return items, None
+    last = items[-1]
+    return items, encode_cursor(last.created_at, last.id)
+
+
+class Explain(Executable, ClauseElement):
+    """`EXPLAIN (FORMAT JSON)` of a statement, sent with its bound parameters."""
+
+    inherit_cache = False
+
+    def __init__(self, statement: Select):
+        self.statement = statement
+
+
+@compiles(Explain)
+def compile_explain(element: Explain, compiler, **kw) -> str:
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+async def count_rows(session: AsyncSession, query: Select, exact: bool = False) -> int:
+    """Count the rows matched by `query`.
+
+    By default this returns the planner's row estimate (an EXPLAIN, no scan),
+    which costs the same for every user; `exact=True` runs a real COUNT(*).
+    """
+    if exact:
+        result = await session.execute(select(func.count()).select_from(query.subquery()))
+        return result.scalar_one()
+
+    result = await session.execute(Explain(query))
+    plan = result.scalar_one()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+async def fetch_page(
+    session: AsyncSession,
+    query: Select,
+    model: Any,
+    limit: int,
+    cursor: str | None = None,
+    exact_total: bool = False,
+) -> Page:
+    """Fetch one page of `query` (a filtered select of `model`) plus its total."""
+    result = await session.execute(paginate(query, model, limit, cursor))
+    items, next_cursor = page_results(result.scalars().all(), limit)
+
+    if cursor is None and next_cursor is None:
+        # Everything fit on the first page, so the total is known for free
+        return Page(items, None, len(items), total_is_estimate=False)
+
+    total = await count_rows(session, query, exact=exact_total)
+    return Page(items, next_cursor, total, total_is_estimate=not exact_total)
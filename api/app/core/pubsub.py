@@ -0,0 +1,128 @@
+"""Postgres LISTEN/NOTIFY fan-out - one listener connection per process."""
+
+import asyncio
+import json
+import logging
+from typing import Any, Callable
+
+import asyncpg
+from sqlalchemy import func, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+Callback = Callable[[dict[str, Any]], None]
+
+
+async def notify(session: AsyncSession, channel: str, payload: dict[str, Any]) -> None:
+    """Queue a notification on the session's transaction; it is sent on commit."""
+    await session.execute(select(func.pg_notify(channel, json.dumps(payload, default=str))))
+
+
+class PgListener:
+    """Shares one dedicated LISTEN connection among every subscriber in the process.
+
+    Callbacks are registered per channel and called on the event loop with the
+    decoded JSON payload, so they must be quick and non-blocking. The
+    connection lives outside the SQLAlchemy pool and is re-established (and
+    every channel re-listened) if it drops; `on_reconnect` callbacks run after
+    that so subscribers can catch up on what they may have missed.
+    """
+
+    def __init__(self, dsn: str, reconnect_delay: float = 1.0):
+        self.dsn = dsn
+        self.reconnect_delay = reconnect_delay
+        self.received = 0
+        self.reconnects = 0
+        self._callbacks: dict[str, set[Callback]] = {}
+        self._reconnect_callbacks: set[Callable[[], None]] = set()
+        self._conn: asyncpg.Connection | None = None
+        self._task: asyncio.Task | None = None
+
+    @property
+    def connected(self) -> bool:
+        return self._conn is not None and not self._conn.is_closed()
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self.connected:
+            await self._conn.close()
+        self._conn = None
+
+    async def subscribe(self, channel: str, callback: Callback) -> None:
+        callbacks = self._callbacks.setdefault(channel, set())
+        callbacks.add(callback)
+        if len(callbacks) == 1 and self.connected:
+            await self._conn.add_listener(channel, self._dispatch)
+
+    async def unsubscribe(self, channel: str, callback: Callback) -> None:
+        callbacks = self._callbacks.get(channel)
+        if not callbacks:
+            return
+        callbacks.discard(callback)
+        if not callbacks:
+            del self._callbacks[channel]
+            if self.connected:
+                await self._conn.remove_listener(channel, self._dispatch)
+
+    def on_reconnect(self, callback: Callable[[], None]) -> None:
+        self._reconnect_callbacks.add(callback)
+
+    def _dispatch(self, connection, pid: int, channel: str, payload: str) -> None:
+        self.received += 1
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            logger.warning("Ignoring non-JSON notification on %s", channel)
+            return
+        for callback in list(self._callbacks.get(channel, ())):
+            try:
+                callback(message)
+            except Exception:
+                logger.exception("Notification callback failed on %s", channel)
+
+    async def _run(self) -> None:
+        first = True
+        while True:
+            lost = asyncio.Event()
+            try:
+                self._conn = await asyncpg.connect(self.dsn)
+                self._conn.add_termination_listener(lambda conn: lost.set())
+                for channel in list(self._callbacks):
+                    await self._conn.add_listener(channel, self._dispatch)
+                if not first:
+                    self.reconnects += 1
+                    for callback in list(self._reconnect_callbacks):
+                        callback()
+                first = False
+                await lost.wait()
+                logger.warning("Lost the notification listener connection, reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Notification listener failed to connect")
+            self._conn = None
+            await asyncio.sleep(self.reconnect_delay)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "connected": self.connected,
+            "channels": {channel: len(callbacks) for channel, callbacks in self._callbacks.items()},
+            "received": self.received,
+            "reconnects": self.reconnects,
+        }
+
+
+pg_listener = PgListener(
+    make_url(settings.database_url).set(drivername="postgresql").render_as_string(hide_password=False)
+)
@@ -0,0 +1,369 @@
+"""Token-bucket rate limiting - ASGI middleware and per-route dependencies."""
+
+import json
+import logging
+import math
+import re
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any
+
+from fastapi import HTTPException, Request, Response, status
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.security import decode_access_token
+from app.db import SessionLocal
+from app.models import RateLimitBucket
+
+logger = logging.getLogger(__name__)
+
+RATE_PATTERN = re.compile(r"^\s*(\d+)\s*/\s*(second|minute|hour|day)\s*$")
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+class InvalidRateError(ValueError):
+    """Raised for a rate that is not `<requests>/<second|minute|hour|day>`."""
+
+
+@dataclass(frozen=True)
+class Rate:
+    """`limit` requests per `period` seconds; also the bucket's burst size."""
+
+    limit: int
+    period: int
+
+    @classmethod
+    def parse(cls, value: str) -> "Rate":
+        match = RATE_PATTERN.match(value)
+        if match is None:
+            raise InvalidRateError(f"Invalid rate: {value!r}")
+        return cls(int(match.group(1)), PERIODS[match.group(2)])
+
+    @property
+    def per_second(self) -> float:
+        return self.limit / self.period
+
+    def scaled(self, factor: float) -> "Rate":
+        return Rate(max(int(self.limit * factor), 1), self.period)
+
+
+@dataclass(frozen=True)
+class RateLimitResult:
+    allowed: bool
+    limit: int
+    remaining: int
+    # Seconds until the bucket is full again
+    reset: float
+    # Seconds until the next request would be allowed (0 when allowed)
+    retry_after: float
+
+    def headers(self, rate: Rate) -> dict[str, str]:
+        headers = {
+            "RateLimit-Limit": str(self.limit),
+            "RateLimit-Remaining": str(self.remaining),
+            "RateLimit-Reset": str(math.ceil(self.reset)),
+            "RateLimit-Policy": f"{rate.limit};w={rate.period}",
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(math.ceil(self.retry_after), 1))
+        return headers
+
+
+def bucket_result(allowed: bool, tokens: float, rate: Rate) -> RateLimitResult:
+    """Describe a bucket holding `tokens` after a request was (not) let through."""
+    tokens = max(tokens, 0.0)
+    return RateLimitResult(
+        allowed=allowed,
+        limit=rate.limit,
+        remaining=int(tokens),
+        reset=(rate.limit - tokens) / rate.per_second,
+        retry_after=0.0 if allowed else (1 - tokens) / rate.per_second,
+    )
+
+
+class RateLimitBackend(ABC):
+    @abstractmethod
+    async def hit(self, key: str, rate: Rate) -> RateLimitResult:
+        """Take one token from `key`'s bucket if there is one."""
+
+
+class MemoryBackend(RateLimitBackend):
+    """Buckets in a per-process dict.
+
+    `hit` never awaits, so each check-and-take runs without interruption on
+    the event loop and needs no lock. Only the `max_keys` most recently used
+    buckets are kept; an evicted bucket starts full again, as an idle one
+    would be anyway.
+    """
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    async def hit(self, key: str, rate: Rate) -> RateLimitResult:
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (float(rate.limit), now))
+        tokens = min(rate.limit, tokens + (now - updated) * rate.per_second)
+
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return bucket_result(allowed, tokens, rate)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class PostgresBackend(RateLimitBackend):
+    """Buckets in the shared `rate_limit_buckets` table, consistent across workers.
+
+    Refill and take happen in one upsert; the row lock serializes concurrent
+    hits on the same key. Costs a round trip per check, so it is opt-in.
+
+    A bucket untouched for `idle_after` seconds has refilled completely and
+    is the same as no row, so such rows are deleted at most once every
+    `prune_interval` seconds.
+    """
+
+    def __init__(self, idle_after: float, prune_interval: float):
+        self.idle_after = idle_after
+        self.prune_interval = prune_interval
+        self.pruned = 0
+        self._next_prune = 0.0
+
+    @staticmethod
+    def refilled(rate: Rate):
+        elapsed = func.extract("epoch", func.now() - RateLimitBucket.updated_at)
+        return func.least(rate.limit, RateLimitBucket.tokens + elapsed * rate.per_second)
+
+    def take_statement(self, key: str, rate: Rate):
+        """Upsert taking one token; returns the tokens left, or no row if none was available."""
+        refilled = self.refilled(rate)
+        stmt = insert(RateLimitBucket).values(key=key, tokens=rate.limit - 1, updated_at=func.now())
+        return stmt.on_conflict_do_update(
+            index_elements=[RateLimitBucket.key],
+            set_={"tokens": refilled - 1, "updated_at": func.now()},
+            where=refilled >= 1,
+        ).returning(RateLimitBucket.tokens)
+
+    def prune_statement(self):
+        return (
+            delete(RateLimitBucket)
+            .where(RateLimitBucket.updated_at < func.now() - timedelta(seconds=self.idle_after))
+            .execution_options(synchronize_session=False)
+        )
+
+    async def hit(self, key: str, rate: Rate) -> RateLimitResult:
+        async with SessionLocal() as session:
+            tokens = (await session.execute(self.take_statement(key, rate))).scalar_one_or_none()
+            allowed = tokens is not None
+            if not allowed:
+                # No token left, so the row was not updated; read what it has
+                tokens = (
+                    await session.execute(select(self.refilled(rate)).where(RateLimitBucket.key == key))
+                ).scalar_one()
+            await session.commit()
+
+        await self.maybe_prune()
+        return bucket_result(allowed, tokens, rate)
+
+    async def maybe_prune(self) -> None:
+        now = time.monotonic()
+        if now < self._next_prune:
+            return
+        # Set before awaiting so concurrent hits don't prune too
+        self._next_prune = now + self.prune_interval
+        try:
+            async with SessionLocal() as session:
+                result = await session.execute(self.prune_statement())
+                await session.commit()
+        except Exception:
+            logger.exception("Failed to prune idle rate limit buckets")
+            return
+        self.pruned += result.rowcount
+
+
+class RateLimiter:
+    """Resolves configured limits and applies them through a backend.
+
+    Limits are named (`rate_limit_routes`); a per-user limit is multiplied
+    by the user's plan factor (`rate_limit_plan_multipliers`). If the shared
+    backend fails, requests are let through rather than rejected.
+    """
+
+    def __init__(
+        self,
+        backend: RateLimitBackend,
+        routes: dict[str, str],
+        plan_multipliers: dict[str, float],
+    ):
+        self.backend = backend
+        self.rates = {name: Rate.parse(value) for name, value in routes.items()}
+        self.plan_multipliers = plan_multipliers
+        self.allowed = 0
+        self.limited = 0
+        self.errors = 0
+
+    def rate(self, name: str, plan: str | None = None) -> Rate:
+        rate = self.rates.get(name, self.rates["default"])
+        if plan is not None:
+            rate = rate.scaled(self.plan_multipliers.get(plan, 1.0))
+        return rate
+
+    async def hit(self, name: str, key: str, plan: str | None = None) -> tuple[RateLimitResult | None, Rate]:
+        """Count a request against `name` for `key`. The result is None if the backend failed."""
+        rate = self.rate(name, plan)
+        try:
+            result = await self.backend.hit(f"{name}:{key}", rate)
+        except Exception:
+            self.errors += 1
+            logger.exception("Rate limit backend failed; letting the request through")
+            return None, rate
+
+        if result.allowed:
+            self.allowed += 1
+        else:
+            self.limited += 1
+        return result, rate
+
+    async def enforce(self, name: str, key: str, response: Response, plan: str | None = None) -> None:
+        """Dependency helper: set RateLimit-* headers or raise 429."""
+        result, rate = await self.hit(name, key, plan)
+        if result is None:
+            return
+        if not result.allowed:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Rate limit exceeded",
+                headers=result.headers(rate),
+            )
+        response.headers.update(result.headers(rate))
+
+    def stats(self) -> dict[str, Any]:
+        stats = {
+            "backend": type(self.backend).__name__,
+            "allowed": self.allowed,
+            "limited": self.limited,
+            "errors": self.errors,
+        }
+        if isinstance(self.backend, MemoryBackend):
+            stats["keys"] = len(self.backend)
+        if isinstance(self.backend, PostgresBackend):
+            stats["pruned"] = self.backend.pruned
+        return stats
+
+
+def client_ip(scope: Scope) -> str:
+    """The client address, read from X-Forwarded-For behind trusted proxies.
+
+    Only the entries appended by our own `rate_limit_forwarded_hops` proxies
+    can be trusted; anything to their left is whatever the client sent.
+    """
+    hops = settings.rate_limit_forwarded_hops
+    if hops > 0:
+        entries = [
+            entry.strip()
+            for name, value in scope.get("headers", ())
+            if name == b"x-forwarded-for"
+            for entry in value.decode("latin-1").split(",")
+            if entry.strip()
+        ]
+        if len(entries) >= hops:
+            return entries[-hops]
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def request_key(scope: Scope) -> str:
+    """`user:<sub>` for requests with a valid access token, else `ip:<address>`."""
+    for name, value in scope.get("headers", ()):
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer":
+                payload = decode_access_token(token.strip())
+                if payload is not None and payload.get("sub"):
+                    return f"user:{payload['sub']}"
+            break
+    return f"ip:{client_ip(scope)}"
+
+
+class RateLimitMiddleware:
+    """Applies the `default` limit to every HTTP request, per user or IP.
+
+    RateLimit-* headers are added unless a route-level limit already set
+    them, so clients see the tighter of the two.
+    """
+
+    def __init__(self, app: ASGIApp, limiter: "RateLimiter | None" = None):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        limiter = self.limiter or rate_limiter
+        if scope["type"] != "http" or not settings.rate_limit_enabled or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        result, rate = await limiter.hit("default", request_key(scope))
+        if result is None:
+            await self.app(scope, receive, send)
+            return
+
+        headers = result.headers(rate)
+        if not result.allowed:
+            body = json.dumps({"detail": "Rate limit exceeded"}).encode("utf-8")
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": status.HTTP_429_TOO_MANY_REQUESTS,
+                    "headers": [
+                        (b"content-type", b"application/json"),
+                        (b"content-length", str(len(body)).encode("latin-1")),
+                        *((k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers.items()),
+                    ],
+                }
+            )
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                present = {name.lower() for name, _ in message.get("headers", [])}
+                if b"ratelimit-limit" not in present:
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        *((k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers.items()),
+                    ]
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+
+def limit_by_ip(name: str):
+    """Dependency limiting a route per client IP (for unauthenticated routes)."""
+
+    async def dependency(request: Request, response: Response) -> None:
+        if settings.rate_limit_enabled:
+            await rate_limiter.enforce(name, f"ip:{client_ip(request.scope)}", response)
+
+    return dependency
+
+
+def make_backend() -> RateLimitBackend:
+    if settings.rate_limit_backend == "postgres":
+        idle_after = max(Rate.parse(value).period for value in settings.rate_limit_routes.values())
+        return PostgresBackend(idle_after, settings.rate_limit_prune_interval)
+    return MemoryBackend(settings.rate_limit_max_keys)
+
+
+rate_limiter = RateLimiter(make_backend(), settings.rate_limit_routes, settings.rate_limit_plan_multipliers)
@@ -0,0 +1,42 @@
+"""JSON responses - orjson as the default encoder, response models serialized once."""
+
+from typing import Mapping
+
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+from starlette.background import BackgroundTask
+from starlette.responses import Response
+
+__all__ = ["ModelResponse", "ORJSONResponse"]
+
+
+class ModelResponse(Response):
+    """A response model encoded straight to JSON bytes by pydantic-core.
+
+    For a model returned from an endpoint FastAPI dumps it to a dict,
+    validates that against `response_model` again, converts it to
+    JSON-compatible values and only then encodes it. Returning a
+    ModelResponse skips all of that; keep `response_model` on the route for
+    the OpenAPI schema.
+
+    FastAPI does not copy headers set on the endpoint's `Response` parameter
+    (the rate limit dependencies set some) into a response the endpoint
+    returns, so pass them in `headers`.
+    """
+
+    media_type = "application/json"
+
+    def __init__(
+        self,
+        content: BaseModel,
+        status_code: int = 200,
+        headers: Mapping[str, str] | None = None,
+        background: BackgroundTask | None = None,
+        *,
+        exclude_unset: bool = False,
+    ):
+        self.exclude_unset = exclude_unset
+        super().__init__(content, status_code, headers, background=background)
+
+    def render(self, content: BaseModel) -> bytes:
+        return content.__pydantic_serializer__.to_json(content, exclude_unset=self.exclude_unset)
@@ -1,15 +1,25 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Any
+from typing import Any, Callable, TypeVar
 
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 
+from app.core.cache import TTLCache
 from app.core.config import settings
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 ALGORITHM = "HS256"
 
+T = TypeVar("T")
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
@@ -19,6 +29,66 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+class PasswordHasherBusyError(Exception):
+    """Raised when too many password hashes are already queued."""
+
+
+class PasswordHasher:
+    """Runs bcrypt off the event loop on a small dedicated thread pool.
+
+    A bcrypt round takes tens to hundreds of milliseconds of CPU; run inline
+    it stalls every other request on the worker. bcrypt releases the GIL, so
+    threads hash in parallel. At most `max_pending` calls may be running or
+    queued; beyond that callers get `PasswordHasherBusyError` right away
+    instead of piling up behind a login storm.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self._executor: ThreadPoolExecutor | None = None
+
+    async def hash(self, password: str) -> str:
+        return await self._run(get_password_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    async def _run(self, fn: Callable[..., T], *args: Any) -> T:
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise PasswordHasherBusyError("Too many password checks in progress")
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="bcrypt")
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self.pending -= 1
+            self.completed += 1
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "workers": self.max_workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+
+password_hasher = PasswordHasher(settings.password_hash_workers, settings.password_hash_max_pending)
+
+
 def create_access_token(data: dict[str, Any], expires_delta: timedelta | None = None) -> str:
     to_encode = data.copy()
     if expires_delta:
@@ -30,9 +100,92 @@ def create_access_token(data: dict[str, Any], expires_delta: timedelta | None =
     return encoded_jwt
 
 
-def decode_access_token(token: str) -> dict[str, Any] | None:
+def _b64decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+
+def verify_token_hmac(token: str, secret: str) -> dict[str, Any] | None:
+    """Verify an HS256 token with the standard library alone.
+
+    Checks what python-jose checks for our tokens (algorithm, signature,
+    `exp` and `nbf`) at a fraction of the cost.
+    """
     try:
-        payload = jwt.decode(token, settings.secret_key, algorithms=[ALGORITHM])
-        return payload
+        signing_input, _, signature = token.rpartition(".")
+        header_segment, _, payload_segment = signing_input.partition(".")
+        header = json.loads(_b64decode(header_segment))
+        if header.get("alg") != ALGORITHM:
+            return None
+
+        expected = hmac.new(secret.encode("utf-8"), signing_input.encode("ascii"), hashlib.sha256)
+        if not hmac.compare_digest(expected.digest(), _b64decode(signature)):
+            return None
+
+        payload = json.loads(_b64decode(payload_segment))
+    except (ValueError, UnicodeError, AttributeError):
+        return None
+    if not isinstance(payload, dict):
+        return None
+
+    now = time.time()
+    try:
+        if "exp" in payload and float(payload["exp"]) <= now:
+            return None
+        if "nbf" in payload and float(payload["nbf"]) > now:
+            return None
+    except (TypeError, ValueError):
+        return None
+    return payload
+
+
+def verify_token_jose(token: str, secret: str) -> dict[str, Any] | None:
+    try:
+        return jwt.decode(token, secret, algorithms=[ALGORITHM])
     except JWTError:
         return None
+
+
+TOKEN_VERIFIERS = {
+    "jose": verify_token_jose,
+    "hmac": verify_token_hmac,
+}
+
+
+class TokenCache:
+    """Bounded LRU of verified token payloads, keyed by the token's digest.
+
+    Clients send the same token for days, so verifying it once per process is
+    enough. An entry never outlives the token's `exp` nor `ttl` seconds.
+    Invalid tokens are not cached.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self._entries: TTLCache[dict[str, Any]] = TTLCache(max_entries, ttl)
+
+    def decode(self, token: str, verify: Callable[[str, str], dict[str, Any] | None]) -> dict[str, Any] | None:
+        key = hashlib.sha256(token.encode("utf-8")).digest()
+        payload = self._entries.get(key)
+        if payload is None:
+            payload = verify(token, settings.secret_key)
+            if payload is None:
+                return None
+            ttl = self._entries.ttl
+            if "exp" in payload:
+                ttl = min(ttl, float(payload["exp"]) - time.time())
+            if ttl > 0:
+                self._entries.set(key, payload, ttl=ttl)
+        return dict(payload)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict[str, Any]:
+        return self._entries.stats()
+
+
+token_cache = TokenCache(settings.token_cache_max_entries, settings.token_cache_ttl)
+
+
+def decode_access_token(token: str) -> dict[str, Any] | None:
+    verify = TOKEN_VERIFIERS[settings.token_verifier]
+    return token_cache.decode(token, verify)
@@ -0,0 +1,23 @@
+"""Helpers for Server-Sent Events responses."""
+
+import json
+from typing import Any
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",  # disable proxy buffering (nginx)
+}
+
+
+def format_sse(data: Any, event: str | None = None, event_id: str | None = None) -> bytes:
+    """Encode one SSE message. Non-string data is sent as JSON."""
+    if not isinstance(data, str):
+        data = json.dumps(data, default=str)
+
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event is not None:
+        lines.append(f"event: {event}")
+    lines.extend(f"data: {line}" for line in data.split("\n"))
+    return ("\n".join(lines) + "\n\n").encode("utf-8")
@@ -1,4 +1,4 @@
-from typing import AsyncGenerator
+from typing import Any, AsyncGenerator, TypeVar
 
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase
@@ -7,13 +7,58 @@ from app.core.config import settings
 
 
 class Base(DeclarativeBase):
-    pass
+    # Fetch server-generated values (created_at, onupdate timestamps) with
+    # RETURNING in the INSERT/UPDATE itself instead of expiring them
+    __mapper_args__ = {"eager_defaults": True}
 
 
-engine = create_async_engine(settings.database_url, pool_pre_ping=True)
+T = TypeVar("T", bound=Base)
+
+
+engine = create_async_engine(
+    settings.database_url,
+    pool_pre_ping=True,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_timeout=settings.db_pool_timeout,
+)
 SessionLocal = async_sessionmaker(engine, expire_on_commit=False)
 
 
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
     async with SessionLocal() as session:
         yield session
+
+
+async def save(session: AsyncSession, obj: T) -> T:
+    """Insert or update `obj` and commit, without reading it back.
+
+    Server-generated columns come back through RETURNING during the flush
+    and sessions don't expire on commit, so `obj` is complete afterwards;
+    no `refresh()` round trip is needed.
+    """
+    session.add(obj)
+    await session.commit()
+    return obj
+
+
+async def release_connection(session: AsyncSession) -> None:
+    """End the session's transaction so its connection goes back to the pool.
+
+    A session holds a pooled connection from its first query until commit,
+    rollback or close. Call this before awaiting anything slow that is not DB
+    work (HTTP calls, queues); the session checks out a connection again on its
+    next query. Loaded objects stay usable since sessions don't expire on commit.
+    """
+    if session.in_transaction():
+        await session.commit()
+
+
+def get_pool_stats() -> dict[str, Any]:
+    pool = engine.pool
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "timeout": settings.db_pool_timeout,
+    }
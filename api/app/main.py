@@ -1,10 +1,55 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.core.compression import CompressionMiddleware
 from app.core.config import settings
+from app.core.http import close_http_client, init_http_client
+from app.core.pubsub import pg_listener
+from app.core.ratelimit import RateLimitMiddleware
+from app.core.responses import ORJSONResponse
+from app.core.security import password_hasher
+from app.modules.agent.usage import usage_recorder
+from app.modules.users.cache import user_cache
+from app.modules.wishlist.ingest import wishlist_ingestor
 from app.urls import api_router
 
-app = FastAPI(title=settings.app_name, debug=settings.debug)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await init_http_client()
+    await usage_recorder.start()
+    await wishlist_ingestor.start()
+    await user_cache.start()
+    await pg_listener.start()
+    yield
+    await pg_listener.stop()
+    await wishlist_ingestor.stop()
+    await usage_recorder.stop()
+    await close_http_client()
+    password_hasher.shutdown()
+
+
+app = FastAPI(
+    title=settings.app_name,
+    debug=settings.debug,
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
+
+# Compression sits innermost, right around the routes
+if settings.compression_enabled:
+    app.add_middleware(
+        CompressionMiddleware,
+        encodings=settings.compression_encodings,
+        levels=settings.compression_levels,
+        minimum_size=settings.compression_minimum_size,
+        thread_threshold=settings.compression_thread_threshold,
+    )
+
+# Rate limiting; added before CORS so CORS wraps it and 429s carry CORS headers
+app.add_middleware(RateLimitMiddleware)
 
 # CORS middleware
 app.add_middleware(
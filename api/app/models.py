@@ -1,8 +1,8 @@
 import uuid
-from datetime import datetime
+from datetime import date, datetime
 from enum import Enum
 
-from sqlalchemy import Boolean, DateTime, ForeignKey, Integer, String, Text, func
+from sqlalchemy import Boolean, Date, DateTime, Float, ForeignKey, Index, Integer, String, Text, func, text
 from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -28,6 +28,13 @@ class BuildStatus(str, Enum):
     FAILED = "failed"
 
 
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
 # Plan limits (calls per month)
 PLAN_LIMITS = {
     PlanType.FREE: 10,
@@ -36,6 +43,14 @@ PLAN_LIMITS = {
     PlanType.ENTERPRISE: -1,  # unlimited
 }
 
+# Whether results served from the agent cache count against the plan limit
+PLAN_BILLS_CACHE_HITS = {
+    PlanType.FREE: True,
+    PlanType.STARTER: True,
+    PlanType.BUSINESS: False,
+    PlanType.ENTERPRISE: False,
+}
+
 
 class User(Base):
     __tablename__ = "users"
@@ -58,6 +73,10 @@ class User(Base):
         default=PlanType.FREE.value,
     )
     is_active: Mapped[bool] = mapped_column(Boolean, default=True, server_default="true")
+    # Operators; set directly in the database, never through the API
+    is_admin: Mapped[bool] = mapped_column(Boolean, default=False, server_default="false")
+    # Bumped on every change to the user's builds; build listing ETags derive from it
+    builds_version: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
         server_default=func.now(),
@@ -92,7 +111,11 @@ class Build(Base):
         String(50),
         default=BuildStatus.PENDING.value,
     )
+    # Small outputs are stored inline; large ones in the blob store under
+    # `output_blob_key` with `output` left empty
     output: Mapped[str | None] = mapped_column(Text, nullable=True)
+    output_blob_key: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    output_size: Mapped[int | None] = mapped_column(Integer, nullable=True)
     error_message: Mapped[str | None] = mapped_column(Text, nullable=True)
     metadata_json: Mapped[dict | None] = mapped_column(
         "metadata",
@@ -121,6 +144,49 @@ class Build(Base):
     user: Mapped["User"] = relationship("User", back_populates="builds")
 
 
+class BuildJob(Base):
+    __tablename__ = "build_jobs"
+
+    id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        primary_key=True,
+        default=uuid.uuid4,
+    )
+    build_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("builds.id"),
+        index=True,
+    )
+    status: Mapped[str] = mapped_column(
+        String(50),
+        default=JobStatus.QUEUED.value,
+    )
+    attempts: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    max_attempts: Mapped[int] = mapped_column(Integer, default=3, server_default="3")
+    available_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+    )
+    locked_by: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    locked_until: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True),
+        nullable=True,
+    )
+    last_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+    )
+
+    # Relationships
+    build: Mapped["Build"] = relationship("Build")
+
+
 class AgentUsage(Base):
     __tablename__ = "agent_usages"
 
@@ -150,8 +216,76 @@ class AgentUsage(Base):
     user: Mapped["User"] = relationship("User", back_populates="agent_usages")
 
 
+class UsageCounter(Base):
+    """Units consumed by a user in a billing period (first day of the month)."""
+
+    __tablename__ = "usage_counters"
+
+    user_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    period: Mapped[date] = mapped_column(Date, primary_key=True)
+    units: Mapped[int] = mapped_column(Integer, default=0)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+    )
+
+
+class AgentCacheEntry(Base):
+    __tablename__ = "agent_cache_entries"
+
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    action: Mapped[str] = mapped_column(String(200))
+    website: Mapped[str] = mapped_column(String(500))
+    result: Mapped[dict] = mapped_column(JSONB)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+    )
+    expires_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        index=True,
+    )
+
+
+class AgentCallLease(Base):
+    """Marks the process running an agent call so other processes wait for its result."""
+
+    __tablename__ = "agent_call_leases"
+
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    owner: Mapped[str] = mapped_column(String(64))
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+
+
+class RateLimitBucket(Base):
+    """Token bucket shared by all processes (the `postgres` rate limit backend)."""
+
+    __tablename__ = "rate_limit_buckets"
+
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    tokens: Mapped[float] = mapped_column(Float)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+
+
 class WishlistItem(Base):
     __tablename__ = "wishlist_items"
+    __table_args__ = (
+        # One live signup per email, website and action (ingestion upserts on it)
+        Index(
+            "uq_wishlist_items_email_website_action",
+            "email",
+            "website",
+            "action",
+            unique=True,
+            postgresql_where=text("NOT is_deleted"),
+            sqlite_where=text("NOT is_deleted"),
+        ),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True),
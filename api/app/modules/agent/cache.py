@@ -0,0 +1,145 @@
+"""Agent result cache - in-process LRU backed by a shared Postgres table."""
+
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Any
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.models import AgentCacheEntry
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def canonicalize_url(website: str) -> str:
+    """Normalize a website so equivalent URLs share a cache entry.
+
+    Lowercases scheme and host, defaults the scheme to https, drops default
+    ports, fragments and trailing slashes, and sorts query parameters.
+    """
+    website = website.strip()
+    if "://" not in website:
+        website = f"https://{website}"
+
+    parts = urlsplit(website)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+
+    path = parts.path.rstrip("/") or "/"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+def hash_metadata(metadata: dict[str, Any] | None) -> str:
+    """Stable hash of request metadata, independent of key order."""
+    encoded = json.dumps(metadata or {}, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def make_cache_key(action: str, website: str, metadata: dict[str, Any] | None) -> str:
+    raw = f"{action}\n{canonicalize_url(website)}\n{hash_metadata(metadata)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class AgentResultCache:
+    """Two-tier cache of agent results.
+
+    Lookups hit the local LRU first and fall back to the `agent_cache_entries`
+    table shared by every API process and worker.
+    """
+
+    def __init__(self, max_entries: int, ttl: int):
+        self.ttl = ttl
+        self.local: TTLCache[dict[str, Any]] = TTLCache(max_entries=max_entries, ttl=ttl)
+        self.shared_hits = 0
+        self.shared_misses = 0
+
+    async def get(
+        self,
+        session: AsyncSession,
+        key: str,
+        fresh_since: datetime | None = None,
+    ) -> dict[str, Any] | None:
+        """Look up a result; `fresh_since` only accepts shared entries stored after it."""
+        if fresh_since is None:
+            result = self.local.get(key)
+            if result is not None:
+                return result
+
+        query = (
+            select(AgentCacheEntry.result, AgentCacheEntry.expires_at)
+            .where(AgentCacheEntry.key == key)
+            .where(AgentCacheEntry.expires_at > func.now())
+        )
+        if fresh_since is not None:
+            query = query.where(AgentCacheEntry.created_at >= fresh_since)
+        row = await session.execute(query)
+        entry = row.one_or_none()
+        if entry is None:
+            self.shared_misses += 1
+            return None
+
+        self.shared_hits += 1
+        remaining = (entry.expires_at - datetime.now(timezone.utc)).total_seconds()
+        self.local.set(key, entry.result, ttl=max(remaining, 0))
+        return entry.result
+
+    async def set(
+        self,
+        session: AsyncSession,
+        key: str,
+        action: str,
+        website: str,
+        result: dict[str, Any],
+    ) -> None:
+        self.local.set(key, result)
+
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=self.ttl)
+        stmt = insert(AgentCacheEntry).values(
+            key=key,
+            action=action,
+            website=canonicalize_url(website)[:500],
+            result=result,
+            expires_at=expires_at,
+        )
+        await session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[AgentCacheEntry.key],
+                set_={
+                    "result": stmt.excluded.result,
+                    "created_at": func.now(),
+                    "expires_at": stmt.excluded.expires_at,
+                },
+            )
+        )
+        await session.commit()
+
+    async def purge_expired(self, session: AsyncSession) -> int:
+        """Delete expired rows from the shared table."""
+        result = await session.execute(
+            delete(AgentCacheEntry).where(AgentCacheEntry.expires_at <= func.now())
+        )
+        await session.commit()
+        return result.rowcount
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "enabled": settings.agent_cache_enabled,
+            "local": self.local.stats(),
+            "shared_hits": self.shared_hits,
+            "shared_misses": self.shared_misses,
+        }
+
+
+result_cache = AgentResultCache(
+    max_entries=settings.agent_cache_max_entries,
+    ttl=settings.agent_cache_ttl,
+)
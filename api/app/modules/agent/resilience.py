@@ -0,0 +1,220 @@
+"""Circuit breaker and adaptive concurrency limit for agent service calls."""
+
+import asyncio
+import time
+from collections import deque
+from typing import Any
+
+from app.core.config import settings
+
+
+def is_upstream_failure(status_code: int | None) -> bool:
+    """Timeouts, connection errors (no status) and 5xx count as failures."""
+    return status_code is None or status_code >= 500
+
+
+class CircuitBreaker:
+    """Fails fast while the agent service is unhealthy.
+
+    Closed: calls go through and outcomes are kept for a rolling window. When
+    the failure rate over the window reaches the threshold the breaker opens.
+    Open: calls are rejected until `open_seconds` pass.
+    Half-open: a few probe calls go through; a success closes the breaker and
+    a failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: float,
+        min_calls: int,
+        window: float,
+        open_seconds: float,
+        half_open_calls: int,
+    ):
+        self.failure_threshold = failure_threshold
+        self.min_calls = min_calls
+        self.window = window
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.rejected = 0
+        self.times_opened = 0
+        self._outcomes: deque[tuple[float, bool]] = deque()
+        self._probes = 0
+
+    def retry_after(self) -> float:
+        return max(self.opened_at + self.open_seconds - time.monotonic(), 0.0)
+
+    def before_call(self) -> float | None:
+        """Return None if a call may go through, otherwise seconds to retry after."""
+        if self.state == self.OPEN:
+            retry_after = self.retry_after()
+            if retry_after > 0:
+                self.rejected += 1
+                return retry_after
+            self.state = self.HALF_OPEN
+            self._probes = 0
+
+        if self.state == self.HALF_OPEN:
+            if self._probes >= self.half_open_calls:
+                self.rejected += 1
+                return 1.0
+            self._probes += 1
+
+        return None
+
+    def record(self, success: bool | None) -> None:
+        """Record a call outcome; None means the call was abandoned."""
+        if self.state == self.HALF_OPEN:
+            self._probes = max(self._probes - 1, 0)
+            if success is True:
+                self._close()
+            elif success is False:
+                self._open()
+            return
+
+        if success is None:
+            return
+
+        now = time.monotonic()
+        self._outcomes.append((now, success))
+        self._trim(now)
+
+        if self.state == self.CLOSED and len(self._outcomes) >= self.min_calls:
+            if self.failure_rate() >= self.failure_threshold:
+                self._open()
+
+    def failure_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        failures = sum(1 for _, ok in self._outcomes if not ok)
+        return failures / len(self._outcomes)
+
+    def _trim(self, now: float) -> None:
+        while self._outcomes and self._outcomes[0][0] < now - self.window:
+            self._outcomes.popleft()
+
+    def _open(self) -> None:
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
+        self._outcomes.clear()
+
+    def _close(self) -> None:
+        self.state = self.CLOSED
+        self._outcomes.clear()
+
+    def stats(self) -> dict[str, Any]:
+        self._trim(time.monotonic())
+        return {
+            "state": self.state,
+            "failure_rate": round(self.failure_rate(), 3),
+            "window_calls": len(self._outcomes),
+            "retry_after": round(self.retry_after(), 1) if self.state == self.OPEN else 0,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+        }
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD cap on concurrent upstream calls.
+
+    Every healthy response raises the limit by 1/limit (about +1 per round of
+    calls). Timeouts, overload responses (429/503/504) and responses slower
+    than the latency target cut it by `backoff`. Callers over the limit wait up
+    to `queue_timeout` seconds for a slot and are then rejected.
+    """
+
+    OVERLOAD_STATUSES = {429, 503, 504}
+
+    def __init__(
+        self,
+        initial: int,
+        minimum: int,
+        maximum: int,
+        queue_timeout: float,
+        latency_target: float,
+        backoff: float = 0.5,
+    ):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.queue_timeout = queue_timeout
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.in_flight = 0
+        self.rejected = 0
+        self._waiters: deque[asyncio.Future] = deque()
+
+    async def acquire(self) -> bool:
+        """Take a slot, waiting up to `queue_timeout`. Returns False if rejected."""
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return True
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout=self.queue_timeout)
+            return True
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                return True  # handed a slot just as the wait timed out
+            self.rejected += 1
+            return False
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def release(self, latency: float | None = None, status_code: int | None = None) -> None:
+        """Free a slot and adapt the limit; latency None means abandoned."""
+        self.in_flight -= 1
+
+        if latency is not None:
+            overloaded = (
+                status_code is None
+                or status_code in self.OVERLOAD_STATUSES
+                or latency > self.latency_target
+            )
+            if overloaded:
+                self.limit = max(self.minimum, self.limit * self.backoff)
+            elif status_code < 500:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "limit": int(self.limit),
+            "min": self.minimum,
+            "max": self.maximum,
+            "in_flight": self.in_flight,
+            "waiting": len(self._waiters),
+            "rejected": self.rejected,
+        }
+
+
+circuit_breaker = CircuitBreaker(
+    failure_threshold=settings.agent_breaker_failure_threshold,
+    min_calls=settings.agent_breaker_min_calls,
+    window=settings.agent_breaker_window,
+    open_seconds=settings.agent_breaker_open_seconds,
+    half_open_calls=settings.agent_breaker_half_open_calls,
+)
+
+concurrency_limiter = AdaptiveConcurrencyLimiter(
+    initial=settings.agent_concurrency_initial,
+    minimum=settings.agent_concurrency_min,
+    maximum=settings.agent_concurrency_max,
+    queue_timeout=settings.agent_concurrency_queue_timeout,
+    latency_target=settings.agent_latency_target,
+)
@@ -2,12 +2,15 @@ from datetime import datetime
 from typing import Any
 from uuid import UUID
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+from app.core.config import settings
 
 
 class AgentRequest(BaseModel):
     website: str
     metadata: dict[str, Any] | None = None
+    cache: bool = True
 
 
 class AgentResponse(BaseModel):
@@ -15,6 +18,22 @@ class AgentResponse(BaseModel):
     action: str
     result: dict[str, Any] | None = None
     error: str | None = None
+    cached: bool = False
+
+
+class AgentBatchRequest(BaseModel):
+    websites: list[str] = Field(min_length=1, max_length=settings.agent_batch_max_items)
+    metadata: dict[str, Any] | None = None
+    cache: bool = True
+
+
+class AgentBatchItem(BaseModel):
+    index: int
+    website: str
+    success: bool
+    result: dict[str, Any] | None = None
+    error: str | None = None
+    cached: bool = False
 
 
 class AgentUsageResponse(BaseModel):
@@ -27,3 +46,11 @@ class AgentUsageResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class AgentUsageHistoryResponse(BaseModel):
+    usages: list[AgentUsageResponse]
+    total: int
+    total_is_estimate: bool
+    limit: int
+    next_cursor: str | None
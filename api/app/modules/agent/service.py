@@ -1,15 +1,50 @@
 """Agent Service - Tracks and proxies calls to the agent service."""
 
+import asyncio
+import codecs
 import httpx
-from typing import Any
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Any, AsyncIterator
 from uuid import UUID
 
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
-from app.models import AgentUsage, User
+from app.core.http import get_action_timeout, get_http_client
+from app.core.pagination import Page, fetch_page
+from app.core.sse import format_sse
+from app.db import SessionLocal, release_connection
+from app.models import AgentUsage, PLAN_BILLS_CACHE_HITS, PlanType, User
 
-from app.modules.users.controllers import check_user_can_make_call
+from app.modules.users.controllers import current_period, refund_usage_units, reserve_usage_units
+
+from .cache import make_cache_key, result_cache
+from .resilience import CircuitBreaker, circuit_breaker, concurrency_limiter, is_upstream_failure
+from .singleflight import singleflight
+from .usage import usage_recorder
+
+logger = logging.getLogger(__name__)
+
+# First item of a generator that reserved quota; see `start_reserved`
+RESERVED = object()
+
+
+async def start_reserved(stream: AsyncIterator[Any]) -> AsyncIterator[Any]:
+    """Run `stream` up to its RESERVED marker and return it.
+
+    Errors raised before the marker (e.g. quota exceeded) propagate here, so
+    they can still become a regular error response. Once started, the
+    generator's finally runs even if the response body is never iterated
+    (the client left before the first byte): asyncio closes started async
+    generators when they are garbage collected.
+    """
+    await anext(stream)
+    return stream
 
 
 class AgentServiceError(Exception):
@@ -33,12 +68,45 @@ class UsageLimitExceededError(AgentServiceError):
         )
 
 
+class AgentUnavailableError(AgentServiceError):
+    """Raised when a call is rejected before reaching the agent service."""
+
+    def __init__(self, message: str, retry_after: float):
+        self.retry_after = retry_after
+        super().__init__(message, status_code=503)
+
+
+@dataclass
+class AgentCallResult:
+    """Result of an agent call and where it came from."""
+
+    result: dict[str, Any] | None
+    cached: bool = False
+    coalesced: bool = False
+
+
+class UpstreamCall:
+    """Outcome of one guarded upstream call."""
+
+    def __init__(self) -> None:
+        self.started_at = time.monotonic()
+        self.status_code: int | None = None
+        self.latency: float | None = None
+
+    def observe(self, status_code: int) -> None:
+        """Record the upstream status; latency is measured to the first observation."""
+        if self.latency is None:
+            self.status_code = status_code
+            self.latency = time.monotonic() - self.started_at
+
+
 class AgentService:
     """Service class to handle agent API calls with usage tracking."""
 
-    def __init__(self, session: AsyncSession):
+    def __init__(self, session: AsyncSession, client: httpx.AsyncClient | None = None):
         self.session = session
         self.base_url = settings.agent_service_url
+        self.client = client or get_http_client()
 
     async def _record_usage(
         self,
@@ -47,28 +115,26 @@ class AgentService:
         units: int = 1,
         metadata: dict[str, Any] | None = None,
         response_status: int | None = None,
-    ) -> AgentUsage:
-        """Record an agent usage entry."""
-        usage = AgentUsage(
-            user_id=user_id,
-            action=action,
-            units_consumed=units,
-            request_metadata=metadata,
-            response_status=response_status,
+    ) -> None:
+        """Queue an agent usage entry; it is written in the next batch."""
+        await usage_recorder.record(
+            self._usage_row(user_id, action, units, metadata, response_status)
         )
-        self.session.add(usage)
-        await self.session.commit()
-        await self.session.refresh(usage)
-        return usage
 
-    async def _check_limits(self, user: User) -> tuple[int, int]:
-        """Check if user can make a call. Returns (limit, used)."""
-        can_call, limit, used = await check_user_can_make_call(self.session, user)
+    async def _reserve(self, user: User, units: int = 1) -> date:
+        """Claim `units` from the user's quota. Returns the billing period."""
+        period = current_period()
+        reserved, limit, used = await reserve_usage_units(self.session, user, units, period)
 
-        if not can_call:
+        if not reserved:
             raise UsageLimitExceededError(limit=limit, used=used)
 
-        return limit, used
+        return period
+
+    async def _refund(self, user_id: UUID, units: int, period: date) -> None:
+        """Give back reserved units, with a fresh session so it works after cancellation."""
+        async with SessionLocal() as session:
+            await refund_usage_units(session, user_id, units, period)
 
     async def call_agent(
         self,
@@ -76,18 +142,108 @@ class AgentService:
         action: str,
         website: str,
         metadata: dict[str, Any] | None = None,
-    ) -> dict[str, Any]:
+        use_cache: bool = True,
+    ) -> AgentCallResult:
         """
         Make a call to the agent service.
 
-        1. Check user's usage limits
-        2. Make the call to the agent service
-        3. Record the usage
-        4. Return the response
+        1. Serve the result from the cache when possible
+        2. Reserve a unit of the user's quota
+        3. Make the call to the agent service, or wait for an identical
+           call that is already in flight
+        4. Refund the unit if the call failed, and record the usage
+        5. Return the response
+
+        With `use_cache=False` a cached result is never served, but the fresh
+        result still refreshes the cache.
+        """
+        cache_key = make_cache_key(action, website, metadata)
+
+        if use_cache and settings.agent_cache_enabled:
+            cached = await result_cache.get(self.session, cache_key)
+            if cached is not None:
+                return await self._serve_cached(user, action, website, metadata, cached)
+
+        # Fail fast while the agent service is known to be down, then reserve
+        self._fail_fast()
+        period = await self._reserve(user)
+        # Don't hold a pooled connection while waiting on the agent service
+        await release_connection(self.session)
+
+        try:
+            response_status, result, error, coalesced = await self._fetch_coalesced(
+                cache_key, action, website, metadata
+            )
+        except BaseException:
+            await asyncio.shield(self._refund(user.id, 1, period))
+            raise
+
+        if error:
+            await self._refund(user.id, 1, period)
+
+        # Record usage (always record; failed calls are not billed)
+        usage_metadata = {"website": website, **(metadata or {})}
+        if coalesced:
+            usage_metadata["coalesced"] = True
+        await self._record_usage(
+            user_id=user.id,
+            action=action,
+            units=0 if error else 1,
+            metadata=usage_metadata,
+            response_status=response_status,
+        )
+
+        if error:
+            raise AgentServiceError(error, status_code=response_status or 500)
+
+        return AgentCallResult(result=result, coalesced=coalesced)
+
+    def _fail_fast(self) -> None:
+        """Reject right away while the circuit breaker is open."""
+        if circuit_breaker.state == CircuitBreaker.OPEN and circuit_breaker.retry_after() > 0:
+            raise AgentUnavailableError(
+                "Agent service is temporarily unavailable",
+                retry_after=circuit_breaker.retry_after(),
+            )
+
+    @asynccontextmanager
+    async def _upstream_call(self) -> AsyncIterator[UpstreamCall]:
+        """Admit a call through the circuit breaker and the concurrency limiter.
+
+        The call's observed status and latency feed back into both on exit; a
+        call that never observed a status (e.g. cancelled) only frees its slot.
         """
-        # Check limits first
-        await self._check_limits(user)
+        retry_after = circuit_breaker.before_call()
+        if retry_after is not None:
+            raise AgentUnavailableError("Agent service is temporarily unavailable", retry_after)
 
+        if not await concurrency_limiter.acquire():
+            circuit_breaker.record(None)
+            raise AgentUnavailableError("Agent service is at its concurrency limit", retry_after=1.0)
+
+        call = UpstreamCall()
+        try:
+            yield call
+        except httpx.TimeoutException:
+            call.observe(504)
+            raise
+        except httpx.RequestError:
+            call.observe(503)
+            raise
+        finally:
+            concurrency_limiter.release(call.latency, call.status_code)
+            if call.latency is None:
+                circuit_breaker.record(None)
+            else:
+                circuit_breaker.record(not is_upstream_failure(call.status_code))
+
+    async def _fetch(
+        self,
+        action: str,
+        website: str,
+        metadata: dict[str, Any] | None,
+    ) -> tuple[int | None, dict[str, Any] | None, str | None]:
+        """Call the agent service. Returns (status, result, error)."""
         # Prepare request data
         request_data = {
             "website": website,
@@ -98,11 +254,12 @@ class AgentService:
         result = None
         error = None
 
-        try:
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                response = await client.post(
+        async with self._upstream_call() as call:
+            try:
+                response = await self.client.post(
                     f"{self.base_url}/v0/agent/{action}",
                     json=request_data,
+                    timeout=get_action_timeout(action),
                 )
                 response_status = response.status_code
 
@@ -111,41 +268,337 @@ class AgentService:
                 else:
                     error = response.text
 
+            except httpx.TimeoutException:
+                response_status = 504
+                error = "Agent service timeout"
+            except httpx.RequestError as e:
+                response_status = 503
+                error = f"Agent service unavailable: {str(e)}"
+
+            call.observe(response_status)
+
+        return response_status, result, error
+
+    async def _fetch_coalesced(
+        self,
+        cache_key: str,
+        action: str,
+        website: str,
+        metadata: dict[str, Any] | None,
+    ) -> tuple[int | None, dict[str, Any] | None, str | None, bool]:
+        """Call the agent service, sharing the call with identical in-flight ones.
+
+        Returns (status, result, error, coalesced).
+        """
+
+        async def fetch_and_store():
+            response_status, result, error = await self._fetch(action, website, metadata)
+            if not error and settings.agent_cache_enabled and isinstance(result, dict):
+                # Best effort: a failed write must not lose a successful call.
+                # Fresh session: the call outlives the request that started it
+                try:
+                    async with SessionLocal() as session:
+                        await result_cache.set(session, cache_key, action, website, result)
+                except Exception:
+                    logger.exception("Failed to cache the %s result for %s", action, website)
+            return response_status, result, error
+
+        async def lookup(since: datetime):
+            async with SessionLocal() as session:
+                result = await result_cache.get(session, cache_key, fresh_since=since)
+            return None if result is None else (200, result, None)
+
+        if not settings.agent_singleflight_enabled:
+            return *(await fetch_and_store()), False
+
+        (response_status, result, error), coalesced = await singleflight.do(
+            cache_key, fetch_and_store, lookup, timeout=get_action_timeout(action).read
+        )
+        return response_status, result, error, coalesced
+
+    async def stream_agent(
+        self,
+        user: User,
+        action: str,
+        website: str,
+        metadata: dict[str, Any] | None = None,
+    ) -> AsyncIterator[bytes]:
+        """
+        Reserve quota and return an iterator of SSE messages proxying the
+        agent response as it arrives.
+
+        The breaker and quota are checked before the first byte so a 503 or
+        429 can still be returned as a regular error response. Streamed calls
+        bypass the result cache, and the stream itself never uses the request
+        session.
+        """
+        self._fail_fast()
+        return await start_reserved(self._stream(user, action, website, metadata))
+
+    async def _stream(
+        self,
+        user: User,
+        action: str,
+        website: str,
+        metadata: dict[str, Any] | None,
+    ) -> AsyncIterator[bytes]:
+        period = await self._reserve(user)
+        await release_connection(self.session)
+        request_data = {
+            "website": website,
+            "metadata": metadata or {},
+        }
+        response_status = None
+        record_usage = True
+        billed = False
+
+        try:
+            # From here on the finally below settles the reserved unit
+            yield RESERVED
+            async with self._upstream_call() as call, self.client.stream(
+                "POST",
+                f"{self.base_url}/v0/agent/{action}",
+                json=request_data,
+                timeout=get_action_timeout(action),
+            ) as response:
+                response_status = response.status_code
+                # Latency for the concurrency limit is time to first byte
+                call.observe(response_status)
+
+                if not response.is_success:
+                    # Only keep the head of the error body in memory
+                    body = b""
+                    async for chunk in response.aiter_bytes():
+                        body += chunk
+                        if len(body) >= settings.agent_stream_error_max_bytes:
+                            break
+                    error = body[: settings.agent_stream_error_max_bytes].decode("utf-8", "replace")
+                    yield format_sse({"status": response_status, "error": error}, event="error")
+                    return
+
+                # The agent accepted the call; it is billed even if the client leaves
+                billed = True
+                yield format_sse({"action": action, "status": response_status}, event="start")
+
+                # Chunks are forwarded as soon as they are read (no re-chunking,
+                # which would hold back small chunks), so memory per request stays
+                # bounded by the socket read size. The decoder keeps multi-byte
+                # characters split across chunks intact.
+                decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+                async for chunk in response.aiter_bytes():
+                    text = decoder.decode(chunk)
+                    if text:
+                        yield format_sse(text, event="chunk")
+                text = decoder.decode(b"", final=True)
+                if text:
+                    yield format_sse(text, event="chunk")
+
+                yield format_sse({"action": action}, event="done")
+
+        except AgentUnavailableError as e:
+            # Rejected before reaching the agent service; nothing to bill
+            record_usage = False
+            yield format_sse(
+                {"status": e.status_code, "error": e.message, "retry_after": e.retry_after},
+                event="error",
+            )
         except httpx.TimeoutException:
             response_status = 504
-            error = "Agent service timeout"
+            yield format_sse({"status": 504, "error": "Agent service timeout"}, event="error")
         except httpx.RequestError as e:
             response_status = 503
-            error = f"Agent service unavailable: {str(e)}"
+            yield format_sse(
+                {"status": 503, "error": f"Agent service unavailable: {str(e)}"},
+                event="error",
+            )
+        except (asyncio.CancelledError, GeneratorExit):
+            # Client went away mid-stream; 499 marks the call as aborted
+            response_status = 499
+            raise
+        finally:
+            # Shielded so the refund and usage still go through when the
+            # client went away
+            await asyncio.shield(
+                self._finish_stream(
+                    user, action, website, metadata, period, response_status, billed, record_usage
+                )
+            )
+
+    async def _finish_stream(
+        self,
+        user: User,
+        action: str,
+        website: str,
+        metadata: dict[str, Any] | None,
+        period: date,
+        response_status: int | None,
+        billed: bool,
+        record_usage: bool,
+    ) -> None:
+        if not billed:
+            await self._refund(user.id, 1, period)
+        if record_usage:
+            await self._record_usage(
+                user_id=user.id,
+                action=action,
+                units=1 if billed else 0,
+                metadata={"website": website, "stream": True, **(metadata or {})},
+                response_status=response_status,
+            )
+
+    async def _serve_cached(
+        self,
+        user: User,
+        action: str,
+        website: str,
+        metadata: dict[str, Any] | None,
+        result: dict[str, Any],
+    ) -> AgentCallResult:
+        """Return a cached result, billing it only if the user's plan says so."""
+        billed = PLAN_BILLS_CACHE_HITS.get(PlanType(user.plan), True)
+        if billed:
+            await self._reserve(user)
+
+        await self._record_usage(
+            user_id=user.id,
+            action=action,
+            units=1 if billed else 0,
+            metadata={"website": website, "cache": "hit", **(metadata or {})},
+            response_status=200,
+        )
+        return AgentCallResult(result=result, cached=True)
+
+    async def batch_call_agent(
+        self,
+        user: User,
+        action: str,
+        websites: list[str],
+        metadata: dict[str, Any] | None = None,
+        use_cache: bool = True,
+    ) -> AsyncIterator[dict[str, Any]]:
+        """
+        Reserve quota once for the whole batch and return an iterator of
+        per-website results in completion order.
+
+        Items run concurrently up to `agent_batch_concurrency` and each item's
+        usage is recorded as it finishes. Units for failed, free or unfinished
+        items (the client went away) are refunded when the batch ends.
+        """
+        self._fail_fast()
+        return await start_reserved(self._run_batch(user, action, websites, metadata, use_cache))
+
+    async def _run_batch(
+        self,
+        user: User,
+        action: str,
+        websites: list[str],
+        metadata: dict[str, Any] | None,
+        use_cache: bool,
+    ) -> AsyncIterator[dict[str, Any]]:
+        period = await self._reserve(user, units=len(websites))
+        await release_connection(self.session)
+        semaphore = asyncio.Semaphore(settings.agent_batch_concurrency)
+        billed = 0
+
+        async def run_item(index: int, website: str) -> dict[str, Any]:
+            nonlocal billed
+            async with semaphore:
+                item, units = await self._batch_item(
+                    user, action, index, website, metadata, use_cache
+                )
+            billed += units
+            return item
 
-        # Record usage (always record, even on failure)
+        tasks: list[asyncio.Task] = []
+        try:
+            # From here on the finally below refunds the unused units
+            yield RESERVED
+            tasks = [
+                asyncio.create_task(run_item(index, website))
+                for index, website in enumerate(websites)
+            ]
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await asyncio.shield(self._refund(user.id, len(websites) - billed, period))
+
+    async def _batch_item(
+        self,
+        user: User,
+        action: str,
+        index: int,
+        website: str,
+        metadata: dict[str, Any] | None,
+        use_cache: bool,
+    ) -> tuple[dict[str, Any], int]:
+        """Run one batch item and record its usage. Returns (item, billed units)."""
+        item = {"index": index, "website": website, "success": False}
+        usage_metadata = {"website": website, "batch": True, **(metadata or {})}
+        cache_key = make_cache_key(action, website, metadata)
+
+        if use_cache and settings.agent_cache_enabled:
+            async with SessionLocal() as session:
+                cached = await result_cache.get(session, cache_key)
+            if cached is not None:
+                units = 1 if PLAN_BILLS_CACHE_HITS.get(PlanType(user.plan), True) else 0
+                await self._record_usage(
+                    user_id=user.id,
+                    action=action,
+                    units=units,
+                    metadata={**usage_metadata, "cache": "hit"},
+                    response_status=200,
+                )
+                return {**item, "success": True, "result": cached, "cached": True}, units
+
+        try:
+            response_status, result, error, coalesced = await self._fetch_coalesced(
+                cache_key, action, website, metadata
+            )
+        except AgentUnavailableError as e:
+            # Rejected before reaching the agent service; nothing to record
+            return {**item, "error": e.message}, 0
+
+        units = 0 if error else 1
+        if coalesced:
+            usage_metadata["coalesced"] = True
         await self._record_usage(
             user_id=user.id,
             action=action,
-            units=1,
-            metadata={"website": website, **(metadata or {})},
+            units=units,
+            metadata=usage_metadata,
             response_status=response_status,
         )
 
         if error:
-            raise AgentServiceError(error, status_code=response_status or 500)
+            return {**item, "error": error}, units
+        return {**item, "success": True, "result": result}, units
 
-        return result
+    @staticmethod
+    def _usage_row(
+        user_id: UUID,
+        action: str,
+        units: int,
+        metadata: dict[str, Any] | None,
+        response_status: int | None,
+    ) -> dict[str, Any]:
+        return {
+            "user_id": user_id,
+            "action": action,
+            "units_consumed": units,
+            "request_metadata": metadata,
+            "response_status": response_status,
+        }
 
     async def get_user_usage_history(
         self,
         user_id: UUID,
         limit: int = 50,
-        offset: int = 0,
-    ) -> list[AgentUsage]:
-        """Get usage history for a user."""
-        from sqlalchemy import select
-
-        result = await self.session.execute(
-            select(AgentUsage)
-            .where(AgentUsage.user_id == user_id)
-            .order_by(AgentUsage.created_at.desc())
-            .limit(limit)
-            .offset(offset)
-        )
-        return list(result.scalars().all())
+        cursor: str | None = None,
+        exact_total: bool = False,
+    ) -> Page[AgentUsage]:
+        """Get a page of a user's usage history, newest first."""
+        query = select(AgentUsage).where(AgentUsage.user_id == user_id)
+        return await fetch_page(self.session, query, AgentUsage, limit, cursor, exact_total)
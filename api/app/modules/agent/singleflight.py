@@ -0,0 +1,155 @@
+"""Single-flight coalescing of identical in-flight agent calls."""
+
+import asyncio
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, TypeVar
+
+from sqlalchemy import delete, func
+from sqlalchemy.dialects.postgresql import insert
+
+from app.core.config import settings
+from app.db import SessionLocal
+from app.models import AgentCallLease
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Lets identical calls share one execution.
+
+    Within a process, the first caller for a key starts the call as a task and
+    later callers await the same task. With `distributed=True` the single caller
+    per process also takes a lease row in `agent_call_leases`, so processes
+    coalesce too: the lease holder runs the call and stores the result in the
+    shared cache, while the others poll the cache until the result shows up or
+    the lease is released or expires. Leases are taken and released in short
+    transactions, so no connection is held during the call.
+
+    A lease lasts as long as the call may take (`timeout`) plus
+    `agent_singleflight_lease_margin`, so it cannot expire under a holder
+    that is still waiting on a slow action; waiting processes give up on
+    the holder after the same time.
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[str, asyncio.Task] = {}
+        self.leaders = 0
+        self.coalesced_local = 0
+        self.coalesced_remote = 0
+
+    async def do(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[T]],
+        lookup: Callable[[datetime], Awaitable[T | None]] | None = None,
+        timeout: float | None = None,
+    ) -> tuple[T, bool]:
+        """Run `fn` once per key. Returns (result, coalesced).
+
+        `lookup(since)` reads a result another process published after `since`;
+        it and `timeout`, the longest `fn` may run (`agent_timeout` if not
+        given), are only used in distributed mode.
+        """
+        task = self._calls.get(key)
+        if task is not None:
+            self.coalesced_local += 1
+            result, _ = await asyncio.shield(task)
+            return result, True
+
+        if settings.agent_singleflight_distributed and lookup is not None:
+            if timeout is None:
+                timeout = settings.agent_timeout
+            lease_seconds = timeout + settings.agent_singleflight_lease_margin
+            task = asyncio.create_task(self._do_distributed(key, fn, lookup, lease_seconds))
+        else:
+            task = asyncio.create_task(self._run(fn))
+        self._calls[key] = task
+        task.add_done_callback(lambda done: self._forget(key, done))
+
+        # Shielded so a cancelled caller does not cancel the call for the others
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        self._calls.pop(key, None)
+        # Mark the exception as retrieved in case every caller went away
+        if not task.cancelled():
+            task.exception()
+
+    async def _run(self, fn: Callable[[], Awaitable[T]]) -> tuple[T, bool]:
+        self.leaders += 1
+        return await fn(), False
+
+    async def _do_distributed(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[T]],
+        lookup: Callable[[datetime], Awaitable[T | None]],
+        lease_seconds: float,
+    ) -> tuple[T, bool]:
+        owner = uuid.uuid4().hex
+        started_at = datetime.now(timezone.utc)
+        deadline = time.monotonic() + lease_seconds
+        waited = False
+
+        while True:
+            if await self._acquire_lease(key, owner, lease_seconds):
+                try:
+                    # The previous holder may have published while we waited
+                    if waited:
+                        result = await lookup(started_at)
+                        if result is not None:
+                            self.coalesced_remote += 1
+                            return result, True
+                    return await self._run(fn)
+                finally:
+                    await asyncio.shield(self._release_lease(key, owner))
+
+            waited = True
+            result = await lookup(started_at)
+            if result is not None:
+                self.coalesced_remote += 1
+                return result, True
+
+            if time.monotonic() >= deadline:
+                return await self._run(fn)
+
+            await asyncio.sleep(settings.agent_singleflight_poll_interval)
+
+    async def _acquire_lease(self, key: str, owner: str, lease_seconds: float) -> bool:
+        """Take the lease for `key` for `lease_seconds` if it is free or expired."""
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=lease_seconds)
+        stmt = insert(AgentCallLease).values(key=key, owner=owner, expires_at=expires_at)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[AgentCallLease.key],
+            set_={"owner": stmt.excluded.owner, "expires_at": stmt.excluded.expires_at},
+            where=AgentCallLease.expires_at <= func.now(),
+        ).returning(AgentCallLease.key)
+
+        async with SessionLocal() as session:
+            leased = (await session.execute(stmt)).scalar_one_or_none() is not None
+            await session.commit()
+        return leased
+
+    async def _release_lease(self, key: str, owner: str) -> None:
+        async with SessionLocal() as session:
+            await session.execute(
+                delete(AgentCallLease)
+                .where(AgentCallLease.key == key)
+                .where(AgentCallLease.owner == owner)
+            )
+            await session.commit()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "enabled": settings.agent_singleflight_enabled,
+            "distributed": settings.agent_singleflight_distributed,
+            "in_flight": len(self._calls),
+            "leaders": self.leaders,
+            "coalesced_local": self.coalesced_local,
+            "coalesced_remote": self.coalesced_remote,
+        }
+
+
+singleflight = SingleFlight()
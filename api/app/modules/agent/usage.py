@@ -0,0 +1,40 @@
+"""Buffered usage recording - AgentUsage rows are written in batches off the request path."""
+
+import logging
+from datetime import datetime, timezone
+from typing import Any
+
+from sqlalchemy import insert
+
+from app.core.batching import BatchWriter
+from app.core.config import settings
+from app.db import SessionLocal
+from app.models import AgentUsage
+
+
+class UsageRecorder(BatchWriter):
+    """Queues usage rows in memory and inserts them in batches.
+
+    Each batch is one multi-row INSERT. Quota is enforced on the usage
+    counters, so rows still in the buffer do not affect it.
+    """
+
+    label = "usage"
+    logger = logging.getLogger(__name__)
+
+    async def record(self, row: dict[str, Any]) -> None:
+        """Queue one usage row (AgentUsage column values)."""
+        row.setdefault("created_at", datetime.now(timezone.utc))
+        await super().record(row)
+
+    async def _insert(self, rows: list[dict[str, Any]]) -> None:
+        async with SessionLocal() as session:
+            await session.execute(insert(AgentUsage).values(rows))
+            await session.commit()
+
+
+usage_recorder = UsageRecorder(
+    batch_size=settings.usage_flush_batch_size,
+    flush_interval=settings.usage_flush_interval,
+    max_pending=settings.usage_buffer_max,
+)
@@ -1,14 +1,71 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import math
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db import get_session
-from app.modules.users.views import get_current_user
+from app.core.http import get_pool_stats
+from app.core.pagination import InvalidCursorError
+from app.core.pubsub import pg_listener
+from app.core.ratelimit import rate_limiter
+from app.core.responses import ModelResponse
+from app.core.security import password_hasher, token_cache
+from app.core.sse import SSE_HEADERS
+from app.db import get_pool_stats as get_db_pool_stats, get_session
+from app.modules.builds.events import build_events
+from app.modules.users.cache import user_cache
+from app.modules.wishlist.ingest import wishlist_ingestor
+from app.modules.users.views import get_current_admin, get_current_user
 
-from .schemas import AgentRequest, AgentResponse, AgentUsageResponse
-from .service import AgentService, AgentServiceError, UsageLimitExceededError
+from .cache import result_cache
+from .resilience import circuit_breaker, concurrency_limiter
+from .schemas import (
+    AgentBatchItem,
+    AgentBatchRequest,
+    AgentRequest,
+    AgentResponse,
+    AgentUsageHistoryResponse,
+)
+from .service import (
+    AgentService,
+    AgentServiceError,
+    AgentUnavailableError,
+    UsageLimitExceededError,
+)
+from .singleflight import singleflight
+from .usage import usage_recorder
 
 router = APIRouter()
 
+VALID_ACTIONS = ["analyze-performance", "generate-test-cases", "write-playwright-tests"]
+
+
+def validate_action(action: str) -> None:
+    if action not in VALID_ACTIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid action. Must be one of: {', '.join(VALID_ACTIONS)}",
+        )
+
+
+def usage_limit_exception(e: UsageLimitExceededError) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail={
+            "message": e.message,
+            "limit": e.limit,
+            "used": e.used,
+        },
+    )
+
+
+def unavailable_exception(e: AgentUnavailableError) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=e.message,
+        headers={"Retry-After": str(max(math.ceil(e.retry_after), 1))},
+    )
+
 
 @router.post("/{action}", response_model=AgentResponse)
 async def call_agent(
@@ -25,37 +82,28 @@ async def call_agent(
     - generate-test-cases: Generate test cases for the website
     - write-playwright-tests: Generate Playwright tests
     """
-    valid_actions = ["analyze-performance", "generate-test-cases", "write-playwright-tests"]
-
-    if action not in valid_actions:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Invalid action. Must be one of: {', '.join(valid_actions)}",
-        )
+    validate_action(action)
 
     agent_service = AgentService(session)
 
     try:
-        result = await agent_service.call_agent(
+        call = await agent_service.call_agent(
             user=current_user,
             action=action,
             website=request.website,
             metadata=request.metadata,
+            use_cache=request.cache,
         )
         return AgentResponse(
             success=True,
             action=action,
-            result=result,
+            result=call.result,
+            cached=call.cached,
         )
     except UsageLimitExceededError as e:
-        raise HTTPException(
-            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            detail={
-                "message": e.message,
-                "limit": e.limit,
-                "used": e.used,
-            },
-        )
+        raise usage_limit_exception(e)
+    except AgentUnavailableError as e:
+        raise unavailable_exception(e)
     except AgentServiceError as e:
         return AgentResponse(
             success=False,
@@ -64,18 +112,129 @@ async def call_agent(
         )
 
 
-@router.get("/usage/history", response_model=list[AgentUsageResponse])
+@router.post("/{action}/stream")
+async def stream_agent(
+    action: str,
+    request: AgentRequest,
+    session: AsyncSession = Depends(get_session),
+    current_user=Depends(get_current_user),
+):
+    """
+    Call an agent action and stream its output as Server-Sent Events.
+
+    Events: `start` once the agent responds, `chunk` for each piece of output,
+    then `done`, or `error` if the call fails.
+    """
+    validate_action(action)
+
+    agent_service = AgentService(session)
+
+    try:
+        events = await agent_service.stream_agent(
+            user=current_user,
+            action=action,
+            website=request.website,
+            metadata=request.metadata,
+        )
+    except UsageLimitExceededError as e:
+        raise usage_limit_exception(e)
+    except AgentUnavailableError as e:
+        raise unavailable_exception(e)
+
+    return StreamingResponse(events, media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@router.post("/{action}/batch")
+async def batch_call_agent(
+    action: str,
+    request: AgentBatchRequest,
+    session: AsyncSession = Depends(get_session),
+    current_user=Depends(get_current_user),
+):
+    """
+    Call an agent action for many websites.
+
+    Quota is checked once for the whole batch. Results are streamed back as
+    newline-delimited JSON, one `AgentBatchItem` per website in completion
+    order; `index` refers to the position in `websites`.
+    """
+    validate_action(action)
+
+    agent_service = AgentService(session)
+
+    try:
+        items = await agent_service.batch_call_agent(
+            user=current_user,
+            action=action,
+            websites=request.websites,
+            metadata=request.metadata,
+            use_cache=request.cache,
+        )
+    except UsageLimitExceededError as e:
+        raise usage_limit_exception(e)
+    except AgentUnavailableError as e:
+        raise unavailable_exception(e)
+
+    async def lines():
+        try:
+            async for item in items:
+                yield AgentBatchItem(**item).model_dump_json() + "\n"
+        finally:
+            await items.aclose()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@router.get("/usage/history", response_model=AgentUsageHistoryResponse)
 async def get_usage_history(
-    limit: int = 50,
-    offset: int = 0,
+    limit: int = Query(50, ge=1, le=100),
+    cursor: str | None = None,
+    include_total: bool = False,
     session: AsyncSession = Depends(get_session),
     current_user=Depends(get_current_user),
 ):
-    """Get agent usage history for the current user."""
+    """Get agent usage history for the current user, newest first.
+
+    Pass `next_cursor` from a response as `cursor` to get the next page.
+    `total` is an estimate unless `include_total=true`.
+    """
     agent_service = AgentService(session)
-    usages = await agent_service.get_user_usage_history(
-        user_id=current_user.id,
-        limit=min(limit, 100),  # Cap at 100
-        offset=offset,
+    try:
+        page = await agent_service.get_user_usage_history(
+            user_id=current_user.id,
+            limit=limit,
+            cursor=cursor,
+            exact_total=include_total,
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    history = AgentUsageHistoryResponse(
+        usages=page.items,
+        total=page.total,
+        total_is_estimate=page.total_is_estimate,
+        limit=limit,
+        next_cursor=page.next_cursor,
     )
-    return usages
+    return ModelResponse(history)
+
+
+@router.get("/stats")
+async def get_agent_stats(current_user=Depends(get_current_admin)):
+    """Get runtime statistics of the agent service client. Admins only."""
+    return {
+        "pool": get_pool_stats(),
+        "db_pool": get_db_pool_stats(),
+        "cache": result_cache.stats(),
+        "singleflight": singleflight.stats(),
+        "breaker": circuit_breaker.stats(),
+        "concurrency": concurrency_limiter.stats(),
+        "usage": usage_recorder.stats(),
+        "wishlist": wishlist_ingestor.stats(),
+        "listener": pg_listener.stats(),
+        "build_events": build_events.stats(),
+        "user_cache": user_cache.stats(),
+        "password_hasher": password_hasher.stats(),
+        "token_cache": token_cache.stats(),
+        "rate_limit": rate_limiter.stats(),
+    }
@@ -1,12 +1,88 @@
+import uuid
 from datetime import datetime, timezone
+from typing import Any, Iterable
 from uuid import UUID
 
-from sqlalchemy import func, select
+from sqlalchemy import insert, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
 
-from app.models import Build, BuildStatus
+from app.core.blobs import get_blob_store
+from app.core.config import settings
+from app.core.pagination import Page, fetch_page
+from app.db import save
+from app.models import Build, BuildStatus, User
 
-from .schemas import BuildCreate, BuildUpdate
+from .events import publish_build_event
+from .jobs import enqueue_build_job
+from .schemas import BUILD_ACTIONS, BUILD_SUMMARY_FIELDS, BuildCreate, BuildUpdate
+
+
+class BuildTransitionError(Exception):
+    """A build state transition did not apply."""
+
+
+class BuildNotFoundError(BuildTransitionError):
+    pass
+
+
+class BuildAccessDeniedError(BuildTransitionError):
+    pass
+
+
+class BuildStatusConflictError(BuildTransitionError):
+    def __init__(self, status: str):
+        super().__init__(f"Build is {status}")
+        self.status = status
+
+
+# Response field name -> Build column
+BUILD_COLUMNS = {
+    "id": Build.id,
+    "user_id": Build.user_id,
+    "website": Build.website,
+    "action": Build.action,
+    "status": Build.status,
+    "output": Build.output,
+    "output_size": Build.output_size,
+    "error_message": Build.error_message,
+    "metadata": Build.metadata_json,
+    "started_at": Build.started_at,
+    "completed_at": Build.completed_at,
+    "created_at": Build.created_at,
+    "updated_at": Build.updated_at,
+}
+
+
+async def bump_builds_version(session: AsyncSession, user_id: UUID) -> None:
+    """Mark the user's builds as changed, invalidating listing ETags. Does not commit."""
+    await session.execute(
+        update(User)
+        .where(User.id == user_id)
+        # Keep updated_at: it is the user's own Last-Modified
+        .values(builds_version=User.builds_version + 1, updated_at=User.updated_at)
+    )
+
+
+async def get_builds_version(session: AsyncSession, user_id: UUID) -> int:
+    """The user's builds version, without loading any builds."""
+    result = await session.execute(select(User.builds_version).where(User.id == user_id))
+    return result.scalar_one_or_none() or 0
+
+
+async def get_build_version(session: AsyncSession, build_id: UUID):
+    """A build's owner and `updated_at`, without loading the row; None if not found."""
+    result = await session.execute(select(Build.user_id, Build.updated_at).where(Build.id == build_id))
+    return result.one_or_none()
+
+
+def validate_build(build_data: BuildCreate) -> str | None:
+    """Return why a build can't be created, or None if it can."""
+    if build_data.action not in BUILD_ACTIONS:
+        return f"Invalid action. Must be one of: {', '.join(BUILD_ACTIONS)}"
+    if len(build_data.website) > Build.website.type.length:
+        return f"Website must be at most {Build.website.type.length} characters"
+    return None
 
 
 async def create_build(
@@ -23,9 +99,43 @@ async def create_build(
         metadata_json=build_data.metadata,
     )
     session.add(build)
+    # Autoflushes the INSERT first: the user row is always locked after the build's
+    await bump_builds_version(session, user_id)
+    return await save(session, build)
+
+
+async def create_builds(
+    session: AsyncSession,
+    user_id: UUID,
+    builds: list[BuildCreate],
+) -> list[UUID]:
+    """Create many builds with one multi-row INSERT and commit.
+
+    Ids are generated here, so they are returned in input order without
+    reading anything back.
+    """
+    ids = [uuid.uuid4() for _ in builds]
+    if not builds:
+        return ids
+
+    await session.execute(
+        insert(Build).values(
+            [
+                {
+                    "id": build_id,
+                    "user_id": user_id,
+                    "website": build_data.website,
+                    "action": build_data.action,
+                    "status": BuildStatus.PENDING.value,
+                    "metadata_json": build_data.metadata,
+                }
+                for build_id, build_data in zip(ids, builds)
+            ]
+        )
+    )
+    await bump_builds_version(session, user_id)
     await session.commit()
-    await session.refresh(build)
-    return build
+    return ids
 
 
 async def get_build_by_id(
@@ -41,26 +151,23 @@ async def get_builds_by_user(
     session: AsyncSession,
     user_id: UUID,
     limit: int = 50,
-    offset: int = 0,
-) -> tuple[list[Build], int]:
-    """Get all builds for a user with pagination."""
-    # Get total count
-    count_result = await session.execute(
-        select(func.count(Build.id)).where(Build.user_id == user_id)
-    )
-    total = count_result.scalar_one()
+    cursor: str | None = None,
+    exact_total: bool = False,
+    fields: Iterable[str] = BUILD_SUMMARY_FIELDS,
+) -> Page[Build]:
+    """Get a page of a user's builds, newest first.
 
-    # Get builds
-    result = await session.execute(
+    Only the columns behind `fields` are loaded (plus the pagination key);
+    the others are deferred and must not be accessed. The total is an
+    estimate unless `exact_total` is set.
+    """
+    columns = {BUILD_COLUMNS[field] for field in fields} | {Build.id, Build.created_at}
+    query = (
         select(Build)
         .where(Build.user_id == user_id)
-        .order_by(Build.created_at.desc())
-        .limit(limit)
-        .offset(offset)
+        .options(load_only(*columns, raiseload=True))
     )
-    builds = list(result.scalars().all())
-
-    return builds, total
+    return await fetch_page(session, query, Build, limit, cursor, exact_total)
 
 
 async def update_build(
@@ -73,25 +180,87 @@ async def update_build(
 
     for field, value in update_data.items():
         if value is not None:
-            if field == "status":
-                if isinstance(value, BuildStatus):
-                    setattr(build, field, value.value)
-                else:
-                    setattr(build, field, value)
+            if field == "output":
+                await set_build_output(build, value)
             else:
                 setattr(build, field, value)
 
-    await session.commit()
-    await session.refresh(build)
-    return build
+    await publish_build_event(session, build)
+    await bump_builds_version(session, build.user_id)
+    return await save(session, build)
+
+
+async def build_output_values(output: str | None) -> dict[str, Any]:
+    """Column values storing `output`, moving it to the blob store if it is large."""
+    if output is None:
+        return {"output": None, "output_blob_key": None, "output_size": None}
+
+    data = output.encode("utf-8")
+    if len(data) <= settings.build_output_inline_max_bytes:
+        return {"output": output, "output_blob_key": None, "output_size": len(data)}
+    key = await get_blob_store().put(data)
+    return {"output": None, "output_blob_key": key, "output_size": len(data)}
+
+
+async def set_build_output(build: Build, output: str | None) -> None:
+    """Set a build's output, moving it to the blob store if it is large."""
+    for field, value in (await build_output_values(output)).items():
+        setattr(build, field, value)
+
 
+async def transition_build(
+    session: AsyncSession,
+    build_id: UUID,
+    expected: BuildStatus,
+    values: dict[str, Any],
+    user_id: UUID | None = None,
+) -> Build:
+    """Move a build out of the `expected` status with a single conditional UPDATE.
+
+    The ownership check, status check and write happen in one statement, so
+    of two concurrent transitions exactly one applies (the other waits on
+    the row lock, then no longer matches). When no row matches, the build is
+    looked up once more to tell apart not found, not owned by `user_id` and
+    not in `expected` status. Does not commit.
+    """
+    stmt = (
+        update(Build)
+        .where(Build.id == build_id)
+        .where(Build.status == expected.value)
+        .values(**values)
+        .returning(Build)
+        .execution_options(populate_existing=True)
+    )
+    if user_id is not None:
+        stmt = stmt.where(Build.user_id == user_id)
+
+    build = (await session.execute(stmt)).scalar_one_or_none()
+    if build is not None:
+        return build
 
-async def start_build(session: AsyncSession, build: Build) -> Build:
-    """Mark a build as running."""
-    build.status = BuildStatus.RUNNING.value
-    build.started_at = datetime.now(timezone.utc)
+    current = (
+        await session.execute(select(Build.user_id, Build.status).where(Build.id == build_id))
+    ).one_or_none()
+    if current is None:
+        raise BuildNotFoundError("Build not found")
+    if user_id is not None and current.user_id != user_id:
+        raise BuildAccessDeniedError("Access denied")
+    raise BuildStatusConflictError(current.status)
+
+
+async def start_build(session: AsyncSession, build_id: UUID, user_id: UUID) -> Build:
+    """Move a pending build to running and queue it for the worker."""
+    build = await transition_build(
+        session,
+        build_id,
+        BuildStatus.PENDING,
+        {"status": BuildStatus.RUNNING.value, "started_at": datetime.now(timezone.utc)},
+        user_id=user_id,
+    )
+    enqueue_build_job(session, build)
+    await publish_build_event(session, build)
+    await bump_builds_version(session, build.user_id)
     await session.commit()
-    await session.refresh(build)
     return build
 
 
@@ -102,11 +271,23 @@ async def complete_build(
     error_message: str | None = None,
     success: bool = True,
 ) -> Build:
-    """Mark a build as completed or failed."""
-    build.status = BuildStatus.COMPLETED.value if success else BuildStatus.FAILED.value
-    build.completed_at = datetime.now(timezone.utc)
-    build.output = output
-    build.error_message = error_message
+    """Move a running build to completed or failed.
+
+    The output is stored only once the transition applied, so a build that
+    was no longer running leaves no orphaned blob behind.
+    """
+    build = await transition_build(
+        session,
+        build.id,
+        BuildStatus.RUNNING,
+        {
+            "status": BuildStatus.COMPLETED.value if success else BuildStatus.FAILED.value,
+            "completed_at": datetime.now(timezone.utc),
+            "error_message": error_message,
+        },
+    )
+    await set_build_output(build, output)
+    await publish_build_event(session, build)
+    await bump_builds_version(session, build.user_id)
     await session.commit()
-    await session.refresh(build)
     return build
@@ -0,0 +1,123 @@
+"""Build status events - published with pg_notify and fanned out to SSE/WebSocket clients."""
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.pubsub import notify, pg_listener
+from app.db import SessionLocal
+from app.models import Build, BuildStatus
+
+BUILD_EVENTS_CHANNEL = "build_events"
+TERMINAL_STATUSES = {BuildStatus.COMPLETED.value, BuildStatus.FAILED.value}
+SUBSCRIBER_QUEUE_SIZE = 32
+# Queued when the listener reconnected and notifications may have been missed
+RESYNC = {"resync": True}
+
+
+def build_event(build: Build) -> dict[str, Any]:
+    """Small snapshot of a build's state (pg_notify payloads are capped at 8000 bytes)."""
+    return {
+        "id": str(build.id),
+        "user_id": str(build.user_id),
+        "status": build.status,
+        "started_at": build.started_at,
+        "completed_at": build.completed_at,
+        "output_size": build.output_size,
+    }
+
+
+async def publish_build_event(session: AsyncSession, build: Build) -> None:
+    """Announce the build's state once the session's transaction commits."""
+    await notify(session, BUILD_EVENTS_CHANNEL, build_event(build))
+
+
+class BuildEventBroker:
+    """Routes build notifications from the shared listener to per-build queues."""
+
+    def __init__(self) -> None:
+        self._queues: dict[str, set[asyncio.Queue]] = {}
+        self.dropped = 0
+
+    @asynccontextmanager
+    async def subscribe(self, build_id: UUID) -> AsyncIterator[asyncio.Queue]:
+        key = str(build_id)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        if not self._queues:
+            await pg_listener.subscribe(BUILD_EVENTS_CHANNEL, self._dispatch)
+        self._queues.setdefault(key, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            queues = self._queues.get(key, set())
+            queues.discard(queue)
+            if not queues:
+                self._queues.pop(key, None)
+            if not self._queues:
+                await pg_listener.unsubscribe(BUILD_EVENTS_CHANNEL, self._dispatch)
+
+    def _offer(self, queue: asyncio.Queue, item: Any) -> None:
+        if queue.full():
+            # A slow client only needs the latest state
+            queue.get_nowait()
+            self.dropped += 1
+        queue.put_nowait(item)
+
+    def _dispatch(self, event: dict[str, Any]) -> None:
+        for queue in self._queues.get(event.get("id"), ()):
+            self._offer(queue, event)
+
+    def resync(self) -> None:
+        for queues in self._queues.values():
+            for queue in queues:
+                self._offer(queue, RESYNC)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "builds": len(self._queues),
+            "subscribers": sum(len(queues) for queues in self._queues.values()),
+            "dropped": self.dropped,
+        }
+
+
+build_events = BuildEventBroker()
+pg_listener.on_reconnect(build_events.resync)
+
+
+async def load_build_event(build_id: UUID) -> dict[str, Any] | None:
+    async with SessionLocal() as session:
+        build = await session.get(Build, build_id)
+        return build_event(build) if build is not None else None
+
+
+async def watch_build(build_id: UUID) -> AsyncIterator[dict[str, Any] | None]:
+    """Yield the build's current state, then each change until it finishes.
+
+    Yields None every `build_events_keepalive` seconds without a change so
+    callers can keep the connection alive. The snapshot is read after
+    subscribing, so no transition between the two is lost.
+    """
+    async with build_events.subscribe(build_id) as queue:
+        event = await load_build_event(build_id)
+        while event is not None:
+            yield event
+            if event["status"] in TERMINAL_STATUSES:
+                return
+
+            event = None
+            while event is None:
+                try:
+                    event = await asyncio.wait_for(
+                        queue.get(), timeout=settings.build_events_keepalive
+                    )
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if event is RESYNC:
+                    event = await load_build_event(build_id)
+                    if event is None:
+                        return
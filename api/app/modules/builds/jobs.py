@@ -0,0 +1,149 @@
+"""Postgres-backed queue of build jobs consumed by the worker."""
+
+import random
+from datetime import timedelta
+from uuid import UUID
+
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models import Build, BuildJob, JobStatus
+
+
+def enqueue_build_job(session: AsyncSession, build: Build) -> BuildJob:
+    """Add a job for a build to the session; it is queued when the caller commits."""
+    job = BuildJob(
+        build_id=build.id,
+        status=JobStatus.QUEUED.value,
+        attempts=0,
+        max_attempts=settings.job_max_attempts,
+    )
+    session.add(job)
+    return job
+
+
+async def claim_build_jobs(
+    session: AsyncSession,
+    worker_id: str,
+    limit: int,
+) -> list[BuildJob]:
+    """Lease up to `limit` runnable jobs for a worker.
+
+    Runnable jobs are queued jobs whose retry delay has passed and running jobs
+    whose lease expired because their worker crashed or stalled. Rows locked
+    by other workers are skipped, so concurrent workers never claim the same job.
+    """
+    runnable = (
+        select(BuildJob.id)
+        .where(
+            or_(
+                and_(
+                    BuildJob.status == JobStatus.QUEUED.value,
+                    BuildJob.available_at <= func.now(),
+                ),
+                and_(
+                    BuildJob.status == JobStatus.RUNNING.value,
+                    BuildJob.locked_until < func.now(),
+                ),
+            )
+        )
+        .order_by(BuildJob.available_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    result = await session.execute(
+        update(BuildJob)
+        .where(BuildJob.id.in_(runnable.scalar_subquery()))
+        .values(
+            status=JobStatus.RUNNING.value,
+            attempts=BuildJob.attempts + 1,
+            locked_by=worker_id,
+            locked_until=func.now() + timedelta(seconds=settings.job_visibility_timeout),
+        )
+        .returning(BuildJob)
+        .execution_options(synchronize_session=False)
+    )
+    jobs = list(result.scalars().all())
+    await session.commit()
+    return jobs
+
+
+async def extend_build_job_lease(session: AsyncSession, job_id: UUID, worker_id: str) -> bool:
+    """Push the visibility timeout forward. Returns False if the lease was lost."""
+    result = await session.execute(
+        update(BuildJob)
+        .where(BuildJob.id == job_id)
+        .where(BuildJob.locked_by == worker_id)
+        .where(BuildJob.status == JobStatus.RUNNING.value)
+        .values(locked_until=func.now() + timedelta(seconds=settings.job_visibility_timeout))
+        .returning(BuildJob.id)
+        .execution_options(synchronize_session=False)
+    )
+    extended = result.scalar_one_or_none() is not None
+    await session.commit()
+    return extended
+
+
+async def mark_build_job_succeeded(session: AsyncSession, job_id: UUID, worker_id: str) -> bool:
+    """Mark a leased job as done. Returns False if the lease was lost."""
+    result = await session.execute(
+        update(BuildJob)
+        .where(BuildJob.id == job_id)
+        .where(BuildJob.locked_by == worker_id)
+        .values(status=JobStatus.SUCCEEDED.value, locked_by=None, locked_until=None)
+        .returning(BuildJob.id)
+        .execution_options(synchronize_session=False)
+    )
+    updated = result.scalar_one_or_none() is not None
+    await session.commit()
+    return updated
+
+
+def compute_retry_delay(attempts: int) -> float:
+    """Exponential backoff with jitter for the given attempt number."""
+    delay = settings.job_retry_backoff * (2 ** max(attempts - 1, 0))
+    delay = min(delay, settings.job_retry_backoff_max)
+    return delay * random.uniform(0.8, 1.2)
+
+
+async def mark_build_job_failed(
+    session: AsyncSession,
+    job: BuildJob,
+    worker_id: str,
+    error: str,
+    retry: bool = True,
+) -> bool:
+    """Record a failed attempt.
+
+    The job is requeued with backoff while it has attempts left and the error is
+    retryable. Returns True if the job will be retried, in which case the
+    build must not be finished yet.
+    """
+    will_retry = retry and job.attempts < job.max_attempts
+    values = {
+        "locked_by": None,
+        "locked_until": None,
+        "last_error": error,
+    }
+    if will_retry:
+        values["status"] = JobStatus.QUEUED.value
+        values["available_at"] = func.now() + timedelta(
+            seconds=compute_retry_delay(job.attempts)
+        )
+    else:
+        values["status"] = JobStatus.FAILED.value
+
+    result = await session.execute(
+        update(BuildJob)
+        .where(BuildJob.id == job.id)
+        .where(BuildJob.locked_by == worker_id)
+        .values(**values)
+        .returning(BuildJob.id)
+        .execution_options(synchronize_session=False)
+    )
+    updated = result.scalar_one_or_none() is not None
+    await session.commit()
+
+    # A lost lease means another worker reclaimed the job and now owns the build
+    return will_retry or not updated
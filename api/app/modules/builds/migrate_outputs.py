@@ -0,0 +1,77 @@
+"""Move existing build outputs into the blob store.
+
+Run with `python -m app.modules.builds.migrate_outputs [--batch-size N]`.
+
+Walks builds that have an inline output but no `output_size` in id order,
+one batch per transaction. Outputs above the inline limit are written to the
+blob store and cleared from the row; smaller ones only get their size. Safe
+to stop and re-run at any point.
+"""
+
+import argparse
+import asyncio
+import logging
+from uuid import UUID
+
+from sqlalchemy import select
+
+from app.db import SessionLocal
+from app.models import Build
+
+from .controllers import bump_builds_version, set_build_output
+
+logger = logging.getLogger(__name__)
+
+
+async def migrate_batch(after: UUID | None, batch_size: int) -> tuple[int, int, UUID | None]:
+    """Migrate one batch. Returns (rows, moved to the blob store, last id)."""
+    async with SessionLocal() as session:
+        query = (
+            select(Build)
+            .where(Build.output.is_not(None))
+            .where(Build.output_size.is_(None))
+            .order_by(Build.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        if after is not None:
+            query = query.where(Build.id > after)
+
+        builds = list((await session.execute(query)).scalars().all())
+        moved = 0
+        for build in builds:
+            await set_build_output(build, build.output)
+            moved += build.output_blob_key is not None
+        for user_id in {build.user_id for build in builds}:
+            await bump_builds_version(session, user_id)
+
+        await session.commit()
+
+    return len(builds), moved, builds[-1].id if builds else None
+
+
+async def migrate_outputs(batch_size: int) -> None:
+    after = None
+    total = moved_total = 0
+    while True:
+        count, moved, after = await migrate_batch(after, batch_size)
+        if not count:
+            break
+        total += count
+        moved_total += moved
+        logger.info("Migrated %d builds (%d moved to the blob store)", total, moved_total)
+
+    logger.info("Done: %d builds, %d moved to the blob store", total, moved_total)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(migrate_outputs(args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,13 @@
 from datetime import datetime
+from enum import Enum
 from typing import Any
 from uuid import UUID
 
-from pydantic import BaseModel
+from pydantic import AliasChoices, BaseModel, ConfigDict, Field
 
-from app.models import BuildStatus
+from app.core.config import settings
+
+BUILD_ACTIONS = ("analyze-performance", "generate-test-cases", "write-playwright-tests")
 
 
 class BuildCreate(BaseModel):
@@ -13,8 +16,35 @@ class BuildCreate(BaseModel):
     metadata: dict[str, Any] | None = None
 
 
+class BuildBulkMode(str, Enum):
+    # Reject the whole request if any build is invalid
+    ALL_OR_NOTHING = "all_or_nothing"
+    # Create the valid builds and report the others
+    BEST_EFFORT = "best_effort"
+
+
+class BuildBulkCreate(BaseModel):
+    builds: list[BuildCreate] = Field(min_length=1, max_length=settings.build_bulk_max_items)
+    mode: BuildBulkMode = BuildBulkMode.ALL_OR_NOTHING
+
+
+class BuildBulkError(BaseModel):
+    index: int
+    error: str
+
+
+class BuildBulkResponse(BaseModel):
+    # One entry per input build, in input order; null where it was rejected
+    ids: list[UUID | None]
+    created: int
+    errors: list[BuildBulkError]
+
+
 class BuildUpdate(BaseModel):
-    status: BuildStatus | None = None
+    # Status only changes through /start and the worker's conditional
+    # transitions; sending it here is an error rather than silently ignored
+    model_config = ConfigDict(extra="forbid")
+
     output: str | None = None
     error_message: str | None = None
 
@@ -25,9 +55,15 @@ class BuildResponse(BaseModel):
     website: str
     action: str
     status: str
+    # Large outputs are not inlined (`output` is null while `output_size` is
+    # set); fetch them from GET /builds/{id}/output
     output: str | None
+    output_size: int | None = None
     error_message: str | None
-    metadata: dict[str, Any] | None
+    # Read from `metadata_json`; `Build.metadata` is SQLAlchemy's table MetaData
+    metadata: dict[str, Any] | None = Field(
+        validation_alias=AliasChoices("metadata_json", "metadata"),
+    )
     started_at: datetime | None
     completed_at: datetime | None
     created_at: datetime
@@ -37,8 +73,43 @@ class BuildResponse(BaseModel):
         from_attributes = True
 
 
+# Fields listed when `fields=` is not given: everything but the large columns
+BUILD_SUMMARY_FIELDS = (
+    "id",
+    "user_id",
+    "website",
+    "action",
+    "status",
+    "output_size",
+    "started_at",
+    "completed_at",
+    "created_at",
+    "updated_at",
+)
+BUILD_LIST_FIELDS = BUILD_SUMMARY_FIELDS + ("output", "error_message", "metadata")
+
+
+class BuildListItem(BaseModel):
+    """A build in a listing; only the requested fields are set and returned."""
+
+    id: UUID
+    user_id: UUID | None = None
+    website: str | None = None
+    action: str | None = None
+    status: str | None = None
+    output: str | None = None
+    output_size: int | None = None
+    error_message: str | None = None
+    metadata: dict[str, Any] | None = None
+    started_at: datetime | None = None
+    completed_at: datetime | None = None
+    created_at: datetime | None = None
+    updated_at: datetime | None = None
+
+
 class BuildListResponse(BaseModel):
-    builds: list[BuildResponse]
+    builds: list[BuildListItem]
     total: int
+    total_is_estimate: bool
     limit: int
-    offset: int
+    next_cursor: str | None
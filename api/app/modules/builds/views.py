@@ -1,72 +1,244 @@
+import json
+import re
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    WebSocket,
+    WebSocketDisconnect,
+    status,
+)
+from fastapi.responses import Response, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db import get_session
-from app.modules.users.views import get_current_user
+from app.core.blobs import get_blob_store
+from app.core.compression import negotiate_encoding
+from app.core.conditional import (
+    is_conditional,
+    is_not_modified,
+    not_modified,
+    validator_headers,
+    weak_etag,
+)
+from app.core.pagination import InvalidCursorError
+from app.core.responses import ModelResponse
+from app.core.sse import SSE_HEADERS, format_sse
+from app.db import SessionLocal, get_session, release_connection
+from app.modules.users.views import authenticate_token, get_current_user, limit_by_user
 
 from .controllers import (
-    complete_build,
+    BUILD_COLUMNS,
+    BuildAccessDeniedError,
+    BuildNotFoundError,
+    BuildStatusConflictError,
     create_build,
+    create_builds,
     get_build_by_id,
+    get_build_version,
     get_builds_by_user,
+    get_builds_version,
     start_build,
     update_build,
+    validate_build,
+)
+from .events import watch_build
+from .schemas import (
+    BUILD_LIST_FIELDS,
+    BUILD_SUMMARY_FIELDS,
+    BuildBulkCreate,
+    BuildBulkError,
+    BuildBulkMode,
+    BuildBulkResponse,
+    BuildCreate,
+    BuildListItem,
+    BuildListResponse,
+    BuildResponse,
+    BuildUpdate,
 )
-from .schemas import BuildCreate, BuildListResponse, BuildResponse, BuildUpdate
 
 router = APIRouter()
 
+# Per-user limit on the routes clients poll or create builds through
+build_rate_limit = Depends(limit_by_user("builds"))
+
+OUTPUT_MEDIA_TYPE = "text/plain; charset=utf-8"
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
 
-@router.post("/", response_model=BuildResponse, status_code=status.HTTP_201_CREATED)
+
+@router.post(
+    "/",
+    response_model=BuildResponse,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[build_rate_limit],
+)
 async def create_new_build(
     build_data: BuildCreate,
+    response: Response,
     session: AsyncSession = Depends(get_session),
     current_user=Depends(get_current_user),
 ):
     """Create a new build for the current user."""
-    valid_actions = ["analyze-performance", "generate-test-cases", "write-playwright-tests"]
-
-    if build_data.action not in valid_actions:
+    error = validate_build(build_data)
+    if error is not None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Invalid action. Must be one of: {', '.join(valid_actions)}",
+            detail=error,
         )
 
     build = await create_build(session, current_user.id, build_data)
-    return build
+    return ModelResponse(
+        BuildResponse.model_validate(build),
+        status.HTTP_201_CREATED,
+        headers=response.headers,
+    )
 
 
-@router.get("/", response_model=BuildListResponse)
-async def list_builds(
-    limit: int = 50,
-    offset: int = 0,
+@router.post(
+    "/bulk",
+    response_model=BuildBulkResponse,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[build_rate_limit],
+)
+async def create_builds_in_bulk(
+    request: BuildBulkCreate,
+    response: Response,
     session: AsyncSession = Depends(get_session),
     current_user=Depends(get_current_user),
 ):
-    """List all builds for the current user."""
-    builds, total = await get_builds_by_user(
-        session,
-        current_user.id,
-        limit=min(limit, 100),
-        offset=offset,
+    """Create many builds for the current user in one statement."""
+    errors = []
+    valid = []
+    for index, build_data in enumerate(request.builds):
+        error = validate_build(build_data)
+        if error is None:
+            valid.append(index)
+        else:
+            errors.append(BuildBulkError(index=index, error=error))
+
+    if errors and request.mode == BuildBulkMode.ALL_OR_NOTHING:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={
+                "message": "No builds were created",
+                "errors": [error.model_dump() for error in errors],
+            },
+        )
+
+    created = await create_builds(session, current_user.id, [request.builds[i] for i in valid])
+    ids: list[UUID | None] = [None] * len(request.builds)
+    for index, build_id in zip(valid, created):
+        ids[index] = build_id
+
+    return ModelResponse(
+        BuildBulkResponse(ids=ids, created=len(created), errors=errors),
+        status.HTTP_201_CREATED,
+        headers=response.headers,
     )
-    return BuildListResponse(
-        builds=builds,
-        total=total,
+
+
+def build_validators(build_id: UUID, updated_at) -> dict[str, str]:
+    return validator_headers(weak_etag("build", build_id, updated_at.isoformat()), updated_at)
+
+
+def parse_fields(fields: str | None) -> tuple[str, ...]:
+    """Parse a comma-separated `fields=` value; `id` is always included."""
+    if fields is None:
+        return BUILD_SUMMARY_FIELDS
+
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in BUILD_LIST_FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(unknown)}. Must be among: {', '.join(BUILD_LIST_FIELDS)}",
+        )
+    return tuple(dict.fromkeys(["id", *requested]))
+
+
+@router.get(
+    "/",
+    response_model=BuildListResponse,
+    dependencies=[build_rate_limit],
+)
+async def list_builds(
+    request: Request,
+    response: Response,
+    limit: int = Query(50, ge=1, le=100),
+    cursor: str | None = None,
+    include_total: bool = False,
+    fields: str | None = None,
+    session: AsyncSession = Depends(get_session),
+    current_user=Depends(get_current_user),
+):
+    """List the current user's builds, newest first.
+
+    Builds are summaries without `output`, `error_message` and `metadata`
+    unless asked for with `fields=` (comma-separated), e.g.
+    `fields=id,status,output`. Pass `next_cursor` from a response as `cursor`
+    to get the next page. `total` is an estimate unless `include_total=true`.
+
+    The ETag changes with any of the user's builds; send it back as
+    `If-None-Match` to get a 304 when nothing changed.
+    """
+    selected = parse_fields(fields)
+
+    # Read before the page, so a concurrent change can only make the ETag stale
+    version = await get_builds_version(session, current_user.id)
+    etag = weak_etag("builds", current_user.id, version, limit, cursor, include_total, ",".join(selected))
+    headers = {**response.headers, **validator_headers(etag)}
+    if is_not_modified(request, etag):
+        return not_modified(headers)
+
+    try:
+        page = await get_builds_by_user(
+            session,
+            current_user.id,
+            limit=limit,
+            cursor=cursor,
+            exact_total=include_total,
+            fields=selected,
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    # Column values are already the right types, so the items are built
+    # without validation; only the selected fields count as set
+    listing = BuildListResponse(
+        builds=[
+            BuildListItem.model_construct(
+                **{field: getattr(build, BUILD_COLUMNS[field].key) for field in selected}
+            )
+            for build in page.items
+        ],
+        total=page.total,
+        total_is_estimate=page.total_is_estimate,
         limit=limit,
-        offset=offset,
+        next_cursor=page.next_cursor,
     )
+    return ModelResponse(listing, headers=headers, exclude_unset=True)
 
 
-@router.get("/{build_id}", response_model=BuildResponse)
+@router.get("/{build_id}", response_model=BuildResponse, dependencies=[build_rate_limit])
 async def get_build(
     build_id: UUID,
+    request: Request,
+    response: Response,
     session: AsyncSession = Depends(get_session),
     current_user=Depends(get_current_user),
 ):
-    """Get a specific build by ID."""
+    """Get a specific build by ID. Supports If-None-Match and If-Modified-Since."""
+    if is_conditional(request):
+        # Check the client's copy against the version alone before loading the row
+        current = await get_build_version(session, build_id)
+        if current is not None and current.user_id == current_user.id:
+            headers = {**response.headers, **build_validators(build_id, current.updated_at)}
+            if is_not_modified(request, headers["ETag"], current.updated_at):
+                return not_modified(headers)
+
     build = await get_build_by_id(session, build_id)
 
     if not build:
@@ -81,7 +253,10 @@ async def get_build(
             detail="Access denied",
         )
 
-    return build
+    return ModelResponse(
+        BuildResponse.model_validate(build),
+        headers={**response.headers, **build_validators(build.id, build.updated_at)},
+    )
 
 
 @router.patch("/{build_id}", response_model=BuildResponse)
@@ -107,7 +282,7 @@ async def update_build_endpoint(
         )
 
     updated_build = await update_build(session, build, build_data)
-    return updated_build
+    return ModelResponse(BuildResponse.model_validate(updated_build))
 
 
 @router.post("/{build_id}/start", response_model=BuildResponse)
@@ -117,6 +292,66 @@ async def start_build_endpoint(
     current_user=Depends(get_current_user),
 ):
     """Start a build (trigger the agent)."""
+    # Mark build as running and queue it; the worker calls the agent service
+    try:
+        build = await start_build(session, build_id, current_user.id)
+    except BuildNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Build not found",
+        )
+    except BuildAccessDeniedError:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied",
+        )
+    except BuildStatusConflictError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Build cannot be started. Current status: {e.status}",
+        )
+    return ModelResponse(BuildResponse.model_validate(build))
+
+
+def parse_range(header: str | None, size: int) -> tuple[int, int] | None:
+    """Parse a single-range `Range` header into inclusive (start, end).
+
+    Returns None when there is no usable range (absent, malformed or
+    multi-range), in which case the full body is sent. Raises 416 when the
+    range lies outside the content.
+    """
+    if not header:
+        return None
+    match = RANGE_PATTERN.match(header.strip())
+    if match is None or match.groups() == ("", ""):
+        return None
+
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        # Suffix range: the last N bytes
+        start = max(size - int(last), 0)
+        end = size - 1
+
+    if start > end or start >= size:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    return start, end
+
+
+@router.get("/{build_id}/output")
+async def get_build_output(
+    build_id: UUID,
+    request: Request,
+    session: AsyncSession = Depends(get_session),
+    current_user=Depends(get_current_user),
+):
+    """Stream a build's full output. Supports single `Range` requests."""
     build = await get_build_by_id(session, build_id)
 
     if not build:
@@ -131,17 +366,117 @@ async def start_build_endpoint(
             detail="Access denied",
         )
 
-    if build.status != "pending":
+    if build.output is None and build.output_blob_key is None:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Build cannot be started. Current status: {build.status}",
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Build has no output",
+        )
+
+    # Streaming a large output can take a while; don't hold a DB connection
+    await release_connection(session)
+
+    headers = {"Accept-Ranges": "bytes"}
+
+    if build.output_blob_key is None:
+        data = build.output.encode("utf-8")
+        byte_range = parse_range(request.headers.get("range"), len(data))
+        if byte_range is None:
+            return Response(data, media_type=OUTPUT_MEDIA_TYPE, headers=headers)
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{len(data)}"
+        return Response(
+            data[start : end + 1],
+            status_code=status.HTTP_206_PARTIAL_CONTENT,
+            media_type=OUTPUT_MEDIA_TYPE,
+            headers=headers,
+        )
+
+    store = get_blob_store()
+    key = build.output_blob_key
+    if not await store.exists(key):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Build output not found",
+        )
+
+    size = build.output_size
+    byte_range = parse_range(request.headers.get("range"), size)
+    if byte_range is not None:
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        headers["Content-Length"] = str(end - start + 1)
+        return StreamingResponse(
+            store.iter_range(key, start, end),
+            status_code=status.HTTP_206_PARTIAL_CONTENT,
+            media_type=OUTPUT_MEDIA_TYPE,
+            headers=headers,
+        )
+
+    headers["Vary"] = "Accept-Encoding"
+    if negotiate_encoding(request.headers.get("accept-encoding", ""), ["gzip"]) == "gzip":
+        # Blobs are stored gzipped; send them as they are
+        headers["Content-Encoding"] = "gzip"
+        return StreamingResponse(
+            store.iter_compressed(key), media_type=OUTPUT_MEDIA_TYPE, headers=headers
         )
 
-    # Mark build as running
-    started_build = await start_build(session, build)
+    headers["Content-Length"] = str(size)
+    return StreamingResponse(store.iter_range(key), media_type=OUTPUT_MEDIA_TYPE, headers=headers)
+
+
+@router.get("/{build_id}/events")
+async def stream_build_events(
+    build_id: UUID,
+    session: AsyncSession = Depends(get_session),
+    current_user=Depends(get_current_user),
+):
+    """Stream a build's status as Server-Sent Events until it finishes."""
+    build = await get_build_by_id(session, build_id)
+
+    if not build:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Build not found",
+        )
+
+    if build.user_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied",
+        )
+
+    # The stream can stay open for the whole build; don't hold a DB connection
+    await release_connection(session)
+
+    async def events():
+        async for event in watch_build(build_id):
+            yield format_sse(event, event="status") if event is not None else b": keepalive\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@router.websocket("/{build_id}/ws")
+async def build_events_websocket(websocket: WebSocket, build_id: UUID, token: str):
+    """WebSocket alternative to the SSE stream; authenticates with `?token=`."""
+    async with SessionLocal() as session:
+        try:
+            user = await authenticate_token(session, token)
+        except HTTPException:
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+            return
+        build = await get_build_by_id(session, build_id)
 
-    # TODO: Trigger agent service in background
-    # For now, we just mark it as running
-    # In production, this would queue a background job
+    if build is None or build.user_id != user.id:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
 
-    return started_build
+    await websocket.accept()
+    try:
+        async for event in watch_build(build_id):
+            if event is None:
+                await websocket.send_json({"event": "keepalive"})
+            else:
+                await websocket.send_text(json.dumps({"event": "status", "data": event}, default=str))
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
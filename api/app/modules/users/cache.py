@@ -0,0 +1,63 @@
+"""Authenticated-user cache - saves a users lookup on every request."""
+
+from typing import Any
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.pubsub import notify, pg_listener
+from app.models import User
+
+USER_INVALIDATION_CHANNEL = "user_invalidations"
+
+
+class UserCache:
+    """In-process LRU of active users keyed by id.
+
+    Entries are detached copies of the row, so no request ever shares an
+    instance with another; `get` merges the copy into the caller's session
+    without a query. Changes to a user must call `invalidate`, which drops
+    the local entry and notifies every other process on commit. Entries
+    also expire after `ttl` seconds, which bounds staleness if a
+    notification is missed; the whole cache is cleared when the listener
+    reconnects.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self._entries: TTLCache[User] = TTLCache(max_entries, ttl)
+        self.invalidations = 0
+
+    async def start(self) -> None:
+        await pg_listener.subscribe(USER_INVALIDATION_CHANNEL, self._on_invalidation)
+        pg_listener.on_reconnect(self._entries.clear)
+
+    async def get(self, session: AsyncSession, user_id: UUID) -> User | None:
+        cached = self._entries.get(user_id)
+        if cached is None:
+            return None
+        return await session.merge(cached, load=False)
+
+    def set(self, user: User) -> None:
+        if not user.is_active:
+            return
+        copy = User(**{column.key: getattr(user, column.key) for column in User.__table__.columns})
+        make_transient_to_detached(copy)
+        self._entries.set(user.id, copy)
+
+    async def invalidate(self, session: AsyncSession, user_id: UUID) -> None:
+        """Drop the user here now and in other processes once `session` commits."""
+        self._entries.pop(user_id)
+        await notify(session, USER_INVALIDATION_CHANNEL, {"id": str(user_id)})
+
+    def _on_invalidation(self, message: dict[str, Any]) -> None:
+        self.invalidations += 1
+        self._entries.pop(UUID(message["id"]))
+
+    def stats(self) -> dict[str, Any]:
+        return {**self._entries.stats(), "invalidations": self.invalidations}
+
+
+user_cache = UserCache(settings.user_cache_max_entries, settings.user_cache_ttl)
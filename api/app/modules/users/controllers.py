@@ -1,12 +1,15 @@
-from datetime import datetime, timezone
+from datetime import date, datetime, timezone
 from uuid import UUID
 
-from sqlalchemy import func, select
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.security import get_password_hash, verify_password
-from app.models import AgentUsage, PlanType, PLAN_LIMITS, User
+from app.core.security import password_hasher
+from app.db import save
+from app.models import PlanType, PLAN_LIMITS, UsageCounter, User
 
+from .cache import user_cache
 from .schemas import UserCreate, UserUpdate
 
 
@@ -28,7 +31,7 @@ async def get_user_by_google_id(session: AsyncSession, google_id: str) -> User |
 async def create_user(session: AsyncSession, user_data: UserCreate) -> User:
     password_hash = None
     if user_data.password:
-        password_hash = get_password_hash(user_data.password)
+        password_hash = await password_hasher.hash(user_data.password)
 
     user = User(
         email=user_data.email,
@@ -38,10 +41,7 @@ async def create_user(session: AsyncSession, user_data: UserCreate) -> User:
         google_id=user_data.google_id,
         plan=PlanType.FREE.value,
     )
-    session.add(user)
-    await session.commit()
-    await session.refresh(user)
-    return user
+    return await save(session, user)
 
 
 async def update_user(session: AsyncSession, user: User, user_data: UserUpdate) -> User:
@@ -54,9 +54,8 @@ async def update_user(session: AsyncSession, user: User, user_data: UserUpdate)
             else:
                 setattr(user, field, value)
 
-    await session.commit()
-    await session.refresh(user)
-    return user
+    await user_cache.invalidate(session, user.id)
+    return await save(session, user)
 
 
 async def authenticate_user(session: AsyncSession, email: str, password: str) -> User | None:
@@ -65,26 +64,34 @@ async def authenticate_user(session: AsyncSession, email: str, password: str) ->
         return None
     if not user.password_hash:
         return None
-    if not verify_password(password, user.password_hash):
+    if not await password_hasher.verify(password, user.password_hash):
         return None
     return user
 
 
+def current_period() -> date:
+    """Billing period of the current moment: the first day of the month (UTC)."""
+    return datetime.now(timezone.utc).date().replace(day=1)
+
+
 async def get_user_usage_this_month(session: AsyncSession, user_id: UUID) -> int:
     """Get the number of agent calls this month for a user."""
-    now = datetime.now(timezone.utc)
-    start_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-
     result = await session.execute(
-        select(func.coalesce(func.sum(AgentUsage.units_consumed), 0))
-        .where(AgentUsage.user_id == user_id)
-        .where(AgentUsage.created_at >= start_of_month)
+        select(UsageCounter.units)
+        .where(UsageCounter.user_id == user_id)
+        .where(UsageCounter.period == current_period())
     )
-    return result.scalar_one()
+    return result.scalar_one_or_none() or 0
+
 
+async def check_user_can_make_call(
+    session: AsyncSession,
+    user: User,
+    units: int = 1,
+) -> tuple[bool, int, int]:
+    """Check if user can spend `units` agent calls based on their plan limits.
 
-async def check_user_can_make_call(session: AsyncSession, user: User) -> tuple[bool, int, int]:
-    """Check if user can make an agent call based on their plan limits.
+    This only reads the counter; use `reserve_usage_units` to claim units.
 
     Returns: (can_make_call, limit, used)
     """
@@ -96,6 +103,61 @@ async def check_user_can_make_call(session: AsyncSession, user: User) -> tuple[b
         return True, -1, 0
 
     used = await get_user_usage_this_month(session, user.id)
-    can_make_call = used < limit
+    can_make_call = used + units <= limit
 
     return can_make_call, limit, used
+
+
+async def reserve_usage_units(
+    session: AsyncSession,
+    user: User,
+    units: int = 1,
+    period: date | None = None,
+) -> tuple[bool, int, int]:
+    """Atomically claim `units` from the user's monthly quota.
+
+    The counter is only incremented if the new total stays within the plan
+    limit, so concurrent calls cannot overshoot it. Commits the session.
+
+    Returns: (reserved, limit, used) where `used` includes the reservation.
+    """
+    period = period or current_period()
+    plan = PlanType(user.plan)
+    limit = PLAN_LIMITS.get(plan, 0)
+
+    if limit != -1 and units > limit:
+        used = await get_user_usage_this_month(session, user.id)
+        return False, limit, used
+
+    stmt = insert(UsageCounter).values(user_id=user.id, period=period, units=units)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UsageCounter.user_id, UsageCounter.period],
+        set_={"units": UsageCounter.units + stmt.excluded.units, "updated_at": func.now()},
+        where=None if limit == -1 else UsageCounter.units + stmt.excluded.units <= limit,
+    ).returning(UsageCounter.units)
+
+    used = (await session.execute(stmt)).scalar_one_or_none()
+    await session.commit()
+
+    if used is None:
+        # Over the limit: the row exists but was left unchanged
+        return False, limit, await get_user_usage_this_month(session, user.id)
+    return True, limit, used
+
+
+async def refund_usage_units(
+    session: AsyncSession,
+    user_id: UUID,
+    units: int,
+    period: date,
+) -> None:
+    """Give back units reserved for calls that failed. Commits the session."""
+    if units <= 0:
+        return
+    await session.execute(
+        update(UsageCounter)
+        .where(UsageCounter.user_id == user_id)
+        .where(UsageCounter.period == period)
+        .values(units=func.greatest(UsageCounter.units - units, 0), updated_at=func.now())
+    )
+    await session.commit()
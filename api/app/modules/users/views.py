@@ -1,13 +1,22 @@
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.security import create_access_token, decode_access_token
-from app.db import get_session
+from app.core.conditional import is_not_modified, not_modified, validator_headers, weak_etag
+from app.core.config import settings
+from app.core.ratelimit import limit_by_ip, rate_limiter
+from app.core.responses import ModelResponse
+from app.core.security import (
+    PasswordHasherBusyError,
+    create_access_token,
+    decode_access_token,
+)
+from app.db import get_session, save
 from app.models import AuthProvider, PLAN_LIMITS, PlanType
 
+from .cache import user_cache
 from .controllers import (
     authenticate_user,
     check_user_can_make_call,
@@ -31,13 +40,25 @@ router = APIRouter()
 security = HTTPBearer()
 
 
+def hasher_busy_exception(e: PasswordHasherBusyError) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=str(e),
+        headers={"Retry-After": "1"},
+    )
+
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     session: AsyncSession = Depends(get_session),
 ) -> "User":
+    return await authenticate_token(session, credentials.credentials)
+
+
+async def authenticate_token(session: AsyncSession, token: str) -> "User":
+    """Resolve an access token to an active user or raise 401/403."""
     from app.models import User
 
-    token = credentials.credentials
     payload = decode_access_token(token)
 
     if payload is None:
@@ -53,12 +74,16 @@ async def get_current_user(
             detail="Invalid token payload",
         )
 
-    user = await get_user_by_id(session, UUID(user_id))
+    user_id = UUID(user_id)
+    user = await user_cache.get(session, user_id)
     if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found",
-        )
+        user = await get_user_by_id(session, user_id)
+        if user is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="User not found",
+            )
+        user_cache.set(user)
 
     if not user.is_active:
         raise HTTPException(
@@ -69,9 +94,35 @@ async def get_current_user(
     return user
 
 
-@router.post("/", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
+async def get_current_admin(current_user=Depends(get_current_user)) -> "User":
+    """The current user, who must be an admin."""
+    if not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required",
+        )
+    return current_user
+
+
+def limit_by_user(name: str):
+    """Dependency limiting a route per authenticated user, scaled by their plan."""
+
+    async def dependency(response: Response, current_user=Depends(get_current_user)) -> None:
+        if settings.rate_limit_enabled:
+            await rate_limiter.enforce(name, f"user:{current_user.id}", response, plan=current_user.plan)
+
+    return dependency
+
+
+@router.post(
+    "/",
+    response_model=UserResponse,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(limit_by_ip("register"))],
+)
 async def register_user(
     user_data: UserCreate,
+    response: Response,
     session: AsyncSession = Depends(get_session),
 ):
     """Create a new user account."""
@@ -94,8 +145,15 @@ async def register_user(
             detail="Google ID is required for Google authentication",
         )
 
-    user = await create_user(session, user_data)
-    return user
+    try:
+        user = await create_user(session, user_data)
+    except PasswordHasherBusyError as e:
+        raise hasher_busy_exception(e)
+    return ModelResponse(
+        UserResponse.model_validate(user),
+        status.HTTP_201_CREATED,
+        headers=response.headers,
+    )
 
 
 @router.patch("/{user_id}", response_model=UserResponse)
@@ -113,15 +171,20 @@ async def update_user_endpoint(
         )
 
     user = await update_user(session, current_user, user_data)
-    return user
+    return ModelResponse(UserResponse.model_validate(user))
 
 
 @router.get("/me", response_model=UserResponse)
 async def get_current_user_endpoint(
+    request: Request,
     current_user = Depends(get_current_user),
 ):
-    """Get current authenticated user."""
-    return current_user
+    """Get current authenticated user. Supports If-None-Match and If-Modified-Since."""
+    updated_at = current_user.updated_at
+    headers = validator_headers(weak_etag("user", current_user.id, updated_at.isoformat()), updated_at)
+    if is_not_modified(request, headers["ETag"], updated_at):
+        return not_modified(headers)
+    return ModelResponse(UserResponse.model_validate(current_user), headers=headers)
 
 
 @router.get("/me/usage", response_model=UsageResponse)
@@ -134,22 +197,27 @@ async def get_current_user_usage(
 
     remaining = limit - used if limit != -1 else -1
 
-    return UsageResponse(
+    usage = UsageResponse(
         user_id=current_user.id,
         plan=current_user.plan,
         limit=limit,
         used=used,
         remaining=remaining,
     )
+    return ModelResponse(usage)
 
 
-@router.post("/login", response_model=TokenResponse)
+@router.post("/login", response_model=TokenResponse, dependencies=[Depends(limit_by_ip("login"))])
 async def login(
     login_data: LoginRequest,
+    response: Response,
     session: AsyncSession = Depends(get_session),
 ):
     """Login with email and password."""
-    user = await authenticate_user(session, login_data.email, login_data.password)
+    try:
+        user = await authenticate_user(session, login_data.email, login_data.password)
+    except PasswordHasherBusyError as e:
+        raise hasher_busy_exception(e)
 
     if not user:
         raise HTTPException(
@@ -165,15 +233,17 @@ async def login(
 
     access_token = create_access_token(data={"sub": str(user.id)})
 
-    return TokenResponse(
+    token = TokenResponse(
         access_token=access_token,
         user=UserResponse.model_validate(user),
     )
+    return ModelResponse(token, headers=response.headers)
 
 
-@router.post("/login/google", response_model=TokenResponse)
+@router.post("/login/google", response_model=TokenResponse, dependencies=[Depends(limit_by_ip("login"))])
 async def login_with_google(
     google_data: GoogleLoginRequest,
+    response: Response,
     session: AsyncSession = Depends(get_session),
 ):
     """Login or register with Google."""
@@ -187,8 +257,8 @@ async def login_with_google(
             # Link Google account to existing user
             user.google_id = google_data.google_id
             user.auth_provider = AuthProvider.GOOGLE.value
-            await session.commit()
-            await session.refresh(user)
+            await user_cache.invalidate(session, user.id)
+            await save(session, user)
         else:
             # Create new user
             user_create = UserCreate(
@@ -207,7 +277,8 @@ async def login_with_google(
 
     access_token = create_access_token(data={"sub": str(user.id)})
 
-    return TokenResponse(
+    token = TokenResponse(
         access_token=access_token,
         user=UserResponse.model_validate(user),
     )
+    return ModelResponse(token, headers=response.headers)
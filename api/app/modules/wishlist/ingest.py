@@ -0,0 +1,65 @@
+"""Buffered wishlist ingestion - signups are upserted in batches off the request path."""
+
+import logging
+import uuid
+from typing import Any
+
+from sqlalchemy import func, text
+from sqlalchemy.dialects.postgresql import insert
+
+from app.core.batching import BatchWriter
+from app.core.config import settings
+from app.db import SessionLocal
+from app.models import WishlistItem
+from app.modules.wishlist.schemas import WishlistCreate
+
+DEDUPE_KEY = ("email", "website", "action")
+
+
+def wishlist_row(payload: WishlistCreate) -> dict[str, Any]:
+    """WishlistItem column values for a submission, normalized for dedupe."""
+    return {
+        "id": uuid.uuid4(),
+        "email": payload.email.strip().lower(),
+        "name": payload.name,
+        "website": payload.website.strip(),
+        "action": payload.action,
+        "metadata_json": payload.metadata,
+    }
+
+
+class WishlistIngestor(BatchWriter):
+    """Upserts wishlist signups in batches.
+
+    Each batch is one multi-row INSERT ... ON CONFLICT on the live
+    (email, website, action) key, so a repeated signup refreshes the
+    existing row's name and metadata instead of adding one. Duplicates
+    within a batch are collapsed first, the latest submission winning.
+    """
+
+    label = "wishlist"
+    logger = logging.getLogger(__name__)
+
+    async def _insert(self, rows: list[dict[str, Any]]) -> None:
+        latest = {tuple(row[key] for key in DEDUPE_KEY): row for row in rows}
+        stmt = insert(WishlistItem).values(list(latest.values()))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(DEDUPE_KEY),
+            # Must match the partial index predicate for Postgres to use it
+            index_where=text("NOT is_deleted"),
+            set_={
+                "name": stmt.excluded.name,
+                "metadata": stmt.excluded.metadata,
+                "updated_at": func.now(),
+            },
+        )
+        async with SessionLocal() as session:
+            await session.execute(stmt)
+            await session.commit()
+
+
+wishlist_ingestor = WishlistIngestor(
+    batch_size=settings.wishlist_flush_batch_size,
+    flush_interval=settings.wishlist_flush_interval,
+    max_pending=settings.wishlist_buffer_max,
+)
@@ -23,3 +23,7 @@ class WishlistResponse(BaseModel):
     created_at: datetime
     updated_at: datetime
     is_deleted: bool
+
+
+class WishlistAcceptedResponse(BaseModel):
+    status: str = "accepted"
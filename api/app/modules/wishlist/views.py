@@ -1,27 +1,25 @@
-from fastapi import APIRouter, Depends, status
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 
-from app.db import get_session
-from app.modules.wishlist.controllers import create_wishlist_item
-from app.modules.wishlist.schemas import WishlistCreate, WishlistResponse
+from app.core.ratelimit import limit_by_ip
+from app.core.responses import ModelResponse
+from app.modules.wishlist.ingest import wishlist_ingestor, wishlist_row
+from app.modules.wishlist.schemas import WishlistAcceptedResponse, WishlistCreate
 
 router = APIRouter()
 
 
-@router.post("/", response_model=WishlistResponse, status_code=status.HTTP_201_CREATED)
-async def create_wishlist(
-    payload: WishlistCreate,
-    session: AsyncSession = Depends(get_session),
-):
-    item = await create_wishlist_item(session, payload)
-    return WishlistResponse(
-        id=item.id,
-        email=item.email,
-        name=item.name,
-        website=item.website,
-        action=item.action,
-        metadata=item.metadata_json,
-        created_at=item.created_at,
-        updated_at=item.updated_at,
-        is_deleted=item.is_deleted,
-    )
+@router.post(
+    "/",
+    response_model=WishlistAcceptedResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(limit_by_ip("wishlist"))],
+)
+async def create_wishlist(payload: WishlistCreate, response: Response):
+    """Queue a signup; it is stored (or merged with an earlier one) in the next batch."""
+    if not await wishlist_ingestor.offer(wishlist_row(payload)):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many signups right now, please retry shortly",
+            headers={"Retry-After": "1"},
+        )
+    return ModelResponse(WishlistAcceptedResponse(), status.HTTP_202_ACCEPTED, headers=response.headers)
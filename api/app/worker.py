@@ -0,0 +1,197 @@
+"""Build worker - claims queued build jobs and runs them against the agent service.
+
+Run with `python -m app.worker`. Any number of workers can run side by side;
+jobs are leased with `FOR UPDATE SKIP LOCKED` so each job runs on one worker.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import signal
+import socket
+import time
+import uuid
+
+from app.core.config import settings
+from app.core.http import close_http_client, init_http_client
+from app.db import SessionLocal
+from app.models import BuildJob
+from app.modules.agent.cache import result_cache
+from app.modules.agent.service import AgentService, AgentServiceError, UsageLimitExceededError
+from app.modules.agent.usage import usage_recorder
+from app.modules.builds.controllers import (
+    BuildTransitionError,
+    complete_build,
+    get_build_by_id,
+)
+from app.modules.builds.jobs import (
+    claim_build_jobs,
+    extend_build_job_lease,
+    mark_build_job_failed,
+    mark_build_job_succeeded,
+)
+from app.modules.users.controllers import get_user_by_id
+
+logger = logging.getLogger("app.worker")
+
+CACHE_PURGE_INTERVAL = 600  # seconds
+
+
+class BuildWorker:
+    """Runs up to `concurrency` build jobs at a time."""
+
+    def __init__(self, concurrency: int | None = None, worker_id: str | None = None):
+        self.concurrency = concurrency or settings.worker_concurrency
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._tasks: set[asyncio.Task] = set()
+        self._stopping = asyncio.Event()
+        self._next_cache_purge = 0.0
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    async def run(self) -> None:
+        logger.info("Worker %s started (concurrency=%s)", self.worker_id, self.concurrency)
+        while not self._stopping.is_set():
+            await self._purge_cache()
+            free_slots = self.concurrency - len(self._tasks)
+            jobs: list[BuildJob] = []
+            if free_slots > 0:
+                try:
+                    async with SessionLocal() as session:
+                        jobs = await claim_build_jobs(session, self.worker_id, free_slots)
+                except Exception:
+                    logger.exception("Failed to claim build jobs")
+
+            for job in jobs:
+                task = asyncio.create_task(self._run_job(job))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+            # Poll again right away while there is work and capacity left
+            if not jobs or len(self._tasks) >= self.concurrency:
+                await self._wait()
+
+        if self._tasks:
+            logger.info("Waiting for %s running jobs to finish", len(self._tasks))
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _purge_cache(self) -> None:
+        """Periodically drop expired rows from the shared agent result cache."""
+        if time.monotonic() < self._next_cache_purge:
+            return
+        self._next_cache_purge = time.monotonic() + CACHE_PURGE_INTERVAL
+        try:
+            async with SessionLocal() as session:
+                purged = await result_cache.purge_expired(session)
+            logger.debug("Purged %s expired agent cache entries", purged)
+        except Exception:
+            logger.exception("Failed to purge agent cache")
+
+    async def _wait(self) -> None:
+        waiters = [asyncio.create_task(self._stopping.wait()), *self._tasks]
+        await asyncio.wait(
+            waiters,
+            timeout=settings.worker_poll_interval,
+            return_when=asyncio.FIRST_COMPLETED,
+        )
+        waiters[0].cancel()
+
+    async def _heartbeat(self, job: BuildJob) -> None:
+        interval = max(settings.job_visibility_timeout / 3, 1)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                async with SessionLocal() as session:
+                    if not await extend_build_job_lease(session, job.id, self.worker_id):
+                        logger.warning("Lost lease on job %s", job.id)
+                        return
+            except Exception:
+                logger.exception("Failed to extend lease on job %s", job.id)
+
+    async def _run_job(self, job: BuildJob) -> None:
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        try:
+            await self._process(job)
+        except Exception as exc:
+            logger.exception("Job %s crashed", job.id)
+            async with SessionLocal() as session:
+                await self._fail(session, job, f"Worker error: {exc}", retry=True)
+        finally:
+            heartbeat.cancel()
+
+    async def _process(self, job: BuildJob) -> None:
+        async with SessionLocal() as session:
+            build = await get_build_by_id(session, job.build_id)
+            if build is None:
+                await mark_build_job_failed(session, job, self.worker_id, "Build not found", retry=False)
+                return
+
+            if job.attempts > job.max_attempts:
+                # Reclaimed after its last attempt crashed the worker
+                await self._fail(session, job, "Maximum attempts exceeded", retry=False)
+                return
+
+            user = await get_user_by_id(session, build.user_id)
+            if user is None or not user.is_active:
+                await self._fail(session, job, "User not found or inactive", retry=False)
+                return
+
+            try:
+                call = await AgentService(session).call_agent(
+                    user=user,
+                    action=build.action,
+                    website=build.website,
+                    metadata=build.metadata_json,
+                )
+            except UsageLimitExceededError as e:
+                await self._fail(session, job, e.message, retry=False)
+                return
+            except AgentServiceError as e:
+                await self._fail(session, job, e.message, retry=e.status_code >= 500)
+                return
+
+            # Finish the build before releasing the job: if that fails (e.g. the
+            # blob store is down), the job is still leased and _fail retries it
+            await self._complete(session, build, output=json.dumps(call.result), success=True)
+            await mark_build_job_succeeded(session, job.id, self.worker_id)
+
+    async def _fail(self, session, job: BuildJob, error: str, retry: bool) -> None:
+        will_retry = await mark_build_job_failed(session, job, self.worker_id, error, retry=retry)
+        if will_retry:
+            logger.info("Job %s failed (attempt %s), retrying: %s", job.id, job.attempts, error)
+            return
+
+        build = await get_build_by_id(session, job.build_id)
+        if build is not None:
+            await self._complete(session, build, error_message=error, success=False)
+
+    async def _complete(self, session, build, **kwargs) -> None:
+        try:
+            await complete_build(session, build, **kwargs)
+        except BuildTransitionError as e:
+            # Someone else already finished it (or it was never started)
+            await session.rollback()
+            logger.warning("Not completing build %s: %s", build.id, e)
+
+
+async def main() -> None:
+    logging.basicConfig(level=logging.DEBUG if settings.debug else logging.INFO)
+    worker = BuildWorker()
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+
+    await init_http_client()
+    await usage_recorder.start()
+    try:
+        await worker.run()
+    finally:
+        await usage_recorder.stop()
+        await close_http_client()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
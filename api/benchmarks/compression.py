@@ -0,0 +1,100 @@
+"""Bytes saved and CPU spent compressing large responses.
+
+Run with `python -m benchmarks.compression [--size BYTES] [--seconds S]`.
+
+Compresses a generated Playwright suite (a large build output, text/plain)
+and a build listing with full outputs (application/json) with each
+available encoding and level, in one go and as a stream of 64 KiB chunks
+flushed one by one (as the middleware does for streamed responses), and
+prints the compression ratio, the time per response and the throughput.
+"""
+
+import argparse
+import json
+import time
+import uuid
+
+from app.core.compression import COMPRESSORS
+
+LEVELS = {"gzip": (1, 5, 6, 9), "zstd": (1, 3, 6, 12)}
+STREAM_CHUNK = 64 * 1024
+
+
+def playwright_suite(size: int) -> bytes:
+    parts = ["import { test, expect } from '@playwright/test';\n\n"]
+    i = 0
+    while sum(map(len, parts)) < size:
+        parts.append(
+            f"test('checkout step {i} keeps the cart total', async ({{ page }}) => {{\n"
+            f"  await page.goto('https://shop.example.com/products/{uuid.uuid4().hex[:8]}');\n"
+            f"  await page.getByRole('button', {{ name: 'Add to cart' }}).click();\n"
+            f"  await expect(page.getByTestId('cart-count')).toHaveText('{i % 9 + 1}');\n"
+            f"  await expect(page.getByTestId('cart-total')).toContainText('${(i * 7) % 500}.99');\n"
+            "});\n\n"
+        )
+        i += 1
+    return "".join(parts).encode("utf-8")[:size]
+
+
+def build_listing(size: int) -> bytes:
+    builds = []
+    while sum(len(build["output"]) + 300 for build in builds) < size:
+        output = playwright_suite(16 * 1024).decode("utf-8")
+        builds.append(
+            {
+                "id": str(uuid.uuid4()),
+                "website": "https://shop.example.com",
+                "action": "write-playwright-tests",
+                "status": "completed",
+                "output": output,
+                "output_size": len(output),
+                "created_at": "2026-10-17T00:00:00Z",
+            }
+        )
+    return json.dumps({"builds": builds, "total": len(builds)}).encode("utf-8")
+
+
+def compress(encoding: str, level: int, data: bytes, streamed: bool) -> bytes:
+    compressor = COMPRESSORS[encoding](level)
+    if not streamed:
+        return compressor.compress(data) + compressor.finish()
+    out = [
+        compressor.compress(data[i : i + STREAM_CHUNK]) + compressor.flush()
+        for i in range(0, len(data), STREAM_CHUNK)
+    ]
+    out.append(compressor.finish())
+    return b"".join(out)
+
+
+def measure(encoding: str, level: int, data: bytes, streamed: bool, seconds: float) -> tuple[int, float]:
+    count = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        compressed = compress(encoding, level, data, streamed)
+        count += 1
+    return len(compressed), (time.perf_counter() - started) / count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=512 * 1024)
+    parser.add_argument("--seconds", type=float, default=0.5)
+    args = parser.parse_args()
+
+    samples = {"text/plain": playwright_suite(args.size), "application/json": build_listing(args.size)}
+    for media_type, data in samples.items():
+        print(f"{media_type}, {len(data):,} bytes")
+        for encoding in COMPRESSORS:
+            for level in LEVELS[encoding]:
+                for streamed in (False, True):
+                    size, elapsed = measure(encoding, level, data, streamed, args.seconds)
+                    mode = "stream" if streamed else "whole"
+                    print(
+                        f"  {encoding:>4} {level:>2} {mode:>6}: {size:>9,} bytes "
+                        f"({1 - size / len(data):>6.1%} saved)  {elapsed * 1000:>7.2f} ms  "
+                        f"{len(data) / elapsed / 1e6:>7.1f} MB/s"
+                    )
+
+
+if __name__ == "__main__":
+    main()
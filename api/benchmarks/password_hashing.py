@@ -0,0 +1,119 @@
+"""Latency of unrelated requests while logins are hashing passwords.
+
+Run with `python -m benchmarks.password_hashing [--logins N] [--workers N]`.
+
+Fires N concurrent logins (real bcrypt, database lookups stubbed) while
+polling a cheap endpoint, once with bcrypt run inline on the event loop (the
+old behaviour) and once on the bounded thread pool, and prints the probe
+latency percentiles for each. Rate limiting is off: every request comes
+from the same client address and the logins would mostly get 429s.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import httpx
+
+from app.core.security import PasswordHasher, get_password_hash
+from app.db import get_session
+from app.main import app
+from app.modules.users.views import get_current_admin
+
+PASSWORD = "correct horse battery staple"
+PROBE_URL = "/api/v0/agent/stats"
+PROBE_INTERVAL = 0.01
+
+
+class InlineHasher(PasswordHasher):
+    """Hashes on the calling thread, blocking the event loop."""
+
+    async def _run(self, fn, *args):
+        return fn(*args)
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+
+async def run(hasher: PasswordHasher, logins: int) -> dict[str, int | float]:
+    user = SimpleNamespace(
+        id="00000000-0000-0000-0000-000000000001",
+        email="dev@example.com",
+        name="Dev",
+        auth_provider="local",
+        plan="free",
+        is_active=True,
+        password_hash=get_password_hash(PASSWORD),
+        created_at="2026-01-01T00:00:00Z",
+        updated_at="2026-01-01T00:00:00Z",
+    )
+    app.dependency_overrides[get_session] = lambda: SimpleNamespace()
+    app.dependency_overrides[get_current_admin] = lambda: user
+    transport = httpx.ASGITransport(app=app)
+    probes: list[float] = []
+    done = asyncio.Event()
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+        async def login():
+            response = await client.post(
+                "/api/v0/users/login", json={"email": user.email, "password": PASSWORD}
+            )
+            return response.status_code
+
+        async def probe():
+            # Measure from when each probe was due, so time spent waiting
+            # for a blocked event loop counts against it
+            due = time.perf_counter()
+            while not done.is_set():
+                await asyncio.sleep(max(due - time.perf_counter(), 0))
+                await client.get(PROBE_URL)
+                probes.append(time.perf_counter() - due)
+                due = max(due + PROBE_INTERVAL, time.perf_counter())
+
+        with patch("app.modules.users.controllers.get_user_by_email", AsyncMock(return_value=user)), patch(
+            "app.modules.users.controllers.password_hasher", hasher
+        ), patch("app.core.ratelimit.settings.rate_limit_enabled", False):
+            prober = asyncio.create_task(probe())
+            started = time.perf_counter()
+            statuses = await asyncio.gather(*(login() for _ in range(logins)))
+            elapsed = time.perf_counter() - started
+            done.set()
+            await prober
+
+    app.dependency_overrides.pop(get_session, None)
+    app.dependency_overrides.pop(get_current_admin, None)
+    return {
+        "logins_ok": statuses.count(200),
+        "logins_rejected": statuses.count(503),
+        "logins_limited": statuses.count(429),
+        "logins_seconds": round(elapsed, 2),
+        "probes": len(probes),
+        "probe_p50_ms": round(statistics.median(probes) * 1000, 1),
+        "probe_p99_ms": round(percentile(probes, 99) * 1000, 1),
+        "probe_max_ms": round(max(probes) * 1000, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    for name, hasher in (
+        ("inline", InlineHasher(0, args.logins)),
+        ("pool", PasswordHasher(args.workers, args.logins)),
+    ):
+        result = asyncio.run(run(hasher, args.logins))
+        hasher.shutdown()
+        print(f"{name:>6}: " + "  ".join(f"{key}={value:g}" for key, value in result.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Cost of encoding a build listing.
+
+Run with `python -m benchmarks.serialization [--builds N] [--output-bytes N] [--seconds S]`.
+
+Encodes a BuildListResponse of N builds with every field selected and a
+large inline output, the way GET /builds/ used to (validated items, then
+FastAPI's response_model pass and the stdlib encoder), with the same pass
+and orjson, and the way it does now (items built without validation and
+encoded once by pydantic-core), and prints responses per second.
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute, serialize_response
+
+from app.core.responses import ModelResponse, ORJSONResponse
+from app.main import app
+from app.models import Build
+from app.modules.builds.controllers import BUILD_COLUMNS
+from app.modules.builds.schemas import BUILD_LIST_FIELDS, BuildListItem, BuildListResponse
+
+LIST_PATH = "/api/v0/builds/"
+
+
+def make_builds(count: int, output_bytes: int) -> list[Build]:
+    user_id = uuid.uuid4()
+    now = datetime.now(timezone.utc)
+    line = "PASS tests/checkout.spec.ts > applies a discount code (412 ms)\n"
+    output = (line * (output_bytes // len(line) + 1))[:output_bytes]
+    return [
+        Build(
+            id=uuid.uuid4(),
+            user_id=user_id,
+            website=f"https://shop-{i}.example.com",
+            action="write-playwright-tests",
+            status="completed",
+            output=output,
+            output_size=len(output),
+            error_message=None,
+            metadata_json={"browser": "chromium", "viewport": [1280, 720], "tags": ["checkout", "smoke"]},
+            started_at=now - timedelta(minutes=5),
+            completed_at=now,
+            created_at=now - timedelta(minutes=6),
+            updated_at=now,
+        )
+        for i in range(count)
+    ]
+
+
+def listing(builds: list[Build], item) -> BuildListResponse:
+    return BuildListResponse(
+        builds=[
+            item(**{field: getattr(build, BUILD_COLUMNS[field].key) for field in BUILD_LIST_FIELDS})
+            for build in builds
+        ],
+        total=len(builds),
+        total_is_estimate=False,
+        limit=len(builds),
+        next_cursor=None,
+    )
+
+
+def encoder(response_class, field):
+    def encode(builds: list[Build]) -> bytes:
+        content = asyncio.run(
+            serialize_response(field=field, response_content=listing(builds, BuildListItem), exclude_unset=True)
+        )
+        return response_class(content).body
+
+    return encode
+
+
+def encode_once(builds: list[Build]) -> bytes:
+    return ModelResponse(listing(builds, BuildListItem.model_construct), exclude_unset=True).body
+
+
+def measure(encode, builds: list[Build], seconds: float) -> tuple[float, int]:
+    count = 0
+    started = time.perf_counter()
+    deadline = started + seconds
+    while time.perf_counter() < deadline:
+        body = encode(builds)
+        count += 1
+    return count / (time.perf_counter() - started), len(body)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--builds", type=int, default=100)
+    parser.add_argument("--output-bytes", type=int, default=16 * 1024)
+    parser.add_argument("--seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    route = next(
+        route
+        for route in app.routes
+        if isinstance(route, APIRoute) and route.path == LIST_PATH and "GET" in route.methods
+    )
+    builds = make_builds(args.builds, args.output_bytes)
+    variants = {
+        "response_model + json": encoder(JSONResponse, route.response_field),
+        "response_model + orjson": encoder(ORJSONResponse, route.response_field),
+        "ModelResponse": encode_once,
+    }
+    for name, encode in variants.items():
+        rate, size = measure(encode, builds, args.seconds)
+        print(f"{name:>24}: {rate:>8,.1f} responses/s   {1000 / rate:>7.2f} ms each   {size:,} bytes")
+
+
+if __name__ == "__main__":
+    main()
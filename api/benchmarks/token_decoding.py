@@ -0,0 +1,44 @@
+"""Access-token verification throughput.
+
+Run with `python -m benchmarks.token_decoding [--tokens N] [--seconds S]`.
+
+Decodes a pool of distinct tokens round-robin (as a worker sees its active
+users) with each verifier, uncached and through the token cache, and prints
+tokens per second.
+"""
+
+import argparse
+import time
+import uuid
+
+from app.core.config import settings
+from app.core.security import TOKEN_VERIFIERS, TokenCache, create_access_token
+
+
+def measure(decode, tokens: list[str], seconds: float) -> float:
+    count = 0
+    started = time.perf_counter()
+    deadline = started + seconds
+    while time.perf_counter() < deadline:
+        for token in tokens:
+            assert decode(token) is not None
+        count += len(tokens)
+    return count / (time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tokens", type=int, default=1000)
+    parser.add_argument("--seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    tokens = [create_access_token(data={"sub": str(uuid.uuid4())}) for _ in range(args.tokens)]
+    for name, verify in TOKEN_VERIFIERS.items():
+        uncached = measure(lambda token: verify(token, settings.secret_key), tokens, args.seconds)
+        cache = TokenCache(max_entries=args.tokens, ttl=300)
+        cached = measure(lambda token: cache.decode(token, verify), tokens, args.seconds)
+        print(f"{name:>5}: uncached {uncached:>10,.0f} tokens/s   cached {cached:>10,.0f} tokens/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,980 @@
+import asyncio
+import json
+import time
+import unittest
+import uuid
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock, patch
+
+import httpx
+from fastapi.testclient import TestClient
+from sqlalchemy.dialects import postgresql
+
+from app.core import http as http_module
+from app.core.cache import TTLCache
+from app.core.http import get_action_timeout, get_pool_stats
+from app.db import get_session
+from app.main import app
+from app.modules.agent.cache import canonicalize_url, make_cache_key
+from app.modules.agent.resilience import AdaptiveConcurrencyLimiter, CircuitBreaker
+from app.modules.agent.service import AgentService, AgentServiceError, AgentUnavailableError
+from app.modules.agent.singleflight import SingleFlight
+from app.modules.agent.usage import UsageRecorder
+from app.modules.users.controllers import current_period, reserve_usage_units
+
+
+def make_user(plan: str = "free"):
+    return SimpleNamespace(id=uuid.uuid4(), plan=plan, is_active=True)
+
+
+def make_session():
+    return SimpleNamespace(
+        add=Mock(),
+        commit=AsyncMock(),
+        refresh=AsyncMock(),
+        in_transaction=Mock(return_value=False),
+    )
+
+
+class FakeResultCache:
+    def __init__(self, entries=None):
+        self.entries = dict(entries or {})
+
+    async def get(self, session, key):
+        return self.entries.get(key)
+
+    async def set(self, session, key, action, website, result):
+        self.entries[key] = result
+
+
+class FakeUsageRecorder:
+    def __init__(self):
+        self.rows = []
+
+    async def record(self, row):
+        self.rows.append(row)
+
+
+def make_breaker(**overrides) -> CircuitBreaker:
+    options = dict(failure_threshold=0.5, min_calls=4, window=30, open_seconds=15, half_open_calls=1)
+    options.update(overrides)
+    return CircuitBreaker(**options)
+
+
+def make_limiter(**overrides) -> AdaptiveConcurrencyLimiter:
+    options = dict(initial=4, minimum=1, maximum=8, queue_timeout=0.05, latency_target=10)
+    options.update(overrides)
+    return AdaptiveConcurrencyLimiter(**options)
+
+
+class AgentServiceTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.reserve = AsyncMock(return_value=(True, 10, 1))
+        self.refund = AsyncMock()
+        self.cache = FakeResultCache()
+        self.breaker = make_breaker()
+        self.limiter = make_limiter()
+        self.usage = FakeUsageRecorder()
+        for target, new in (
+            ("app.modules.agent.service.reserve_usage_units", self.reserve),
+            ("app.modules.agent.service.refund_usage_units", self.refund),
+            (
+                "app.modules.agent.service.SessionLocal",
+                Mock(side_effect=lambda: FakeSessionContext(make_session())),
+            ),
+            ("app.modules.agent.service.result_cache", self.cache),
+            ("app.modules.agent.service.circuit_breaker", self.breaker),
+            ("app.modules.agent.service.concurrency_limiter", self.limiter),
+            ("app.modules.agent.service.usage_recorder", self.usage),
+        ):
+            patcher = patch(target, new=new)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+class AgentServiceClientTests(AgentServiceTestCase):
+    def test_call_agent_uses_injected_client(self) -> None:
+        requests = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            return httpx.Response(200, json={"score": 97})
+
+        async def run_test():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                service = AgentService(make_session(), client=client)
+                return await service.call_agent(
+                    user=make_user(),
+                    action="analyze-performance",
+                    website="https://example.com",
+                )
+
+        call = asyncio.run(run_test())
+
+        self.assertEqual(call.result, {"score": 97})
+        self.assertFalse(call.cached)
+        self.assertEqual(len(requests), 1)
+        self.assertTrue(requests[0].url.path.endswith("/v0/agent/analyze-performance"))
+        self.assertEqual(json.loads(requests[0].content)["website"], "https://example.com")
+
+    def test_call_agent_maps_timeout_to_504(self) -> None:
+        def handler(request: httpx.Request) -> httpx.Response:
+            raise httpx.ReadTimeout("timed out", request=request)
+
+        async def run_test():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                service = AgentService(make_session(), client=client)
+                await service.call_agent(
+                    user=make_user(),
+                    action="analyze-performance",
+                    website="https://example.com",
+                )
+
+        with self.assertRaises(AgentServiceError) as ctx:
+            asyncio.run(run_test())
+        self.assertEqual(ctx.exception.status_code, 504)
+        # Failed calls give the reserved unit back and are logged as free
+        self.refund.assert_awaited_once()
+        self.assertEqual(self.usage.rows[-1]["units_consumed"], 0)
+
+
+class AgentResultCacheTests(AgentServiceTestCase):
+    def call(self, handler, user, use_cache=True, metadata=None):
+        async def run_test():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                session = make_session()
+                service = AgentService(session, client=client)
+                call = await service.call_agent(
+                    user=user,
+                    action="analyze-performance",
+                    website="https://Example.com/",
+                    metadata=metadata,
+                    use_cache=use_cache,
+                )
+                return call, session
+
+        return asyncio.run(run_test())
+
+    def test_cache_key_normalizes_website_and_metadata(self) -> None:
+        self.assertEqual(
+            canonicalize_url("HTTPS://Example.com:443/path/?b=2&a=1#top"),
+            "https://example.com/path?a=1&b=2",
+        )
+        self.assertEqual(canonicalize_url("example.com"), "https://example.com/")
+        self.assertEqual(
+            make_cache_key("analyze-performance", "example.com", {"a": 1, "b": 2}),
+            make_cache_key("analyze-performance", "https://example.com/", {"b": 2, "a": 1}),
+        )
+        self.assertNotEqual(
+            make_cache_key("analyze-performance", "example.com", None),
+            make_cache_key("generate-test-cases", "example.com", None),
+        )
+
+    def test_second_call_is_served_from_cache(self) -> None:
+        requests = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            return httpx.Response(200, json={"score": 97})
+
+        user = make_user("free")
+        first, _ = self.call(handler, user)
+        second, session = self.call(handler, user)
+
+        self.assertEqual(len(requests), 1)
+        self.assertFalse(first.cached)
+        self.assertTrue(second.cached)
+        self.assertEqual(second.result, {"score": 97})
+        # Free plan is billed for cache hits
+        self.assertEqual(self.usage.rows[-1]["units_consumed"], 1)
+
+    def test_cache_hits_are_free_on_business_plan(self) -> None:
+        handler = lambda request: httpx.Response(200, json={"score": 97})
+        user = make_user("business")
+        self.call(handler, user)
+        self.reserve.reset_mock()
+
+        call, session = self.call(handler, user)
+
+        self.assertTrue(call.cached)
+        self.reserve.assert_not_awaited()
+        self.assertEqual(self.usage.rows[-1]["units_consumed"], 0)
+
+    def test_opt_out_bypasses_cache(self) -> None:
+        requests = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            return httpx.Response(200, json={"score": len(requests)})
+
+        user = make_user()
+        self.call(handler, user)
+        call, _ = self.call(handler, user, use_cache=False)
+
+        self.assertEqual(len(requests), 2)
+        self.assertFalse(call.cached)
+        self.assertEqual(call.result, {"score": 2})
+
+    def test_failed_cache_write_keeps_the_result(self) -> None:
+        self.cache.set = AsyncMock(side_effect=RuntimeError("database is down"))
+        handler = lambda request: httpx.Response(200, json={"score": 97})
+
+        with self.assertLogs("app.modules.agent.service", level="ERROR"):
+            call, _ = self.call(handler, make_user())
+
+        self.assertEqual(call.result, {"score": 97})
+        self.cache.set.assert_awaited_once()
+        self.refund.assert_not_awaited()
+        self.assertEqual(self.usage.rows[-1]["units_consumed"], 1)
+
+
+class SingleFlightTests(AgentServiceTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.singleflight = SingleFlight()
+        patcher = patch("app.modules.agent.service.singleflight", new=self.singleflight)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_identical_concurrent_calls_share_one_upstream_request(self) -> None:
+        requests = []
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            await asyncio.sleep(0.05)
+            return httpx.Response(200, json={"score": 97})
+
+        async def run_test():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                sessions = [make_session() for _ in range(3)]
+                calls = await asyncio.gather(
+                    *(
+                        AgentService(session, client=client).call_agent(
+                            user=make_user(),
+                            action="analyze-performance",
+                            website="https://example.com",
+                            use_cache=False,
+                        )
+                        for session in sessions
+                    )
+                )
+                return calls, sessions
+
+        calls, sessions = asyncio.run(run_test())
+
+        self.assertEqual(len(requests), 1)
+        self.assertEqual([call.result for call in calls], [{"score": 97}] * 3)
+        self.assertEqual(sum(call.coalesced for call in calls), 2)
+        # Every caller still records its own usage
+        self.assertEqual(len(self.usage.rows), 3)
+        stats = self.singleflight.stats()
+        self.assertEqual(stats["leaders"], 1)
+        self.assertEqual(stats["coalesced_local"], 2)
+        self.assertEqual(stats["in_flight"], 0)
+
+    def test_different_websites_are_not_coalesced(self) -> None:
+        requests = []
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            await asyncio.sleep(0.01)
+            return httpx.Response(200, json={})
+
+        async def run_test():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                await asyncio.gather(
+                    *(
+                        AgentService(make_session(), client=client).call_agent(
+                            user=make_user(),
+                            action="analyze-performance",
+                            website=website,
+                            use_cache=False,
+                        )
+                        for website in ("https://a.example.com", "https://b.example.com")
+                    )
+                )
+
+        asyncio.run(run_test())
+
+        self.assertEqual(len(requests), 2)
+        self.assertEqual(self.singleflight.coalesced_local, 0)
+
+    def test_distributed_lease_outlasts_the_action_timeout(self) -> None:
+        statements = []
+
+        async def execute(statement):
+            statements.append(statement)
+            return SimpleNamespace(scalar_one_or_none=lambda: "key")
+
+        session = SimpleNamespace(execute=execute, commit=AsyncMock())
+        fn = AsyncMock(return_value="result")
+        lookup = AsyncMock(return_value=None)
+
+        with (
+            patch("app.modules.agent.singleflight.settings.agent_singleflight_distributed", True),
+            patch("app.modules.agent.singleflight.settings.agent_singleflight_lease_margin", 15.0),
+            patch("app.modules.agent.singleflight.SessionLocal", Mock(return_value=FakeSessionContext(session))),
+        ):
+            started = time.time()
+            result, coalesced = asyncio.run(self.singleflight.do("key", fn, lookup, timeout=120.0))
+
+        self.assertEqual((result, coalesced), ("result", False))
+        expires_at = statements[0].compile(dialect=postgresql.dialect()).params["expires_at"]
+        self.assertAlmostEqual(expires_at.timestamp() - started, 135.0, delta=1.0)
+
+
+class FakeSessionContext:
+    def __init__(self, session):
+        self.session = session
+
+    async def __aenter__(self):
+        return self.session
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+
+class AgentStreamTests(AgentServiceTestCase):
+    def stream(self, handler) -> list[bytes]:
+        async def run_test():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                service = AgentService(make_session(), client=client)
+                events = await service.stream_agent(
+                    user=make_user(),
+                    action="write-playwright-tests",
+                    website="https://example.com",
+                )
+                return [event async for event in events]
+
+        return asyncio.run(run_test())
+
+    def test_chunks_are_forwarded_as_events(self) -> None:
+        async def body():
+            yield b"test('home', "
+            # A multi-byte character split across two chunks
+            yield "async () => {}) // \u2713".encode("utf-8")[:-1]
+            yield "\u2713".encode("utf-8")[-1:]
+
+        events = self.stream(lambda request: httpx.Response(200, content=body()))
+
+        self.assertTrue(events[0].startswith(b"event: start\n"))
+        self.assertTrue(events[-1].startswith(b"event: done\n"))
+        chunks = [
+            event.decode("utf-8").split("data: ", 1)[1].rstrip("\n")
+            for event in events
+            if event.startswith(b"event: chunk")
+        ]
+        self.assertEqual("".join(chunks), "test('home', async () => {}) // \u2713")
+        usage = self.usage.rows[-1]
+        self.assertEqual(usage["response_status"], 200)
+        self.assertTrue(usage["request_metadata"]["stream"])
+
+    def test_aborted_stream_still_records_usage(self) -> None:
+        async def body():
+            yield b"first"
+            await asyncio.sleep(10)
+            yield b"never sent"
+
+        async def run_test():
+            handler = lambda request: httpx.Response(200, content=body())
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                service = AgentService(make_session(), client=client)
+                events = await service.stream_agent(
+                    user=make_user(),
+                    action="write-playwright-tests",
+                    website="https://example.com",
+                )
+                await events.__anext__()
+                await events.__anext__()
+                await events.aclose()
+
+        asyncio.run(run_test())
+
+        self.assertEqual(self.usage.rows[-1]["response_status"], 499)
+
+    def test_unread_stream_refunds_the_reserved_unit(self) -> None:
+        handler = Mock()
+
+        async def run_test():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                service = AgentService(make_session(), client=client)
+                events = await service.stream_agent(
+                    user=make_user(),
+                    action="write-playwright-tests",
+                    website="https://example.com",
+                )
+                # The client left before the response body was iterated
+                del events
+                for _ in range(3):
+                    await asyncio.sleep(0)
+                return self.refund.await_count
+
+        self.assertEqual(asyncio.run(run_test()), 1)
+        handler.assert_not_called()
+        self.assertEqual(self.usage.rows[-1]["response_status"], 499)
+
+    def test_upstream_error_becomes_error_event(self) -> None:
+        events = self.stream(lambda request: httpx.Response(502, text="bad gateway"))
+
+        self.assertEqual(len(events), 1)
+        self.assertIn(b"event: error", events[0])
+        self.assertIn(b"bad gateway", events[0])
+        self.assertEqual(self.usage.rows[-1]["response_status"], 502)
+
+
+class FakePool:
+    """Connection pool that makes callers wait when every connection is checked out."""
+
+    def __init__(self, size: int, timeout: float):
+        self.slots = asyncio.Semaphore(size)
+        self.timeout = timeout
+        self.checked_out = 0
+
+    async def checkout(self) -> None:
+        await asyncio.wait_for(self.slots.acquire(), self.timeout)
+        self.checked_out += 1
+
+    def checkin(self) -> None:
+        self.checked_out -= 1
+        self.slots.release()
+
+
+class PooledSession:
+    """Holds a connection from its first query until commit or close, like AsyncSession."""
+
+    def __init__(self, pool: FakePool):
+        self.pool = pool
+        self.connected = False
+
+    def in_transaction(self) -> bool:
+        return self.connected
+
+    async def execute(self, statement=None):
+        if not self.connected:
+            await self.pool.checkout()
+            self.connected = True
+        return SimpleNamespace(scalar_one_or_none=lambda: None)
+
+    async def commit(self) -> None:
+        if self.connected:
+            self.connected = False
+            self.pool.checkin()
+
+    close = commit
+
+
+class ConnectionReleaseTests(AgentServiceTestCase):
+    def test_other_endpoints_stay_responsive_during_agent_calls(self) -> None:
+        pool = FakePool(size=5, timeout=0.5)
+        checked_out_during_calls = []
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            checked_out_during_calls.append(pool.checked_out)
+            await asyncio.sleep(0.3)
+            return httpx.Response(200, json={"score": 97})
+
+        async def agent_request(client, index):
+            session = PooledSession(pool)
+            await session.execute()  # get_current_user loads the user
+            try:
+                return await AgentService(session, client=client).call_agent(
+                    user=make_user(),
+                    action="analyze-performance",
+                    website=f"https://site{index}.example.com",
+                )
+            finally:
+                await session.close()
+
+        async def other_request():
+            session = PooledSession(pool)
+            started = time.monotonic()
+            await session.execute()
+            await session.close()
+            return time.monotonic() - started
+
+        async def run_test():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                calls = [asyncio.create_task(agent_request(client, i)) for i in range(40)]
+                await asyncio.sleep(0.1)
+                latencies = [await other_request() for _ in range(5)]
+                results = await asyncio.gather(*calls)
+                return results, latencies
+
+        self.limiter.limit = 50
+        results, latencies = asyncio.run(run_test())
+
+        self.assertEqual(len(results), 40)
+        self.assertTrue(all(call.result == {"score": 97} for call in results))
+        # 40 calls are in flight against a pool of 5 and no connection is held
+        self.assertEqual(len(checked_out_during_calls), 40)
+        self.assertEqual(max(checked_out_during_calls), 0)
+        self.assertLess(max(latencies), 0.1)
+
+
+class AgentBatchTests(AgentServiceTestCase):
+    def run_batch(self, handler, websites, user=None):
+        async def run_test():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                service = AgentService(make_session(), client=client)
+                items = await service.batch_call_agent(
+                    user=user or make_user(),
+                    action="analyze-performance",
+                    websites=websites,
+                )
+                return [item async for item in items]
+
+        return asyncio.run(run_test())
+
+    def test_batch_checks_quota_once_and_records_usage_per_item(self) -> None:
+        def handler(request: httpx.Request) -> httpx.Response:
+            website = json.loads(request.content)["website"]
+            if "broken" in website:
+                return httpx.Response(500, text="boom")
+            return httpx.Response(200, json={"website": website})
+
+        websites = ["https://a.example.com", "https://broken.example.com", "https://c.example.com"]
+        items = self.run_batch(handler, websites)
+
+        self.reserve.assert_awaited_once()
+        self.assertEqual(self.reserve.call_args.args[2], 3)
+        # Only the failed item is refunded
+        self.refund.assert_awaited_once()
+        self.assertEqual(self.refund.call_args.args[2], 1)
+        by_index = {item["index"]: item for item in items}
+        self.assertEqual(sorted(by_index), [0, 1, 2])
+        self.assertTrue(by_index[0]["success"])
+        self.assertFalse(by_index[1]["success"])
+        self.assertEqual(by_index[1]["error"], "boom")
+
+        self.assertEqual(
+            sorted(row["request_metadata"]["website"] for row in self.usage.rows),
+            sorted(websites),
+        )
+
+    def test_unread_batch_refunds_every_unit(self) -> None:
+        handler = Mock()
+
+        async def run_test():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                service = AgentService(make_session(), client=client)
+                items = await service.batch_call_agent(
+                    user=make_user(),
+                    action="analyze-performance",
+                    websites=["https://a.example.com", "https://b.example.com"],
+                )
+                # The client left before the response body was iterated
+                del items
+                for _ in range(3):
+                    await asyncio.sleep(0)
+                return [call.args[2] for call in self.refund.await_args_list]
+
+        self.assertEqual(asyncio.run(run_test()), [2])
+        handler.assert_not_called()
+
+    def test_batch_over_quota_is_rejected_up_front(self) -> None:
+        from app.modules.agent.service import UsageLimitExceededError
+
+        self.reserve.return_value = (False, 10, 9)
+        handler = Mock()
+
+        with self.assertRaises(UsageLimitExceededError):
+            self.run_batch(handler, ["https://a.example.com", "https://b.example.com"])
+
+        handler.assert_not_called()
+        self.assertEqual(self.usage.rows, [])
+
+    def test_batch_respects_concurrency_limit(self) -> None:
+        in_flight = 0
+        peak = 0
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return httpx.Response(200, json={})
+
+        websites = [f"https://site{i}.example.com" for i in range(8)]
+        with patch("app.modules.agent.service.settings.agent_batch_concurrency", 2):
+            items = self.run_batch(handler, websites)
+
+        self.assertEqual(len(items), 8)
+        self.assertLessEqual(peak, 2)
+
+
+class UsageRecorderTests(unittest.TestCase):
+    def make_recorder(self, **overrides) -> UsageRecorder:
+        options = dict(batch_size=3, flush_interval=0.05, max_pending=100)
+        options.update(overrides)
+        recorder = UsageRecorder(**options)
+        self.inserts = []
+
+        async def insert(rows):
+            self.inserts.append(list(rows))
+
+        recorder._insert = insert
+        return recorder
+
+    def row(self, user_id, units=1):
+        return {"user_id": user_id, "action": "analyze-performance", "units_consumed": units}
+
+    def test_rows_are_flushed_in_batches_by_size(self) -> None:
+        recorder = self.make_recorder(flush_interval=10)
+        user_id = uuid.uuid4()
+
+        async def run_test():
+            await recorder.start()
+            for _ in range(7):
+                await recorder.record(self.row(user_id))
+            await asyncio.sleep(0.01)
+            flushed_before_stop = [len(rows) for rows in self.inserts]
+            await recorder.stop()
+            return flushed_before_stop
+
+        flushed_before_stop = asyncio.run(run_test())
+
+        self.assertEqual(flushed_before_stop, [3, 3])
+        # The remainder is flushed on shutdown
+        self.assertEqual([len(rows) for rows in self.inserts], [3, 3, 1])
+
+    def test_partial_batch_is_flushed_after_interval(self) -> None:
+        recorder = self.make_recorder()
+
+        async def run_test():
+            await recorder.start()
+            await recorder.record(self.row(uuid.uuid4()))
+            await asyncio.sleep(0.1)
+            flushed = len(self.inserts)
+            await recorder.stop()
+            return flushed
+
+        self.assertEqual(asyncio.run(run_test()), 1)
+
+    def test_full_buffer_applies_backpressure(self) -> None:
+        recorder = self.make_recorder(batch_size=1, max_pending=1)
+        release = asyncio.Event()
+
+        async def slow_insert(rows):
+            await release.wait()
+            self.inserts.append(rows)
+
+        recorder._insert = slow_insert
+        user_id = uuid.uuid4()
+
+        async def run_test():
+            release.clear()
+            await recorder.start()
+            await recorder.record(self.row(user_id))  # taken by the flush
+            await asyncio.sleep(0.01)
+            await recorder.record(self.row(user_id))  # fills the buffer
+            blocked = asyncio.create_task(recorder.record(self.row(user_id)))
+            await asyncio.sleep(0.05)
+            was_blocked = not blocked.done()
+            release.set()
+            await blocked
+            await recorder.stop()
+            return was_blocked
+
+        self.assertTrue(asyncio.run(run_test()))
+        self.assertEqual(sum(len(rows) for rows in self.inserts), 3)
+
+    def test_failed_flush_is_retried(self) -> None:
+        recorder = self.make_recorder(flush_interval=0.01)
+        attempts = []
+
+        async def flaky_insert(rows):
+            attempts.append(len(rows))
+            if len(attempts) == 1:
+                raise RuntimeError("database is down")
+
+        recorder._insert = flaky_insert
+        user_id = uuid.uuid4()
+
+        async def run_test():
+            await recorder.start()
+            await recorder.record(self.row(user_id))
+            await asyncio.sleep(0.05)
+            await recorder.stop()
+
+        with self.assertLogs("app.modules.agent.usage", level="ERROR"):
+            asyncio.run(run_test())
+
+        self.assertEqual(attempts, [1, 1])
+        self.assertEqual(recorder.failures, 1)
+
+    def test_stop_does_not_hang_while_flushes_fail(self) -> None:
+        recorder = self.make_recorder(batch_size=3, max_pending=5, flush_interval=0.01)
+
+        async def failing_insert(rows):
+            raise RuntimeError("database is down")
+
+        recorder._insert = failing_insert
+        user_id = uuid.uuid4()
+
+        async def run_test():
+            await recorder.start()
+            for _ in range(6):
+                await recorder.offer(self.row(user_id))
+            await asyncio.sleep(0.05)
+            # The batch is stuck retrying and the queue is full
+            await recorder.offer(self.row(user_id))
+            await recorder.offer(self.row(user_id))
+            await asyncio.wait_for(recorder.stop(), 1)
+
+        with self.assertLogs("app.modules.agent.usage", level="ERROR") as logs:
+            asyncio.run(run_test())
+
+        self.assertFalse(recorder.running)
+        self.assertIn("failed final flush", logs.output[-1])
+
+
+class UsageCounterTests(unittest.TestCase):
+    def test_reservation_is_a_single_conditional_upsert(self) -> None:
+        session = SimpleNamespace(
+            execute=AsyncMock(return_value=SimpleNamespace(scalar_one_or_none=lambda: 4)),
+            commit=AsyncMock(),
+        )
+
+        reserved, limit, used = asyncio.run(reserve_usage_units(session, make_user("free"), 1))
+
+        self.assertEqual((reserved, used), (True, 4))
+        session.execute.assert_awaited_once()
+        sql = str(session.execute.call_args.args[0].compile(dialect=postgresql.dialect()))
+        self.assertIn("ON CONFLICT (user_id, period) DO UPDATE", sql)
+        self.assertIn("WHERE usage_counters.units + excluded.units <=", sql)
+        self.assertIn("RETURNING usage_counters.units", sql)
+
+    def test_reservation_over_limit_is_rejected(self) -> None:
+        results = iter([None, 10])
+        session = SimpleNamespace(
+            execute=AsyncMock(
+                side_effect=lambda *args: SimpleNamespace(
+                    scalar_one_or_none=lambda value=next(results): value
+                )
+            ),
+            commit=AsyncMock(),
+        )
+
+        reserved, limit, used = asyncio.run(reserve_usage_units(session, make_user("free"), 1))
+
+        self.assertFalse(reserved)
+        self.assertEqual(used, 10)
+
+    def test_period_is_first_day_of_month(self) -> None:
+        self.assertEqual(current_period().day, 1)
+
+
+class CircuitBreakerTests(unittest.TestCase):
+    def test_opens_when_failure_rate_reaches_threshold(self) -> None:
+        breaker = make_breaker()
+        for success in (True, False, True, False):
+            self.assertIsNone(breaker.before_call())
+            breaker.record(success)
+
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertGreater(breaker.before_call(), 0)
+        self.assertEqual(breaker.stats()["rejected"], 1)
+
+    def test_half_open_probe_closes_breaker(self) -> None:
+        breaker = make_breaker(open_seconds=0)
+        breaker._open()
+
+        self.assertIsNone(breaker.before_call())
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        # Only one probe at a time
+        self.assertIsNotNone(breaker.before_call())
+        breaker.record(True)
+
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_half_open_probe_failure_reopens_breaker(self) -> None:
+        breaker = make_breaker(open_seconds=0)
+        breaker._open()
+        breaker.before_call()
+        breaker.record(False)
+
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(breaker.times_opened, 2)
+
+
+class AdaptiveConcurrencyLimiterTests(unittest.TestCase):
+    def test_limit_grows_on_success_and_halves_on_timeout(self) -> None:
+        async def run_test():
+            limiter = make_limiter()
+            for _ in range(4):
+                await limiter.acquire()
+                limiter.release(latency=0.5, status_code=200)
+            grown = limiter.limit
+            await limiter.acquire()
+            limiter.release(latency=0.5, status_code=504)
+            return grown, limiter.limit
+
+        grown, reduced = asyncio.run(run_test())
+
+        self.assertGreater(grown, 4)
+        self.assertAlmostEqual(reduced, grown / 2)
+
+    def test_rejects_after_queue_timeout(self) -> None:
+        async def run_test():
+            limiter = make_limiter(initial=1)
+            self.assertTrue(await limiter.acquire())
+            rejected = not await limiter.acquire()
+            return rejected, limiter.stats()
+
+        rejected, stats = asyncio.run(run_test())
+
+        self.assertTrue(rejected)
+        self.assertEqual(stats["rejected"], 1)
+        self.assertEqual(stats["waiting"], 0)
+
+    def test_release_hands_slot_to_waiter(self) -> None:
+        async def run_test():
+            limiter = make_limiter(initial=1, queue_timeout=1)
+            await limiter.acquire()
+            waiter = asyncio.create_task(limiter.acquire())
+            await asyncio.sleep(0)
+            limiter.release(latency=0.1, status_code=200)
+            return await waiter, limiter.in_flight
+
+        acquired, in_flight = asyncio.run(run_test())
+
+        self.assertTrue(acquired)
+        self.assertEqual(in_flight, 1)
+
+
+class AgentResilienceTests(AgentServiceTestCase):
+    def test_open_breaker_fails_fast(self) -> None:
+        self.breaker._open()
+        handler = Mock(return_value=httpx.Response(200, json={}))
+
+        async def run_test():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                service = AgentService(make_session(), client=client)
+                await service.call_agent(
+                    user=make_user(),
+                    action="analyze-performance",
+                    website="https://example.com",
+                )
+
+        with self.assertRaises(AgentUnavailableError) as ctx:
+            asyncio.run(run_test())
+
+        self.assertEqual(ctx.exception.status_code, 503)
+        self.assertGreater(ctx.exception.retry_after, 0)
+        handler.assert_not_called()
+        self.reserve.assert_not_awaited()
+
+    def test_upstream_outcomes_feed_breaker_and_limiter(self) -> None:
+        def handler(request: httpx.Request) -> httpx.Response:
+            raise httpx.ConnectError("refused", request=request)
+
+        async def run_test():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                for _ in range(4):
+                    with self.assertRaises(AgentServiceError):
+                        await AgentService(make_session(), client=client).call_agent(
+                            user=make_user(),
+                            action="analyze-performance",
+                            website="https://example.com",
+                            use_cache=False,
+                        )
+
+        asyncio.run(run_test())
+
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(self.limiter.in_flight, 0)
+        self.assertLess(self.limiter.limit, 4)
+
+    def test_endpoint_returns_503_with_retry_after(self) -> None:
+        from app.modules.users.views import get_current_user
+
+        async def override_get_session():
+            yield make_session()
+
+        user = make_user()
+        app.dependency_overrides[get_session] = override_get_session
+        app.dependency_overrides[get_current_user] = lambda: user
+        self.addCleanup(app.dependency_overrides.pop, get_session, None)
+        self.addCleanup(app.dependency_overrides.pop, get_current_user, None)
+        self.breaker._open()
+
+        response = TestClient(app).post(
+            "/api/v0/agent/analyze-performance",
+            json={"website": "https://example.com"},
+        )
+
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("Retry-After", response.headers)
+        self.assertGreaterEqual(int(response.headers["Retry-After"]), 1)
+
+
+class TTLCacheTests(unittest.TestCase):
+    def test_evicts_least_recently_used(self) -> None:
+        cache = TTLCache(max_entries=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.evictions, 1)
+
+    def test_entries_expire(self) -> None:
+        cache = TTLCache(max_entries=2, ttl=60)
+        cache.set("a", 1, ttl=0)
+
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["misses"], 1)
+
+
+class HttpClientTests(unittest.TestCase):
+    def test_action_timeout_override(self) -> None:
+        with patch.object(
+            http_module.settings,
+            "agent_action_timeouts",
+            {"write-playwright-tests": 120.0},
+        ):
+            self.assertEqual(get_action_timeout("write-playwright-tests").read, 120.0)
+            self.assertEqual(
+                get_action_timeout("analyze-performance").read,
+                http_module.settings.agent_timeout,
+            )
+
+    def test_pool_stats_without_client(self) -> None:
+        asyncio.run(http_module.close_http_client())
+        stats = get_pool_stats()
+        self.assertEqual(stats["connections"], 0)
+        self.assertEqual(stats["max_connections"], http_module.settings.agent_max_connections)
+
+    def test_pool_stats_survive_changed_httpx_internals(self) -> None:
+        client = http_module.get_http_client()
+        self.addCleanup(lambda: asyncio.run(http_module.close_http_client()))
+
+        with patch.object(client, "_transport", SimpleNamespace(_pool=SimpleNamespace(connections=None))):
+            stats = get_pool_stats()
+
+        self.assertTrue(stats["unavailable"])
+        self.assertEqual(stats["connections"], 0)
+
+
+class StatsEndpointTests(unittest.TestCase):
+    def setUp(self) -> None:
+        from app.modules.users.views import get_current_user
+
+        self.client = TestClient(app)
+        self.override = get_current_user
+        self.addCleanup(app.dependency_overrides.pop, get_current_user, None)
+
+    def test_requires_an_admin(self) -> None:
+        self.assertEqual(self.client.get("/api/v0/agent/stats").status_code, 403)
+
+        user = SimpleNamespace(**vars(make_user()), is_admin=False)
+        app.dependency_overrides[self.override] = lambda: user
+        self.assertEqual(self.client.get("/api/v0/agent/stats").status_code, 403)
+
+        user.is_admin = True
+        response = self.client.get("/api/v0/agent/stats")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("pool", response.json())
@@ -0,0 +1,123 @@
+import asyncio
+import gzip
+import tempfile
+import unittest
+import uuid
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from app.core.blobs import LocalBlobStore, blob_key
+from app.db import get_session
+from app.main import app
+from app.models import Build
+from app.modules.builds.controllers import set_build_output
+from app.modules.builds.views import parse_range
+from app.modules.users.views import get_current_user
+
+OUTPUT = ("test('checkout works', async ({ page }) => {});\n" * 2000).encode("utf-8")
+
+
+class LocalBlobStoreTests(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.store = LocalBlobStore(tmp.name)
+
+    def test_put_is_content_addressed_and_compressed(self) -> None:
+        key = asyncio.run(self.store.put(OUTPUT))
+        again = asyncio.run(self.store.put(OUTPUT))
+
+        self.assertEqual(key, blob_key(OUTPUT))
+        self.assertEqual(again, key)
+        path = self.store.path(key)
+        self.assertEqual(len(list(path.parent.iterdir())), 1)
+        self.assertLess(path.stat().st_size, len(OUTPUT) // 10)
+        self.assertEqual(asyncio.run(self.store.read(key)), OUTPUT)
+
+    def test_range_reads_decompressed_bytes(self) -> None:
+        key = asyncio.run(self.store.put(OUTPUT))
+
+        async def read(start, end):
+            return b"".join([c async for c in self.store.iter_range(key, start, end, chunk_size=1000)])
+
+        self.assertEqual(asyncio.run(read(0, 9)), OUTPUT[:10])
+        self.assertEqual(asyncio.run(read(70_000, 80_000)), OUTPUT[70_000:80_001])
+
+    def test_compressed_stream_is_the_stored_gzip(self) -> None:
+        key = asyncio.run(self.store.put(OUTPUT))
+
+        async def read():
+            return b"".join([c async for c in self.store.iter_compressed(key)])
+
+        self.assertEqual(gzip.decompress(asyncio.run(read())), OUTPUT)
+
+
+class BuildOutputTests(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.store = LocalBlobStore(tmp.name)
+        for target in ("app.modules.builds.controllers", "app.modules.builds.views"):
+            patcher = patch(f"{target}.get_blob_store", return_value=self.store)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_small_output_stays_inline(self) -> None:
+        build = Build()
+        asyncio.run(set_build_output(build, "ok"))
+
+        self.assertEqual(build.output, "ok")
+        self.assertIsNone(build.output_blob_key)
+        self.assertEqual(build.output_size, 2)
+
+    def test_large_output_goes_to_blob_store(self) -> None:
+        build = Build()
+        asyncio.run(set_build_output(build, OUTPUT.decode("utf-8")))
+
+        self.assertIsNone(build.output)
+        self.assertEqual(build.output_blob_key, blob_key(OUTPUT))
+        self.assertEqual(build.output_size, len(OUTPUT))
+
+    def test_parse_range(self) -> None:
+        self.assertEqual(parse_range("bytes=0-99", 1000), (0, 99))
+        self.assertEqual(parse_range("bytes=900-", 1000), (900, 999))
+        self.assertEqual(parse_range("bytes=-100", 1000), (900, 999))
+        self.assertEqual(parse_range("bytes=990-2000", 1000), (990, 999))
+        self.assertIsNone(parse_range(None, 1000))
+        self.assertIsNone(parse_range("bytes=0-1,5-6", 1000))
+        with self.assertRaises(HTTPException) as ctx:
+            parse_range("bytes=1000-", 1000)
+        self.assertEqual(ctx.exception.status_code, 416)
+
+    def test_output_endpoint_serves_ranges_and_gzip(self) -> None:
+        user = SimpleNamespace(id=uuid.uuid4(), plan="free", is_active=True)
+        build = Build(id=uuid.uuid4(), user_id=user.id)
+        asyncio.run(set_build_output(build, OUTPUT.decode("utf-8")))
+        session = SimpleNamespace(in_transaction=lambda: False)
+
+        app.dependency_overrides[get_current_user] = lambda: user
+        app.dependency_overrides[get_session] = lambda: session
+        self.addCleanup(app.dependency_overrides.pop, get_current_user, None)
+        self.addCleanup(app.dependency_overrides.pop, get_session, None)
+        client = TestClient(app)
+        url = f"/api/v0/builds/{build.id}/output"
+
+        with patch("app.modules.builds.views.get_build_by_id", AsyncMock(return_value=build)):
+            partial = client.get(url, headers={"Range": "bytes=100-199"})
+            full = client.get(url, headers={"Accept-Encoding": "gzip"})
+            identity = client.get(url, headers={"Accept-Encoding": "identity"})
+            refused = client.get(url, headers={"Accept-Encoding": "gzip;q=0"})
+
+        self.assertEqual(partial.status_code, 206)
+        self.assertEqual(partial.content, OUTPUT[100:200])
+        self.assertEqual(partial.headers["content-range"], f"bytes 100-199/{len(OUTPUT)}")
+        self.assertEqual(full.status_code, 200)
+        self.assertEqual(full.headers["content-encoding"], "gzip")
+        self.assertEqual(full.content, OUTPUT)  # decoded by the client
+        self.assertEqual(identity.content, OUTPUT)
+        self.assertEqual(identity.headers["content-length"], str(len(OUTPUT)))
+        self.assertNotIn("content-encoding", refused.headers)
+        self.assertEqual(refused.content, OUTPUT)
@@ -0,0 +1,157 @@
+import asyncio
+import json
+import unittest
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+from fastapi.testclient import TestClient
+
+from app.db import get_session
+from app.main import app
+from app.models import Build, BuildStatus
+from app.modules.builds import events
+from app.modules.builds.events import BuildEventBroker, build_event, watch_build
+from app.modules.users.views import get_current_user
+
+
+def make_build(status: str) -> Build:
+    return Build(
+        id=uuid.uuid4(),
+        user_id=uuid.uuid4(),
+        status=status,
+        started_at=datetime(2026, 1, 1, tzinfo=timezone.utc),
+    )
+
+
+class ListenerPatchMixin:
+    def patch_listener(self) -> None:
+        self.listener = SimpleNamespace(subscribe=AsyncMock(), unsubscribe=AsyncMock())
+        patcher = patch("app.modules.builds.events.pg_listener", self.listener)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class BuildEventBrokerTests(ListenerPatchMixin, unittest.TestCase):
+    def setUp(self) -> None:
+        self.patch_listener()
+
+    def test_routes_events_to_the_build_and_listens_once(self) -> None:
+        broker = BuildEventBroker()
+        first, second = uuid.uuid4(), uuid.uuid4()
+
+        async def scenario():
+            async with broker.subscribe(first) as a, broker.subscribe(first) as b:
+                async with broker.subscribe(second) as c:
+                    broker._dispatch({"id": str(first), "status": "running"})
+                    self.assertEqual(broker.stats()["subscribers"], 3)
+                    return a.qsize(), b.qsize(), c.qsize()
+
+        self.assertEqual(asyncio.run(scenario()), (1, 1, 0))
+        self.listener.subscribe.assert_awaited_once()
+        self.listener.unsubscribe.assert_awaited_once()
+        self.assertEqual(broker.stats()["builds"], 0)
+
+    def test_full_queue_keeps_the_latest_events(self) -> None:
+        broker = BuildEventBroker()
+        build_id = uuid.uuid4()
+
+        async def scenario():
+            async with broker.subscribe(build_id) as queue:
+                for i in range(events.SUBSCRIBER_QUEUE_SIZE + 3):
+                    broker._dispatch({"id": str(build_id), "n": i})
+                return queue.get_nowait()
+
+        self.assertEqual(asyncio.run(scenario())["n"], 3)
+        self.assertEqual(broker.dropped, 3)
+
+    def test_resync_reaches_a_full_queue(self) -> None:
+        broker = BuildEventBroker()
+        build_id = uuid.uuid4()
+
+        async def scenario():
+            async with broker.subscribe(build_id) as queue:
+                for i in range(events.SUBSCRIBER_QUEUE_SIZE):
+                    broker._dispatch({"id": str(build_id), "n": i})
+                broker.resync()
+                return [queue.get_nowait() for _ in range(queue.qsize())]
+
+        queued = asyncio.run(scenario())
+        self.assertEqual(queued[0]["n"], 1)
+        self.assertEqual(queued[-1], events.RESYNC)
+        self.assertEqual(broker.dropped, 1)
+
+
+class WatchBuildTests(ListenerPatchMixin, unittest.TestCase):
+    def setUp(self) -> None:
+        self.patch_listener()
+        broker = BuildEventBroker()
+        patcher = patch("app.modules.builds.events.build_events", broker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.broker = broker
+
+    def test_snapshot_then_updates_until_terminal(self) -> None:
+        build = make_build(BuildStatus.RUNNING.value)
+        snapshots = [build_event(build), {**build_event(build), "status": "running", "resynced": True}]
+        load = AsyncMock(side_effect=snapshots)
+
+        async def scenario():
+            seen = []
+            with patch("app.modules.builds.events.load_build_event", load), patch(
+                "app.modules.builds.events.settings"
+            ) as settings:
+                settings.build_events_keepalive = 0.01
+                async for event in watch_build(build.id):
+                    seen.append(event)
+                    if len(seen) == 1:
+                        self.broker.resync()
+                    elif event is not None and event.get("resynced"):
+                        self.broker._dispatch({"id": str(build.id), "status": "completed"})
+            return seen
+
+        seen = asyncio.run(scenario())
+        self.assertEqual(seen[0]["status"], "running")
+        self.assertTrue(seen[1]["resynced"])
+        self.assertEqual(seen[-1]["status"], "completed")
+        self.assertEqual(load.await_count, 2)
+
+
+class BuildEventsEndpointTests(ListenerPatchMixin, unittest.TestCase):
+    def test_sse_stream_ends_with_a_finished_build(self) -> None:
+        self.patch_listener()
+        build = make_build(BuildStatus.COMPLETED.value)
+        user = SimpleNamespace(id=build.user_id, plan="free", is_active=True)
+        session = SimpleNamespace(in_transaction=lambda: False)
+
+        app.dependency_overrides[get_current_user] = lambda: user
+        app.dependency_overrides[get_session] = lambda: session
+        self.addCleanup(app.dependency_overrides.pop, get_current_user, None)
+        self.addCleanup(app.dependency_overrides.pop, get_session, None)
+        client = TestClient(app)
+
+        with patch("app.modules.builds.views.get_build_by_id", AsyncMock(return_value=build)), patch(
+            "app.modules.builds.events.load_build_event", AsyncMock(return_value=build_event(build))
+        ):
+            response = client.get(f"/api/v0/builds/{build.id}/events")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/event-stream"))
+        lines = response.text.strip().split("\n")
+        self.assertEqual(lines[0], "event: status")
+        self.assertEqual(json.loads(lines[1].removeprefix("data: "))["status"], "completed")
+
+    def test_sse_rejects_other_users_builds(self) -> None:
+        build = make_build(BuildStatus.RUNNING.value)
+        user = SimpleNamespace(id=uuid.uuid4(), plan="free", is_active=True)
+
+        app.dependency_overrides[get_current_user] = lambda: user
+        app.dependency_overrides[get_session] = lambda: SimpleNamespace()
+        self.addCleanup(app.dependency_overrides.pop, get_current_user, None)
+        self.addCleanup(app.dependency_overrides.pop, get_session, None)
+
+        with patch("app.modules.builds.views.get_build_by_id", AsyncMock(return_value=build)):
+            response = TestClient(app).get(f"/api/v0/builds/{build.id}/events")
+
+        self.assertEqual(response.status_code, 403)
@@ -0,0 +1,156 @@
+import asyncio
+import unittest
+import uuid
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock, patch
+
+from app.models import Build, BuildJob, BuildStatus, JobStatus
+from app.modules.agent.service import AgentCallResult, AgentServiceError
+from app.modules.builds.controllers import start_build
+from app.modules.builds.jobs import compute_retry_delay
+from app.worker import BuildWorker
+
+
+class FakeSessionContext:
+    def __init__(self, session):
+        self.session = session
+
+    async def __aenter__(self):
+        return self.session
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+
+def make_job(attempts: int = 1, max_attempts: int = 3) -> BuildJob:
+    return BuildJob(
+        id=uuid.uuid4(),
+        build_id=uuid.uuid4(),
+        status=JobStatus.RUNNING.value,
+        attempts=attempts,
+        max_attempts=max_attempts,
+    )
+
+
+class StartBuildTests(unittest.TestCase):
+    def test_start_build_enqueues_job_in_same_commit(self) -> None:
+        build = Build(id=uuid.uuid4(), user_id=uuid.uuid4(), status=BuildStatus.RUNNING.value)
+        session = SimpleNamespace(
+            add=Mock(),
+            execute=AsyncMock(return_value=SimpleNamespace(scalar_one_or_none=lambda: build)),
+            commit=AsyncMock(),
+        )
+
+        asyncio.run(start_build(session, build.id, build.user_id))
+
+        transition, notify, bump = [str(call.args[0]) for call in session.execute.await_args_list]
+        self.assertTrue(transition.startswith("UPDATE builds"))
+        self.assertIn("builds.status = :status_1", transition)
+        self.assertIn("RETURNING", transition)
+        self.assertIn("pg_notify", notify)
+        self.assertTrue(bump.startswith("UPDATE users SET builds_version"))
+        job = session.add.call_args.args[0]
+        self.assertIsInstance(job, BuildJob)
+        self.assertEqual(job.build_id, build.id)
+        self.assertEqual(job.status, JobStatus.QUEUED.value)
+        session.commit.assert_awaited_once()
+
+
+class RetryDelayTests(unittest.TestCase):
+    def test_backoff_grows_and_is_capped(self) -> None:
+        with patch("app.modules.builds.jobs.settings") as settings:
+            settings.job_retry_backoff = 10.0
+            settings.job_retry_backoff_max = 60.0
+            first = compute_retry_delay(1)
+            third = compute_retry_delay(3)
+            capped = compute_retry_delay(10)
+
+        self.assertTrue(8.0 <= first <= 12.0)
+        self.assertTrue(32.0 <= third <= 48.0)
+        self.assertTrue(capped <= 72.0)
+
+
+class BuildWorkerTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.session = SimpleNamespace()
+        self.build = SimpleNamespace(
+            id=uuid.uuid4(),
+            user_id=uuid.uuid4(),
+            action="analyze-performance",
+            website="https://example.com",
+            metadata_json=None,
+        )
+        self.user = SimpleNamespace(id=self.build.user_id, is_active=True, plan="free")
+
+        patches = {
+            "SessionLocal": Mock(return_value=FakeSessionContext(self.session)),
+            "get_build_by_id": AsyncMock(return_value=self.build),
+            "get_user_by_id": AsyncMock(return_value=self.user),
+            "complete_build": AsyncMock(),
+            "mark_build_job_succeeded": AsyncMock(return_value=True),
+            "mark_build_job_failed": AsyncMock(),
+        }
+        self.mocks = {}
+        for name, mock in patches.items():
+            patcher = patch(f"app.worker.{name}", new=mock)
+            self.mocks[name] = patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def run_job(self, job: BuildJob, call_agent: AsyncMock) -> None:
+        with patch("app.worker.AgentService") as service_cls:
+            service_cls.return_value.call_agent = call_agent
+            asyncio.run(BuildWorker(concurrency=1, worker_id="test")._process(job))
+
+    def test_success_completes_build(self) -> None:
+        self.run_job(make_job(), AsyncMock(return_value=AgentCallResult(result={"ok": True})))
+
+        self.mocks["mark_build_job_succeeded"].assert_awaited_once()
+        complete = self.mocks["complete_build"]
+        complete.assert_awaited_once()
+        self.assertEqual(complete.call_args.kwargs["output"], '{"ok": true}')
+        self.assertTrue(complete.call_args.kwargs["success"])
+
+    def test_failed_completion_leaves_the_job_to_retry(self) -> None:
+        self.mocks["complete_build"].side_effect = OSError("blob store unavailable")
+        self.mocks["mark_build_job_failed"].return_value = True
+        call_agent = AsyncMock(return_value=AgentCallResult(result={"ok": True}))
+
+        with patch("app.worker.AgentService") as service_cls:
+            service_cls.return_value.call_agent = call_agent
+            asyncio.run(BuildWorker(concurrency=1, worker_id="test")._run_job(make_job()))
+
+        self.mocks["mark_build_job_succeeded"].assert_not_awaited()
+        failed = self.mocks["mark_build_job_failed"]
+        failed.assert_awaited_once()
+        self.assertTrue(failed.call_args.kwargs["retry"])
+        self.assertIn("blob store unavailable", failed.call_args.args[3])
+
+    def test_upstream_error_is_retried(self) -> None:
+        self.mocks["mark_build_job_failed"].return_value = True
+        error = AgentServiceError("Agent service unavailable", status_code=503)
+
+        self.run_job(make_job(), AsyncMock(side_effect=error))
+
+        self.assertTrue(self.mocks["mark_build_job_failed"].call_args.kwargs["retry"])
+        self.mocks["complete_build"].assert_not_awaited()
+
+    def test_client_error_fails_build(self) -> None:
+        self.mocks["mark_build_job_failed"].return_value = False
+        error = AgentServiceError("Bad request", status_code=400)
+
+        self.run_job(make_job(), AsyncMock(side_effect=error))
+
+        self.assertFalse(self.mocks["mark_build_job_failed"].call_args.kwargs["retry"])
+        complete = self.mocks["complete_build"]
+        complete.assert_awaited_once()
+        self.assertFalse(complete.call_args.kwargs["success"])
+        self.assertEqual(complete.call_args.kwargs["error_message"], "Bad request")
+
+    def test_reclaimed_job_past_max_attempts_fails(self) -> None:
+        self.mocks["mark_build_job_failed"].return_value = False
+        call_agent = AsyncMock()
+
+        self.run_job(make_job(attempts=4, max_attempts=3), call_agent)
+
+        call_agent.assert_not_awaited()
+        self.assertFalse(self.mocks["complete_build"].call_args.kwargs["success"])
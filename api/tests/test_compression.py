@@ -0,0 +1,131 @@
+import asyncio
+import gzip
+import unittest
+import zlib
+from unittest.mock import patch
+
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.core.compression import COMPRESSORS, CompressionMiddleware, negotiate_encoding
+
+TEXT = ("await expect(page.getByTestId('cart-total')).toContainText('$19.99');\n" * 2000).encode()
+LEVELS = {"text/plain": {"gzip": 6, "zstd": 3}, "application/json": {"gzip": 5, "zstd": 3}}
+
+
+class NegotiationTests(unittest.TestCase):
+    def test_client_weights_then_server_preference(self) -> None:
+        encodings = ["zstd", "gzip"]
+
+        self.assertEqual(negotiate_encoding("gzip, deflate", encodings), "gzip")
+        self.assertEqual(negotiate_encoding("gzip;q=0.5, zstd;q=0.1", ["gzip"]), "gzip")
+        self.assertEqual(negotiate_encoding("gzip;q=0, br", encodings), None)
+        self.assertEqual(negotiate_encoding("", encodings), None)
+        if "zstd" in COMPRESSORS:
+            self.assertEqual(negotiate_encoding("gzip, zstd", encodings), "zstd")
+            self.assertEqual(negotiate_encoding("gzip, zstd;q=0.5", encodings), "gzip")
+            self.assertEqual(negotiate_encoding("*", encodings), "zstd")
+
+
+class CompressionMiddlewareTests(unittest.TestCase):
+    def setUp(self) -> None:
+        app = FastAPI()
+        app.add_middleware(
+            CompressionMiddleware,
+            encodings=["gzip"],
+            levels=LEVELS,
+            minimum_size=1024,
+            thread_threshold=64 * 1024,
+        )
+
+        @app.get("/text")
+        async def text():
+            return PlainTextResponse(TEXT, headers={"ETag": '"abc"'})
+
+        @app.get("/small")
+        async def small():
+            return {"ok": True}
+
+        @app.get("/events")
+        async def events():
+            return StreamingResponse(iter([b"data: x\n\n" * 500]), media_type="text/event-stream")
+
+        @app.get("/encoded")
+        async def encoded():
+            return Response(gzip.compress(TEXT), media_type="text/plain", headers={"Content-Encoding": "gzip"})
+
+        @app.get("/partial")
+        async def partial():
+            return Response(
+                TEXT[:4096],
+                status_code=206,
+                media_type="text/plain",
+                headers={"Content-Range": f"bytes 0-4095/{len(TEXT)}"},
+            )
+
+        self.client = TestClient(app)
+
+    def raw(self, url: str, accept: str = "gzip"):
+        with self.client.stream("GET", url, headers={"Accept-Encoding": accept}) as response:
+            return response, b"".join(response.iter_raw())
+
+    def test_compresses_large_bodies_off_the_event_loop(self) -> None:
+        with patch("app.core.compression.asyncio.to_thread", wraps=asyncio.to_thread) as to_thread:
+            response, body = self.raw("/text")
+
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertEqual(response.headers["vary"], "Accept-Encoding")
+        self.assertEqual(response.headers["etag"], 'W/"abc"')
+        self.assertEqual(int(response.headers["content-length"]), len(body))
+        self.assertEqual(gzip.decompress(body), TEXT)
+        to_thread.assert_called_once()
+
+    def test_small_and_unaccepted_responses_are_sent_as_is(self) -> None:
+        response, body = self.raw("/small")
+        self.assertNotIn("content-encoding", response.headers)
+        self.assertEqual(body, b'{"ok":true}')
+
+        response, body = self.raw("/text", accept="br")
+        self.assertNotIn("content-encoding", response.headers)
+        self.assertEqual(body, TEXT)
+
+    def test_streams_are_compressed_chunk_by_chunk(self) -> None:
+        chunks = [TEXT[i : i + 16 * 1024] for i in range(0, len(TEXT), 16 * 1024)]
+
+        async def app(scope, receive, send):
+            headers = [(b"content-type", b"text/plain")]
+            await send({"type": "http.response.start", "status": 200, "headers": headers})
+            for i, chunk in enumerate(chunks):
+                await send({"type": "http.response.body", "body": chunk, "more_body": i < len(chunks) - 1})
+
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        middleware = CompressionMiddleware(
+            app, encodings=["gzip"], levels=LEVELS, minimum_size=1024, thread_threshold=64 * 1024
+        )
+        scope = {"type": "http", "headers": [(b"accept-encoding", b"gzip")]}
+        asyncio.run(middleware(scope, None, send))
+
+        start, *bodies = sent
+        self.assertIn((b"content-encoding", b"gzip"), start["headers"])
+        self.assertEqual(len(bodies), len(chunks))
+        # Every chunk is flushed, so each one decodes as soon as it arrives
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        for chunk, message in zip(chunks, bodies):
+            self.assertEqual(decompressor.decompress(message["body"]), chunk)
+        self.assertTrue(decompressor.eof)
+
+    def test_passes_through_encoded_partial_and_event_streams(self) -> None:
+        response, body = self.raw("/encoded")
+        self.assertEqual(gzip.decompress(body), TEXT)
+
+        response, body = self.raw("/partial")
+        self.assertNotIn("content-encoding", response.headers)
+        self.assertEqual(body, TEXT[:4096])
+
+        response, body = self.raw("/events")
+        self.assertNotIn("content-encoding", response.headers)
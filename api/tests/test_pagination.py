@@ -0,0 +1,181 @@
+import asyncio
+import unittest
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from app.core.pagination import (
+    InvalidCursorError,
+    count_rows,
+    decode_cursor,
+    encode_cursor,
+    fetch_page,
+    paginate,
+)
+from app.db import get_session
+from app.main import app
+from app.models import Build
+from app.modules.builds.controllers import get_builds_by_user
+from app.modules.users.views import get_current_user
+
+
+def make_rows(count: int) -> list[SimpleNamespace]:
+    now = datetime.now(timezone.utc)
+    return [
+        SimpleNamespace(id=uuid.uuid4(), created_at=now - timedelta(minutes=i))
+        for i in range(count)
+    ]
+
+
+def make_session(*results):
+    """Session whose execute() returns `results` in order."""
+    return SimpleNamespace(execute=AsyncMock(side_effect=list(results)))
+
+
+def scalars_result(rows):
+    return SimpleNamespace(scalars=lambda: SimpleNamespace(all=lambda: rows))
+
+
+class CursorTests(unittest.TestCase):
+    def test_cursor_round_trip(self) -> None:
+        created_at = datetime(2026, 10, 17, 12, 30, 1, 123456, tzinfo=timezone.utc)
+        id = uuid.uuid4()
+
+        self.assertEqual(decode_cursor(encode_cursor(created_at, id)), (created_at, id))
+
+    def test_invalid_cursor_is_rejected(self) -> None:
+        for cursor in ("not-a-cursor", "", encode_cursor(datetime.now(timezone.utc), uuid.uuid4())[:-4]):
+            with self.assertRaises(InvalidCursorError):
+                decode_cursor(cursor)
+
+    def test_paginate_seeks_past_cursor_instead_of_offset(self) -> None:
+        cursor = encode_cursor(datetime.now(timezone.utc), uuid.uuid4())
+        query = paginate(select(Build).where(Build.user_id == uuid.uuid4()), Build, 20, cursor)
+
+        sql = str(query.compile(dialect=postgresql.dialect()))
+
+        self.assertIn("(builds.created_at, builds.id) < (", sql)
+        self.assertIn("ORDER BY builds.created_at DESC, builds.id DESC", sql)
+        self.assertNotIn("OFFSET", sql)
+
+
+class FetchPageTests(unittest.TestCase):
+    def fetch(self, session, limit, cursor=None, exact_total=False):
+        query = select(Build).where(Build.user_id == uuid.uuid4())
+        return asyncio.run(fetch_page(session, query, Build, limit, cursor, exact_total))
+
+    def test_single_page_needs_no_count(self) -> None:
+        rows = make_rows(3)
+        session = make_session(scalars_result(rows))
+
+        page = self.fetch(session, limit=10)
+
+        self.assertEqual(page.items, rows)
+        self.assertIsNone(page.next_cursor)
+        self.assertEqual(page.total, 3)
+        self.assertFalse(page.total_is_estimate)
+        self.assertEqual(session.execute.await_count, 1)
+
+    def test_total_is_estimated_from_plan_by_default(self) -> None:
+        rows = make_rows(4)
+        plan = SimpleNamespace(scalar_one=lambda: [{"Plan": {"Plan Rows": 1234}}])
+        session = make_session(scalars_result(rows), plan)
+
+        page = self.fetch(session, limit=3)
+
+        self.assertEqual(page.items, rows[:3])
+        self.assertEqual(decode_cursor(page.next_cursor), (rows[2].created_at, rows[2].id))
+        self.assertEqual(page.total, 1234)
+        self.assertTrue(page.total_is_estimate)
+        explain = str(session.execute.call_args.args[0])
+        self.assertTrue(explain.startswith("EXPLAIN (FORMAT JSON) SELECT"))
+
+    def test_estimate_keeps_filters_as_bound_parameters(self) -> None:
+        plan = SimpleNamespace(scalar_one=lambda: [{"Plan": {"Plan Rows": 7}}])
+        session = make_session(plan)
+        query = select(Build).where(Build.website == "http://host:8080/'; --")
+
+        self.assertEqual(asyncio.run(count_rows(session, query)), 7)
+
+        compiled = session.execute.call_args.args[0].compile(dialect=postgresql.dialect())
+        self.assertTrue(str(compiled).startswith("EXPLAIN (FORMAT JSON) SELECT"))
+        self.assertNotIn("host:8080", str(compiled))
+        self.assertIn("http://host:8080/'; --", compiled.params.values())
+
+    def test_exact_total_is_opt_in(self) -> None:
+        rows = make_rows(4)
+        count = SimpleNamespace(scalar_one=lambda: 40)
+        session = make_session(scalars_result(rows), count)
+
+        page = self.fetch(session, limit=3, exact_total=True)
+
+        self.assertEqual(page.total, 40)
+        self.assertFalse(page.total_is_estimate)
+        self.assertIn("count(*)", str(session.execute.call_args.args[0]))
+
+
+class BuildListingTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.user = SimpleNamespace(id=uuid.uuid4(), plan="free", is_active=True)
+        self.session = make_session()
+        app.dependency_overrides[get_current_user] = lambda: self.user
+        app.dependency_overrides[get_session] = lambda: self.session
+        self.addCleanup(app.dependency_overrides.pop, get_current_user, None)
+        self.addCleanup(app.dependency_overrides.pop, get_session, None)
+        version = patch("app.modules.builds.views.get_builds_version", AsyncMock(return_value=0))
+        version.start()
+        self.addCleanup(version.stop)
+        self.client = TestClient(app)
+
+    def test_invalid_cursor_returns_400(self) -> None:
+        response = self.client.get("/api/v0/builds/", params={"cursor": "garbage"})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["detail"], "Invalid cursor")
+
+    def test_summary_listing_does_not_load_large_columns(self) -> None:
+        session = make_session(scalars_result([]))
+
+        asyncio.run(get_builds_by_user(session, self.user.id))
+
+        sql = str(session.execute.call_args.args[0].compile(dialect=postgresql.dialect()))
+        self.assertIn("builds.status", sql)
+        self.assertNotIn("builds.output,", sql)
+        self.assertNotIn("builds.error_message", sql)
+        self.assertNotIn("builds.metadata", sql)
+
+    def test_fields_selects_columns_and_response_keys(self) -> None:
+        build = SimpleNamespace(
+            id=uuid.uuid4(),
+            created_at=datetime.now(timezone.utc),
+            status="completed",
+            output="x" * 10_000,
+        )
+        self.session.execute = AsyncMock(return_value=scalars_result([build]))
+
+        response = self.client.get("/api/v0/builds/", params={"fields": "status,output"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()["builds"],
+            [{"id": str(build.id), "status": "completed", "output": build.output}],
+        )
+        sql = str(self.session.execute.call_args.args[0].compile(dialect=postgresql.dialect()))
+        self.assertIn("builds.output", sql)
+        self.assertNotIn("builds.website", sql)
+
+    def test_out_of_range_limit_is_rejected(self) -> None:
+        for limit in (0, -1, 101):
+            response = self.client.get("/api/v0/builds/", params={"limit": limit})
+            self.assertEqual(response.status_code, 422, limit)
+
+    def test_unknown_field_returns_400(self) -> None:
+        response = self.client.get("/api/v0/builds/", params={"fields": "status,password"})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("password", response.json()["detail"])
@@ -0,0 +1,371 @@
+import asyncio
+import uuid
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.pool import StaticPool
+
+from app.db import Base, get_session
+from app.main import app
+from app.models import Build, BuildJob, BuildStatus, User, WishlistItem
+from app.modules.builds.controllers import BuildStatusConflictError, complete_build
+from app.modules.users.views import get_current_user
+from app.modules.wishlist.ingest import WishlistIngestor, wishlist_row
+from app.modules.wishlist.schemas import WishlistCreate
+
+
+@compiles(JSONB, "sqlite")
+def compile_jsonb_for_sqlite(element, compiler, **kw):
+    return "JSON"
+
+
+class SQLiteTestCase(unittest.TestCase):
+    """Runs the real ORM against in-memory SQLite, which supports RETURNING
+    like Postgres does, and records every statement sent."""
+
+    def setUp(self) -> None:
+        engine = create_engine(
+            "sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False}
+        )
+        event.listen(
+            engine,
+            "connect",
+            lambda dbapi_conn, record: dbapi_conn.create_function("pg_notify", 2, lambda c, p: None),
+        )
+        Base.metadata.create_all(engine)
+        self.addCleanup(engine.dispose)
+
+        self.session = AsyncSession(expire_on_commit=False)
+        self.session.sync_session.bind = engine
+        self.addCleanup(lambda: asyncio.run(self.session.close()))
+
+        self.user = User(id=uuid.uuid4(), email="dev@example.com", name="Dev", plan="free")
+        self.build = Build(
+            id=uuid.uuid4(),
+            user_id=self.user.id,
+            website="https://example.com",
+            action="analyze-performance",
+            status=BuildStatus.PENDING.value,
+        )
+        self.session.add_all([self.user, self.build])
+        asyncio.run(self.session.commit())
+
+        self.statements: list[str] = []
+        event.listen(
+            engine,
+            "before_cursor_execute",
+            lambda conn, cursor, statement, *args: self.statements.append(statement),
+        )
+
+        async def override_session():
+            yield self.session
+
+        app.dependency_overrides[get_session] = override_session
+        app.dependency_overrides[get_current_user] = lambda: self.user
+        self.addCleanup(app.dependency_overrides.pop, get_session, None)
+        self.addCleanup(app.dependency_overrides.pop, get_current_user, None)
+        self.client = TestClient(app)
+
+    def request(self, method: str, url: str, **kwargs) -> list[str]:
+        self.statements.clear()
+        self.response = self.client.request(method, url, **kwargs)
+        return [statement.split()[0] for statement in self.statements]
+
+
+class StatementCountTests(SQLiteTestCase):
+    def request(self, method: str, url: str, **kwargs) -> list[str]:
+        statements = super().request(method, url, **kwargs)
+        self.assertLess(self.response.status_code, 300, self.response.text)
+        return statements
+
+    def test_create_build_is_one_insert(self) -> None:
+        statements = self.request(
+            "POST",
+            "/api/v0/builds/",
+            json={"website": "https://example.com", "action": "generate-test-cases"},
+        )
+        # The build, then the owner's builds version
+        self.assertEqual(statements, ["INSERT", "UPDATE"])
+        self.assertIn("RETURNING", self.statements[0])
+
+    def test_update_build_reads_once_and_returns_timestamps(self) -> None:
+        statements = self.request("PATCH", f"/api/v0/builds/{self.build.id}", json={"output": "ok"})
+        # Load, pg_notify, UPDATE ... RETURNING updated_at, builds version
+        self.assertEqual(statements, ["SELECT", "SELECT", "UPDATE", "UPDATE"])
+        self.assertIn("RETURNING", self.statements[2])
+
+    def test_start_build_writes_build_and_job(self) -> None:
+        statements = self.request("POST", f"/api/v0/builds/{self.build.id}/start")
+        # Conditional UPDATE ... RETURNING, pg_notify, job INSERT, builds version
+        self.assertEqual(statements, ["UPDATE", "SELECT", "INSERT", "UPDATE"])
+
+    def test_update_user_is_one_update(self) -> None:
+        statements = self.request("PATCH", f"/api/v0/users/{self.user.id}", json={"name": "New"})
+        # pg_notify for the user cache, then the UPDATE
+        self.assertEqual(statements, ["SELECT", "UPDATE"])
+
+    def test_register_user_is_lookup_and_insert(self) -> None:
+        statements = self.request(
+            "POST",
+            "/api/v0/users/",
+            json={
+                "email": "new@example.com",
+                "name": "New",
+                "auth_provider": "google",
+                "google_id": "g-1",
+            },
+        )
+        self.assertEqual(statements, ["SELECT", "INSERT"])
+
+    def test_wishlist_signup_is_queued_without_touching_the_database(self) -> None:
+        with patch("app.modules.wishlist.views.wishlist_ingestor.offer", AsyncMock(return_value=True)):
+            statements = self.request(
+                "POST",
+                "/api/v0/wishlist/",
+                json={
+                    "email": "new@example.com",
+                    "name": "New",
+                    "website": "https://example.com",
+                    "action": "notify",
+                },
+            )
+        self.assertEqual(statements, [])
+
+
+class BuildTransitionTests(SQLiteTestCase):
+    def start(self, build_id) -> int:
+        self.request("POST", f"/api/v0/builds/{build_id}/start")
+        return self.response.status_code
+
+    def test_second_start_conflicts(self) -> None:
+        self.assertEqual(self.start(self.build.id), 200)
+        self.assertEqual(self.response.json()["status"], "running")
+        self.assertEqual(self.start(self.build.id), 409)
+        self.assertIn("running", self.response.json()["detail"])
+        self.assertEqual(len(asyncio.run(self.session.execute(select(BuildJob))).all()), 1)
+
+    def test_missing_and_foreign_builds(self) -> None:
+        self.assertEqual(self.start(uuid.uuid4()), 404)
+
+        self.build.user_id = uuid.uuid4()
+        asyncio.run(self.session.commit())
+        self.assertEqual(self.start(self.build.id), 403)
+
+    def test_patch_cannot_change_status(self) -> None:
+        self.request("PATCH", f"/api/v0/builds/{self.build.id}", json={"status": BuildStatus.COMPLETED.value})
+
+        self.assertEqual(self.response.status_code, 422)
+        asyncio.run(self.session.refresh(self.build))
+        self.assertEqual(self.build.status, BuildStatus.PENDING.value)
+
+    def test_complete_requires_a_running_build(self) -> None:
+        with self.assertRaises(BuildStatusConflictError):
+            asyncio.run(complete_build(self.session, self.build, output="ok"))
+        asyncio.run(self.session.rollback())
+
+        self.start(self.build.id)
+        build = asyncio.run(complete_build(self.session, self.build, output="ok"))
+
+        self.assertIs(build, self.build)
+        self.assertEqual(build.status, BuildStatus.COMPLETED.value)
+        self.assertEqual(build.output, "ok")
+        self.assertIsNotNone(build.completed_at)
+
+    def test_large_output_is_stored_only_after_the_transition(self) -> None:
+        store = SimpleNamespace(put=AsyncMock(return_value="blob-key"))
+        with patch("app.modules.builds.controllers.get_blob_store", return_value=store), patch(
+            "app.modules.builds.controllers.settings.build_output_inline_max_bytes", 1
+        ):
+            with self.assertRaises(BuildStatusConflictError):
+                asyncio.run(complete_build(self.session, self.build, output="large"))
+            asyncio.run(self.session.rollback())
+            store.put.assert_not_awaited()
+
+            self.start(self.build.id)
+            asyncio.run(complete_build(self.session, self.build, output="large"))
+
+        store.put.assert_awaited_once_with(b"large")
+        self.session.expire_all()
+        build = asyncio.run(self.session.get(Build, self.build.id))
+        self.assertEqual((build.output, build.output_blob_key, build.output_size), (None, "blob-key", 5))
+
+
+class BulkCreateTests(SQLiteTestCase):
+    PAYLOAD = [
+        {"website": "https://example.com/a", "action": "analyze-performance"},
+        {"website": "https://example.com/b", "action": "not-an-action"},
+        {"website": "https://example.com/c", "action": "generate-test-cases", "metadata": {"n": 3}},
+    ]
+
+    def builds(self) -> list[Build]:
+        query = select(Build).where(Build.id != self.build.id)
+        return list(asyncio.run(self.session.execute(query)).scalars())
+
+    def test_all_or_nothing_rejects_everything(self) -> None:
+        statements = self.request("POST", "/api/v0/builds/bulk", json={"builds": self.PAYLOAD})
+
+        self.assertEqual(self.response.status_code, 400)
+        self.assertEqual(self.response.json()["detail"]["errors"][0]["index"], 1)
+        self.assertEqual(statements, [])
+        self.assertEqual(self.builds(), [])
+
+    def test_best_effort_inserts_valid_builds_in_one_statement(self) -> None:
+        statements = self.request(
+            "POST", "/api/v0/builds/bulk", json={"builds": self.PAYLOAD, "mode": "best_effort"}
+        )
+
+        self.assertEqual(self.response.status_code, 201)
+        body = self.response.json()
+        self.assertEqual(statements, ["INSERT", "UPDATE"])
+        self.assertEqual(body["created"], 2)
+        self.assertIsNone(body["ids"][1])
+        self.assertEqual([error["index"] for error in body["errors"]], [1])
+
+        by_id = {str(build.id): build for build in self.builds()}
+        self.assertEqual(by_id[body["ids"][0]].website, "https://example.com/a")
+        self.assertEqual(by_id[body["ids"][2]].metadata_json, {"n": 3})
+        self.assertEqual(by_id[body["ids"][2]].status, BuildStatus.PENDING.value)
+
+
+class WishlistIngestionTests(SQLiteTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        patcher = patch("app.modules.wishlist.ingest.SessionLocal", lambda: self.session)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.ingestor = WishlistIngestor(batch_size=100, flush_interval=0.01, max_pending=100)
+
+    def signup(self, email: str, name: str, action: str = "notify") -> dict:
+        return wishlist_row(
+            WishlistCreate(email=email, name=name, website="https://example.com", action=action)
+        )
+
+    def items(self) -> list[WishlistItem]:
+        query = select(WishlistItem).order_by(WishlistItem.created_at)
+        return list(asyncio.run(self.session.execute(query)).scalars())
+
+    def test_batches_are_upserted_on_the_live_key(self) -> None:
+        async def scenario():
+            await self.ingestor.start()
+            await self.ingestor.offer(self.signup("Dev@Example.com", "First"))
+            await self.ingestor.offer(self.signup("dev@example.com", "Second"))
+            await self.ingestor.offer(self.signup("dev@example.com", "Other", action="track"))
+            await asyncio.sleep(0.05)
+            await self.ingestor.offer(self.signup("dev@example.com", "Third"))
+            await self.ingestor.stop()
+
+        self.statements.clear()
+        asyncio.run(scenario())
+
+        self.assertEqual([s.split()[0] for s in self.statements], ["INSERT", "INSERT"])
+        items = self.items()
+        self.assertEqual(sorted((item.action, item.name) for item in items), [("notify", "Third"), ("track", "Other")])
+        self.assertEqual(self.ingestor.stats()["flushed"], 4)
+
+    def test_soft_deleted_signups_do_not_block_new_ones(self) -> None:
+        asyncio.run(self.ingestor._insert([self.signup("dev@example.com", "Old")]))
+        [old] = self.items()
+        old.is_deleted = True
+        asyncio.run(self.session.commit())
+
+        asyncio.run(self.ingestor._insert([self.signup("dev@example.com", "New")]))
+
+        self.assertEqual([(item.name, item.is_deleted) for item in self.items()], [("Old", True), ("New", False)])
+
+    def test_full_buffer_refuses_signups(self) -> None:
+        ingestor = WishlistIngestor(batch_size=1, flush_interval=10, max_pending=1)
+        ingestor._insert = AsyncMock()
+
+        async def scenario():
+            await ingestor.start()
+            await ingestor.offer(self.signup("a@example.com", "A"))
+            await asyncio.sleep(0.01)  # taken off the queue and written
+            accepted = [await ingestor.offer(self.signup(f"{i}@example.com", "B")) for i in range(2)]
+            await ingestor.stop()
+            return accepted
+
+        self.assertEqual(asyncio.run(scenario()), [True, False])
+        self.assertEqual(ingestor.stats()["rejected"], 1)
+
+
+class ResponseEncodingTests(SQLiteTestCase):
+    def test_build_list_returns_only_selected_fields(self) -> None:
+        self.request("GET", "/api/v0/builds/")
+        item = self.response.json()["builds"][0]
+        self.assertEqual(item["id"], str(self.build.id))
+        self.assertEqual(item["status"], "pending")
+        self.assertNotIn("output", item)
+
+        self.request("GET", "/api/v0/builds/?fields=status,output")
+        self.assertEqual(
+            self.response.json()["builds"],
+            [{"id": str(self.build.id), "status": "pending", "output": None}],
+        )
+
+    def test_route_rate_limit_headers_survive_returned_responses(self) -> None:
+        self.request("GET", f"/api/v0/builds/{self.build.id}")
+
+        self.assertEqual(self.response.status_code, 200)
+        self.assertEqual(self.response.headers["content-type"], "application/json")
+        self.assertEqual(self.response.headers["RateLimit-Policy"], "120;w=60")
+        self.assertEqual(self.response.json()["website"], "https://example.com")
+
+
+class ConditionalGetTests(SQLiteTestCase):
+    def test_unchanged_build_is_304_after_a_version_lookup(self) -> None:
+        self.request("GET", f"/api/v0/builds/{self.build.id}")
+        etag = self.response.headers["ETag"]
+        self.assertTrue(etag.startswith('W/"'))
+        self.assertIn("Last-Modified", self.response.headers)
+
+        statements = self.request("GET", f"/api/v0/builds/{self.build.id}", headers={"If-None-Match": etag})
+        self.assertEqual(self.response.status_code, 304)
+        self.assertEqual(self.response.content, b"")
+        self.assertEqual(statements, ["SELECT"])
+        self.assertNotIn("builds.output", self.statements[0])
+
+        last_modified = self.response.headers["Last-Modified"]
+        self.request("GET", f"/api/v0/builds/{self.build.id}", headers={"If-Modified-Since": last_modified})
+        self.assertEqual(self.response.status_code, 304)
+
+    def test_changed_build_is_sent_again(self) -> None:
+        self.request("GET", f"/api/v0/builds/{self.build.id}")
+        etag = self.response.headers["ETag"]
+        self.build.updated_at = self.build.updated_at.replace(year=2030)
+        asyncio.run(self.session.commit())
+
+        self.request("GET", f"/api/v0/builds/{self.build.id}", headers={"If-None-Match": etag})
+        self.assertEqual(self.response.status_code, 200)
+        self.assertNotEqual(self.response.headers["ETag"], etag)
+
+    def test_listing_etag_follows_the_builds_version(self) -> None:
+        self.request("GET", "/api/v0/builds/")
+        etag = self.response.headers["ETag"]
+
+        statements = self.request("GET", "/api/v0/builds/", headers={"If-None-Match": etag})
+        self.assertEqual(self.response.status_code, 304)
+        self.assertEqual(statements, ["SELECT"])
+        self.assertIn("builds_version", self.statements[0])
+
+        self.request("GET", "/api/v0/builds/?fields=status", headers={"If-None-Match": etag})
+        self.assertEqual(self.response.status_code, 200)
+
+        self.request("PATCH", f"/api/v0/builds/{self.build.id}", json={"output": "ok"})
+        self.request("GET", "/api/v0/builds/", headers={"If-None-Match": etag})
+        self.assertEqual(self.response.status_code, 200)
+        self.assertEqual(self.response.json()["builds"][0]["output_size"], 2)
+
+    def test_current_user_is_304_without_queries(self) -> None:
+        self.request("GET", "/api/v0/users/me")
+        etag = self.response.headers["ETag"]
+
+        statements = self.request("GET", "/api/v0/users/me", headers={"If-None-Match": f'"other", {etag}'})
+        self.assertEqual(self.response.status_code, 304)
+        self.assertEqual(statements, [])
+        self.assertEqual(self.response.headers["ETag"], etag)
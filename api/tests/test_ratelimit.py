@@ -0,0 +1,200 @@
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock, patch
+
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.dialects import postgresql
+
+from app.core.ratelimit import (
+    InvalidRateError,
+    MemoryBackend,
+    PostgresBackend,
+    Rate,
+    RateLimitMiddleware,
+    RateLimiter,
+    client_ip,
+    limit_by_ip,
+)
+from app.core.security import create_access_token
+
+ROUTES = {"default": "3/minute", "login": "2/minute", "builds": "10/minute"}
+PLANS = {"free": 1, "business": 5}
+
+
+def make_limiter() -> RateLimiter:
+    return RateLimiter(MemoryBackend(max_keys=100), ROUTES, PLANS)
+
+
+class RateTests(unittest.TestCase):
+    def test_parse(self) -> None:
+        self.assertEqual(Rate.parse("10/minute"), Rate(10, 60))
+        self.assertEqual(Rate.parse(" 5 / second "), Rate(5, 1))
+        with self.assertRaises(InvalidRateError):
+            Rate.parse("10 per minute")
+
+    def test_plan_multiplier(self) -> None:
+        limiter = make_limiter()
+
+        self.assertEqual(limiter.rate("builds", plan="business"), Rate(50, 60))
+        self.assertEqual(limiter.rate("builds", plan="unknown"), Rate(10, 60))
+        self.assertEqual(limiter.rate("missing"), Rate(3, 60))
+
+
+class MemoryBackendTests(unittest.IsolatedAsyncioTestCase):
+    async def test_bucket_empties_and_refills(self) -> None:
+        backend = MemoryBackend(max_keys=10)
+        rate = Rate(2, 60)
+
+        results = [await backend.hit("k", rate) for _ in range(3)]
+        self.assertEqual([r.allowed for r in results], [True, True, False])
+        self.assertEqual(results[1].remaining, 0)
+        self.assertAlmostEqual(results[2].retry_after, 30, delta=0.5)
+
+        later = time.monotonic() + 30
+        with patch("app.core.ratelimit.time.monotonic", return_value=later):
+            self.assertTrue((await backend.hit("k", rate)).allowed)
+            self.assertFalse((await backend.hit("k", rate)).allowed)
+
+    async def test_evicts_least_recently_used_keys(self) -> None:
+        backend = MemoryBackend(max_keys=2)
+        rate = Rate(1, 60)
+
+        for key in ("a", "b", "c"):
+            await backend.hit(key, rate)
+
+        self.assertEqual(len(backend), 2)
+        self.assertTrue((await backend.hit("a", rate)).allowed)
+        self.assertFalse((await backend.hit("c", rate)).allowed)
+
+
+class RateLimitMiddlewareTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.limiter = make_limiter()
+        app = FastAPI()
+        app.add_middleware(RateLimitMiddleware, limiter=self.limiter)
+
+        @app.get("/ping")
+        async def ping():
+            return {"ok": True}
+
+        self.client = TestClient(app)
+
+    def test_limits_per_client_ip_with_headers(self) -> None:
+        responses = [self.client.get("/ping") for _ in range(4)]
+
+        self.assertEqual([r.status_code for r in responses], [200, 200, 200, 429])
+        self.assertEqual(responses[0].headers["RateLimit-Limit"], "3")
+        self.assertEqual(responses[0].headers["RateLimit-Remaining"], "2")
+        self.assertEqual(responses[0].headers["RateLimit-Policy"], "3;w=60")
+        self.assertEqual(responses[3].headers["Retry-After"], "20")
+        self.assertEqual(responses[3].json(), {"detail": "Rate limit exceeded"})
+
+    def test_authenticated_requests_have_their_own_bucket(self) -> None:
+        for _ in range(3):
+            self.client.get("/ping")
+        headers = {"Authorization": f"Bearer {create_access_token(data={'sub': 'user-1'})}"}
+
+        self.assertEqual(self.client.get("/ping", headers=headers).status_code, 200)
+        self.assertEqual(self.client.get("/ping").status_code, 429)
+        self.assertEqual(self.limiter.stats()["keys"], 2)
+
+
+class RouteLimitTests(unittest.TestCase):
+    def test_route_limit_raises_429_and_sets_headers(self) -> None:
+        limiter = make_limiter()
+        app = FastAPI()
+
+        @app.post("/login", dependencies=[Depends(limit_by_ip("login"))])
+        async def login():
+            return {"ok": True}
+
+        client = TestClient(app)
+        with patch("app.core.ratelimit.rate_limiter", limiter):
+            responses = [client.post("/login") for _ in range(3)]
+
+        self.assertEqual([r.status_code for r in responses], [200, 200, 429])
+        self.assertEqual(responses[1].headers["RateLimit-Remaining"], "0")
+        self.assertEqual(responses[2].headers["RateLimit-Limit"], "2")
+        self.assertIn("Retry-After", responses[2].headers)
+        self.assertEqual(limiter.stats()["limited"], 1)
+
+
+class FakeSessionContext:
+    def __init__(self, session):
+        self.session = session
+
+    async def __aenter__(self):
+        return self.session
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+
+class PostgresBackendTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.backend = PostgresBackend(idle_after=3600, prune_interval=300)
+
+    def compile(self, stmt) -> str:
+        return str(stmt.compile(dialect=postgresql.dialect()))
+
+    def test_take_is_one_conditional_upsert(self) -> None:
+        sql = self.compile(self.backend.take_statement("login:ip:1.2.3.4", Rate(10, 60)))
+
+        self.assertTrue(sql.startswith("INSERT INTO rate_limit_buckets"))
+        self.assertIn("ON CONFLICT (key) DO UPDATE SET tokens = (least(", sql)
+        self.assertIn("WHERE least(", sql)
+        self.assertTrue(sql.endswith("RETURNING rate_limit_buckets.tokens"))
+
+    def test_prune_deletes_idle_buckets(self) -> None:
+        sql = self.compile(self.backend.prune_statement())
+
+        self.assertTrue(sql.startswith("DELETE FROM rate_limit_buckets WHERE rate_limit_buckets.updated_at < now() -"))
+
+    async def test_hit_reads_back_an_empty_bucket_and_prunes_periodically(self) -> None:
+        session = SimpleNamespace(
+            execute=AsyncMock(
+                side_effect=[
+                    SimpleNamespace(scalar_one_or_none=lambda: 4.0),
+                    SimpleNamespace(rowcount=3),
+                    SimpleNamespace(scalar_one_or_none=lambda: None),
+                    SimpleNamespace(scalar_one=lambda: 0.5),
+                ]
+            ),
+            commit=AsyncMock(),
+        )
+        rate = Rate(10, 60)
+
+        with patch("app.core.ratelimit.SessionLocal", Mock(return_value=FakeSessionContext(session))):
+            allowed = await self.backend.hit("k", rate)
+            limited = await self.backend.hit("k", rate)
+
+        self.assertTrue(allowed.allowed)
+        self.assertEqual(allowed.remaining, 4)
+        self.assertFalse(limited.allowed)
+        self.assertEqual(limited.remaining, 0)
+        self.assertAlmostEqual(limited.retry_after, 3.0)
+        read_back = self.compile(session.execute.await_args_list[3].args[0])
+        self.assertTrue(read_back.startswith("SELECT least("))
+        self.assertIn("WHERE rate_limit_buckets.key =", read_back)
+        # Only the first hit pruned; the next one is due after prune_interval
+        self.assertEqual(self.backend.pruned, 3)
+        self.assertEqual(session.execute.await_count, 4)
+
+
+class ClientIpTests(unittest.TestCase):
+    def scope(self, forwarded: str) -> dict:
+        return {"client": ("10.0.0.2", 5000), "headers": [(b"x-forwarded-for", forwarded.encode())]}
+
+    def test_uses_the_entry_added_by_trusted_proxies(self) -> None:
+        scope = self.scope("6.6.6.6, 203.0.113.7")
+
+        with patch("app.core.ratelimit.settings.rate_limit_forwarded_hops", 0):
+            self.assertEqual(client_ip(scope), "10.0.0.2")
+        with patch("app.core.ratelimit.settings.rate_limit_forwarded_hops", 1):
+            self.assertEqual(client_ip(scope), "203.0.113.7")
+            self.assertEqual(client_ip(self.scope("")), "10.0.0.2")
+        with patch("app.core.ratelimit.settings.rate_limit_forwarded_hops", 2):
+            self.assertEqual(client_ip(scope), "6.6.6.6")
+            self.assertEqual(client_ip(self.scope("203.0.113.7")), "10.0.0.2")
@@ -0,0 +1,130 @@
+import asyncio
+import time
+import unittest
+from datetime import timedelta
+from unittest.mock import Mock, patch
+
+from jose import jwt
+from pydantic import ValidationError
+
+from app.core.config import Settings, settings
+from app.core.security import (
+    PasswordHasher,
+    PasswordHasherBusyError,
+    TOKEN_VERIFIERS,
+    TokenCache,
+    create_access_token,
+    get_password_hash,
+    verify_token_hmac,
+    verify_token_jose,
+)
+
+PASSWORD = "correct horse battery staple"
+
+
+class PasswordHasherTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.hasher = PasswordHasher(max_workers=2, max_pending=2)
+        self.addCleanup(self.hasher.shutdown)
+
+    def test_hash_and_verify_round_trip(self) -> None:
+        async def scenario():
+            hashed = await self.hasher.hash(PASSWORD)
+            return await self.hasher.verify(PASSWORD, hashed), await self.hasher.verify("nope", hashed)
+
+        self.assertEqual(asyncio.run(scenario()), (True, False))
+        self.assertEqual(self.hasher.stats()["completed"], 3)
+
+    def test_event_loop_keeps_running_while_hashing(self) -> None:
+        hashed = get_password_hash(PASSWORD)
+
+        async def scenario():
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.001)
+                    ticks += 1
+
+            task = asyncio.create_task(ticker())
+            await self.hasher.verify(PASSWORD, hashed)
+            task.cancel()
+            return ticks
+
+        self.assertGreater(asyncio.run(scenario()), 5)
+
+    def test_rejects_calls_beyond_the_queue_limit(self) -> None:
+        def slow_verify(plain, hashed):
+            time.sleep(0.1)
+            return True
+
+        async def scenario():
+            with patch("app.core.security.verify_password", slow_verify):
+                return await asyncio.gather(
+                    *(self.hasher.verify(PASSWORD, "hash") for _ in range(3)),
+                    return_exceptions=True,
+                )
+
+        results = asyncio.run(scenario())
+        self.assertEqual(results[:2], [True, True])
+        self.assertIsInstance(results[2], PasswordHasherBusyError)
+        self.assertEqual(self.hasher.stats()["rejected"], 1)
+        self.assertEqual(self.hasher.pending, 0)
+
+
+class TokenVerifierTests(unittest.TestCase):
+    def test_hmac_verifier_agrees_with_jose(self) -> None:
+        valid = create_access_token(data={"sub": "user-1"})
+        expired = create_access_token(data={"sub": "user-1"}, expires_delta=timedelta(seconds=-1))
+        forged = create_access_token(data={"sub": "user-1"}).rsplit(".", 1)[0] + ".c2lnbmF0dXJl"
+        other_key = jwt.encode({"sub": "user-1"}, "another-secret", algorithm="HS256")
+        other_alg = jwt.encode({"sub": "user-1"}, settings.secret_key, algorithm="HS512")
+
+        for token in (valid, expired, forged, other_key, other_alg, "not-a-token", ""):
+            self.assertEqual(
+                verify_token_hmac(token, settings.secret_key),
+                verify_token_jose(token, settings.secret_key),
+                token,
+            )
+        self.assertEqual(verify_token_hmac(valid, settings.secret_key)["sub"], "user-1")
+
+    def test_unknown_verifier_is_rejected_at_startup(self) -> None:
+        with self.assertRaises(ValidationError):
+            Settings(database_url=settings.database_url, token_verifier="pyjwt")
+        for name in ("jose", "hmac"):
+            configured = Settings(database_url=settings.database_url, token_verifier=name)
+            self.assertIn(configured.token_verifier, TOKEN_VERIFIERS)
+
+
+class TokenCacheTests(unittest.TestCase):
+    def test_verifies_each_token_once(self) -> None:
+        cache = TokenCache(max_entries=10, ttl=300)
+        verify = Mock(side_effect=verify_token_jose)
+        token = create_access_token(data={"sub": "user-1"})
+
+        first = cache.decode(token, verify)
+        first["sub"] = "tampered"
+        second = cache.decode(token, verify)
+
+        verify.assert_called_once()
+        self.assertEqual(second["sub"], "user-1")
+        self.assertEqual(cache.stats()["hits"], 1)
+
+    def test_entries_do_not_outlive_the_token(self) -> None:
+        cache = TokenCache(max_entries=10, ttl=300)
+        verify = Mock(side_effect=verify_token_jose)
+        token = create_access_token(data={"sub": "user-1"}, expires_delta=timedelta(seconds=30))
+
+        cache.decode(token, verify)
+        later = time.monotonic() + 31
+        with patch("app.core.cache.time.monotonic", return_value=later):
+            cache.decode(token, verify)
+
+        self.assertEqual(verify.call_count, 2)
+
+    def test_invalid_tokens_are_not_cached(self) -> None:
+        cache = TokenCache(max_entries=10, ttl=300)
+
+        self.assertIsNone(cache.decode("not-a-token", verify_token_jose))
+        self.assertEqual(cache.stats()["size"], 0)
@@ -0,0 +1,89 @@
+import asyncio
+import unittest
+import uuid
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, patch
+
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.security import create_access_token
+from app.models import User
+from app.modules.users.cache import UserCache
+from app.modules.users.views import authenticate_token
+
+
+def make_user(is_active: bool = True) -> User:
+    now = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    return User(
+        id=uuid.uuid4(),
+        email="dev@example.com",
+        name="Dev",
+        auth_provider="local",
+        plan="free",
+        is_active=is_active,
+        created_at=now,
+        updated_at=now,
+    )
+
+
+class UserCacheTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.cache = UserCache(max_entries=10, ttl=60)
+        patcher = patch("app.modules.users.views.user_cache", self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def authenticate(self, user: User, lookup: AsyncMock):
+        token = create_access_token(data={"sub": str(user.id)})
+
+        async def scenario():
+            async with AsyncSession() as session:
+                with patch("app.modules.users.views.get_user_by_id", lookup):
+                    return await authenticate_token(session, token)
+
+        return asyncio.run(scenario())
+
+    def test_second_request_skips_the_database(self) -> None:
+        user = make_user()
+        lookup = AsyncMock(return_value=user)
+
+        first = self.authenticate(user, lookup)
+        second = self.authenticate(user, lookup)
+
+        lookup.assert_awaited_once()
+        self.assertIsNot(second, first)
+        self.assertEqual(second.id, user.id)
+        self.assertEqual(second.email, user.email)
+        self.assertEqual(self.cache.stats()["hits"], 1)
+        self.assertEqual(self.cache.stats()["misses"], 1)
+
+    def test_inactive_users_are_not_cached(self) -> None:
+        user = make_user(is_active=False)
+        lookup = AsyncMock(return_value=user)
+
+        for _ in range(2):
+            with self.assertRaises(HTTPException) as ctx:
+                self.authenticate(user, lookup)
+            self.assertEqual(ctx.exception.status_code, 403)
+
+        self.assertEqual(lookup.await_count, 2)
+
+    def test_invalidate_drops_entry_and_notifies_other_processes(self) -> None:
+        user = make_user()
+        self.cache.set(user)
+        session = AsyncMock()
+
+        asyncio.run(self.cache.invalidate(session, user.id))
+
+        self.assertEqual(len(self.cache._entries), 0)
+        self.assertIn("pg_notify", str(session.execute.await_args.args[0]))
+
+    def test_notification_from_another_process_drops_entry(self) -> None:
+        user = make_user()
+        self.cache.set(user)
+
+        self.cache._on_invalidation({"id": str(user.id)})
+
+        self.assertEqual(len(self.cache._entries), 0)
+        self.assertEqual(self.cache.stats()["invalidations"], 1)
@@ -1,7 +1,5 @@
-import asyncio
 import os
 import unittest
-from datetime import datetime, timezone
 from types import SimpleNamespace
 from unittest.mock import AsyncMock, Mock, patch
 
@@ -10,8 +8,6 @@ from fastapi.testclient import TestClient
 from app.db import get_session
 from app.main import app
 from app.models import WishlistItem
-from app.modules.wishlist.controllers import create_wishlist_item
-from app.modules.wishlist.schemas import WishlistCreate
 
 
 async def override_get_session():
@@ -28,81 +24,55 @@ class WishlistEndpointTests(unittest.TestCase):
     def tearDownClass(cls) -> None:
         app.dependency_overrides.pop(get_session, None)
 
-    @patch("app.modules.wishlist.views.create_wishlist_item", new_callable=AsyncMock)
-    def test_create_wishlist_success(self, create_mock: AsyncMock) -> None:
-        now = datetime.now(timezone.utc)
-        item = WishlistItem(
-            id=1,
-            email="user@example.com",
-            name="Test User",
-            website="https://example.com",
-            action="track",
-            metadata_json={"plan": "pro"},
-            created_at=now,
-            updated_at=now,
-            is_deleted=False,
-        )
-        create_mock.return_value = item
+    @patch("app.modules.wishlist.views.wishlist_ingestor")
+    def test_create_wishlist_success(self, ingestor: Mock) -> None:
+        ingestor.offer = AsyncMock(return_value=True)
 
         payload = {
-            "email": "user@example.com",
+            "email": "User@Example.com",
             "name": "Test User",
             "website": "https://example.com",
             "action": "track",
             "metadata": {"plan": "pro"},
         }
 
-        response = self.client.post("/api/wishlist/", json=payload)
+        response = self.client.post("/api/v0/wishlist/", json=payload)
 
-        self.assertEqual(response.status_code, 201)
-        data = response.json()
-        self.assertEqual(data["email"], payload["email"])
-        self.assertEqual(data["name"], payload["name"])
-        self.assertEqual(data["website"], payload["website"])
-        self.assertEqual(data["action"], payload["action"])
-        self.assertEqual(data["metadata"], payload["metadata"])
-        self.assertFalse(data["is_deleted"])
-        self.assertIn("created_at", data)
-        self.assertIn("updated_at", data)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json(), {"status": "accepted"})
+        row = ingestor.offer.await_args.args[0]
+        self.assertEqual(row["email"], "user@example.com")
+        self.assertEqual(row["name"], payload["name"])
+        self.assertEqual(row["website"], payload["website"])
+        self.assertEqual(row["action"], payload["action"])
+        self.assertEqual(row["metadata_json"], payload["metadata"])
+
+    @patch("app.modules.wishlist.views.wishlist_ingestor")
+    def test_create_wishlist_when_buffer_is_full(self, ingestor: Mock) -> None:
+        ingestor.offer = AsyncMock(return_value=False)
 
-    def test_create_wishlist_validation_error(self) -> None:
         payload = {
             "email": "user@example.com",
             "name": "Test User",
+            "website": "https://example.com",
             "action": "track",
         }
 
-        response = self.client.post("/api/wishlist/", json=payload)
+        response = self.client.post("/api/v0/wishlist/", json=payload)
 
-        self.assertEqual(response.status_code, 422)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers["retry-after"], "1")
 
+    def test_create_wishlist_validation_error(self) -> None:
+        payload = {
+            "email": "user@example.com",
+            "name": "Test User",
+            "action": "track",
+        }
 
-class WishlistControllerTests(unittest.TestCase):
-    def test_create_wishlist_item_calls_session(self) -> None:
-        session = SimpleNamespace(
-            add=Mock(),
-            commit=AsyncMock(),
-            refresh=AsyncMock(),
-        )
+        response = self.client.post("/api/v0/wishlist/", json=payload)
 
-        async def run_test():
-            payload = WishlistCreate(
-                email="controller@example.com",
-                name="Controller User",
-                website="https://controller.example.com",
-                action="notify",
-                metadata={"source": "unit"},
-            )
-            item = await create_wishlist_item(session, payload)
-            return item
-
-        item = asyncio.run(run_test())
-
-        session.add.assert_called_once()
-        session.commit.assert_awaited_once()
-        session.refresh.assert_awaited_once()
-        self.assertEqual(item.email, "controller@example.com")
-        self.assertEqual(item.metadata_json, {"source": "unit"})
+        self.assertEqual(response.status_code, 422)
 
 
 class WishlistModelAndMigrationTests(unittest.TestCase):
@@ -99,12 +99,9 @@ export async function submitToWishlist(
     throw new Error(error.detail || error.message || `HTTP error ${response.status}`)
   }
 
-  const data = await response.json()
-
-  // Transform API response to match expected format
+  // The signup is queued (202 Accepted) and stored shortly after
   return {
     success: true,
-    message: 'Successfully added to wishlist!',
-    wishlistId: data.id
+    message: 'Successfully added to wishlist!'
   }
 }
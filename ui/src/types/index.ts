@@ -76,7 +76,7 @@ export interface WishlistSubmissionRequest {
 export interface WishlistSubmissionResponse {
   success: boolean
   message: string
-  wishlistId: string
+  wishlistId?: string
 }
 
 // API types